@@ -1,7 +1,8 @@
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, StateGraph
 
 from dal.checkpointer import get_checkpointer
-from common.utils.get_llm_model import get_llm_model
+from common.utils.llm_stage import get_stage_llm
 from typing import Literal, Optional
 from typing import TypedDict
 from biz.agent.blueprint.prompt import (
@@ -10,15 +11,23 @@ from biz.agent.blueprint.prompt import (
     WORKFLOW_REFINE_PROMPT,
     MERMAID_PROMPT,
 )
-import json
-
-llm = get_llm_model(model_name="gemini-2.5-pro", temperature=0.5)
-chat_llm = get_llm_model(model_name="Qwen/Qwen3-30B-A3B-Instruct-2507", temperature=0.5)
+from biz.agent.blueprint.node import WORKFLOW_STREAM_PATHS, workflow_stream_event
+from biz.agent.blueprint.utils import create_mermaid_code
+from common.dto.blueprint import Workflow
+from common.utils.json_stream import astream_json
+from common.utils.structured_output import parse_structured
+from settings import settings
+
+chat_llm = get_stage_llm("chat.reply", temperature=0.5)
+# 决策只输出一个词，对冲慢请求可以明显降低对话的尾延迟
+decision_llm = get_stage_llm("chat.decision", temperature=0.5, cache=True, hedge=True)
+refine_llm = get_stage_llm("chat.refine", temperature=0.5)
+mermaid_llm = get_stage_llm("chat.mermaid", temperature=0.5, cache=True)
 
 chat_chain = CHAT_PROMPT | chat_llm
-decision_chain = DECISION_PROMPT | llm
-workflow_refine_chain = WORKFLOW_REFINE_PROMPT | llm
-mermaid_chain = MERMAID_PROMPT | llm
+decision_chain = DECISION_PROMPT | decision_llm
+workflow_refine_chain = WORKFLOW_REFINE_PROMPT | refine_llm
+mermaid_chain = MERMAID_PROMPT | mermaid_llm
 
 
 class MessageState(TypedDict):
@@ -32,20 +41,25 @@ class MessageState(TypedDict):
     mermaid_code: Optional[str]
 
 
-def chat_node(state: MessageState):
-    messages = chat_chain.invoke(
+async def chat_node(state: MessageState):
+    messages = await chat_chain.ainvoke(
         {"workflow": state["workflow"], "messages": state["initial_messages"]}
     )
     return {"messages": messages}
 
 
-def update_workflow_node(state: MessageState):
-    response = workflow_refine_chain.invoke(
-        {"workflow": state["workflow"], "refine_requirement": state["initial_messages"]}
+async def update_workflow_node(state: MessageState):
+    writer = get_stream_writer()
+    content = await astream_json(
+        workflow_refine_chain,
+        {
+            "workflow": state["workflow"],
+            "refine_requirement": state["initial_messages"],
+        },
+        WORKFLOW_STREAM_PATHS,
+        lambda path, value: writer(workflow_stream_event(path, value)),
     )
-    assert isinstance(response.content, str)
-    workflow = response.content.strip("```json").strip("```")
-    workflow = json.loads(workflow)
+    workflow = await parse_structured(content, Workflow, "chat.refine")
     print("refined_workflow", workflow)
     return {"refined_workflow": workflow}
 
@@ -54,17 +68,21 @@ def should_continue(state: MessageState):
     return state["decision"]
 
 
-def continue_node(state: MessageState):
-    decision = decision_chain.invoke({"messages": state["initial_messages"]})
+async def continue_node(state: MessageState):
+    decision = await decision_chain.ainvoke({"messages": state["initial_messages"]})
     """条件函数，决定下一步流向"""
     assert decision.content in ["update", "end"]
     print("decision", decision.content)
     return {"decision": decision.content}
 
 
-def generate_mermaid_node(state: MessageState):
+async def generate_mermaid_node(state: MessageState):
     print("--- 节点：生成mermaid流程图代码 ---")
-    response = mermaid_chain.invoke({"workflow": state["workflow"]})
+    workflow = state.get("refined_workflow") or state["workflow"]
+    if not settings.MERMAID_PRETTIFY:
+        return {"mermaid_code": create_mermaid_code(workflow)}
+
+    response = await mermaid_chain.ainvoke({"workflow": workflow})
     print("生成的mermaid", response.content)
     return {"mermaid_code": response.content}
 
@@ -1,31 +1,62 @@
-import json
-
+from langgraph.config import get_stream_writer
 
 from biz.agent.blueprint.prompt import WORKFLOW_PROMPT, MERMAID_PROMPT
 from biz.agent.blueprint.state import GraphState
-from common.utils.get_llm_model import get_llm_model
-
-llm = get_llm_model(model_name="gemini-2.5-pro", temperature=0.5)
-# llm = get_llm_model(model_name="Qwen/Qwen3-30B-A3B-Instruct-2507", temperature=0.5)
-
-workflow_chain = WORKFLOW_PROMPT | llm
-mermaid_chain = MERMAID_PROMPT | llm
-
-
-def generate_workflow_node(state: GraphState):
+from biz.agent.blueprint.utils import create_mermaid_code
+from common.dto.blueprint import Workflow
+from common.utils.json_stream import astream_json
+from common.utils.llm_cache import is_json_response
+from common.utils.llm_stage import get_stage_llm
+from common.utils.structured_output import parse_structured
+from settings import settings
+
+workflow_llm = get_stage_llm(
+    "blueprint.workflow",
+    temperature=0.5,
+    cache=True,
+    cache_validator=is_json_response,
+)
+mermaid_llm = get_stage_llm("blueprint.mermaid", temperature=0.5, cache=True)
+
+workflow_chain = WORKFLOW_PROMPT | workflow_llm
+mermaid_chain = MERMAID_PROMPT | mermaid_llm
+
+# 流式生成工作流时逐个推送的部分：顶层的ID、名称和每个节点
+WORKFLOW_STREAM_PATHS = [
+    ("workflowId",),
+    ("workflowName",),
+    ("startNodeId",),
+    ("nodes", "*"),
+]
+
+
+def workflow_stream_event(path, value) -> dict:
+    if path[0] == "nodes":
+        return {"event": "workflow_node", "data": {"id": path[1], "node": value}}
+    return {"event": "workflow_field", "data": {path[0]: value}}
+
+
+async def generate_workflow_node(state: GraphState):
     print("--- 节点：生成工作流蓝图 ---")
-    response = workflow_chain.invoke({"final_document": state["final_document"]})
-    # print("生成的workflow:\n", response.content)
-
-    assert isinstance(response.content, str)
-    workflow = response.content.strip("```json").strip("```")
-    workflow = json.loads(workflow)
+    writer = get_stream_writer()
+    content = await astream_json(
+        workflow_chain,
+        {"final_document": state["final_document"]},
+        WORKFLOW_STREAM_PATHS,
+        lambda path, value: writer(workflow_stream_event(path, value)),
+    )
+    # print("生成的workflow:\n", content)
+
+    workflow = await parse_structured(content, Workflow, "blueprint.workflow")
     print(f"workflow\n{workflow}")
     return {"workflow": workflow}
 
 
-def generate_mermaid_node(state: GraphState):
+async def generate_mermaid_node(state: GraphState):
     print("--- 节点：生成mermaid流程图代码 ---")
-    response = mermaid_chain.invoke({"workflow": state["workflow"]})
+    if not settings.MERMAID_PRETTIFY:
+        return {"mermaid_code": create_mermaid_code(state["workflow"])}
+
+    response = await mermaid_chain.ainvoke({"workflow": state["workflow"]})
     print("生成的mermaid", response.content)
     return {"mermaid_code": response.content}
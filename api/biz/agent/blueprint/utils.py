@@ -0,0 +1,72 @@
+import re
+from typing import Any, Dict, Union
+
+from common.dto.blueprint import Workflow
+
+# 条件分支节点使用六边形，其余节点使用矩形
+CONDITION_NODE_TYPE = "CONDITION_BRANCH"
+
+
+def _mermaid_id(node_id: str) -> str:
+    """
+    将SOP节点ID转换为合法的Mermaid节点ID（仅保留字母、数字和下划线）
+
+    统一加上前缀，避免 end、graph、subgraph 等Mermaid关键字作为节点ID时无法解析
+    """
+    return "n_" + re.sub(r"\W", "_", str(node_id))
+
+
+def _mermaid_text(text: str) -> str:
+    """转义Mermaid标签中的特殊字符"""
+    return (
+        str(text)
+        .replace('"', "#quot;")
+        .replace("|", "#124;")
+        .replace("\r\n", "<br>")
+        .replace("\n", "<br>")
+    )
+
+
+def create_mermaid_code(workflow: Union[Workflow, Dict[str, Any]]) -> str:
+    """
+    根据工作流定义生成Mermaid流程图代码，不依赖LLM
+
+    Args:
+        workflow: 工作流定义，包含nodes、edges等信息
+
+    Returns:
+        Mermaid原始代码
+    """
+    if isinstance(workflow, Workflow):
+        workflow = workflow.model_dump()
+
+    nodes: Dict[str, Any] = workflow.get("nodes") or {}
+
+    lines = ["graph TD"]
+    edge_lines = []
+
+    for node_id, node_data in nodes.items():
+        label = f"{node_id}: {node_data.get('nodeTitle', '')}"
+        node_type = node_data.get("nodeType", "")
+        if node_type:
+            label += f"<br>({node_type})"
+        if node_data.get("nodeDescription"):
+            label += f"<br>{node_data['nodeDescription']}"
+        label = _mermaid_text(label)
+
+        if node_type == CONDITION_NODE_TYPE:
+            lines.append(f'    {_mermaid_id(node_id)}{{{{"{label}"}}}}')
+        else:
+            lines.append(f'    {_mermaid_id(node_id)}["{label}"]')
+
+        for edge in node_data.get("edges") or []:
+            target_node_id = edge.get("targetNodeId")
+            if not target_node_id:
+                continue
+            source_handle = _mermaid_text(edge.get("sourceHandle") or "default")
+            edge_lines.append(
+                f'    {_mermaid_id(node_id)} -->|"{source_handle}"| '
+                f"{_mermaid_id(target_node_id)}"
+            )
+
+    return "\n".join(lines + edge_lines)
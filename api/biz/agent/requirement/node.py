@@ -1,35 +1,57 @@
 import json
 
+from langgraph.config import get_stream_writer
 from langgraph.types import interrupt
 
 from biz.agent.requirement.prompt import DRAFT_PROMPT, FINALIZE_PROMPT, QUESTIONS_PROMPT
-from biz.agent.requirement.state import GraphState
-from common.utils.get_llm_model import get_llm_model
-
-llm = get_llm_model(model_name="gemini-2.5-pro", temperature=0.5)
-
-draft_chain = DRAFT_PROMPT | llm
-questionnaire_chain = QUESTIONS_PROMPT | llm
-finalizer_chain = FINALIZE_PROMPT | llm
-
-
-def generate_draft_node(state: GraphState):
+from biz.agent.requirement.state import (
+    GraphState,
+    Questionnaire,
+    RequirementDefinition,
+)
+from common.utils.json_stream import astream_json
+from common.utils.llm_cache import is_json_response
+from common.utils.llm_stage import get_stage_llm
+from common.utils.structured_output import parse_structured
+
+draft_llm = get_stage_llm("requirement.draft", temperature=0.5, cache=True)
+questionnaire_llm = get_stage_llm(
+    "requirement.questionnaire",
+    temperature=0.5,
+    cache=True,
+    cache_validator=is_json_response,
+)
+finalizer_llm = get_stage_llm("requirement.finalizer", temperature=0.5)
+
+draft_chain = DRAFT_PROMPT | draft_llm
+questionnaire_chain = QUESTIONS_PROMPT | questionnaire_llm
+finalizer_chain = FINALIZE_PROMPT | finalizer_llm
+
+
+async def generate_draft_node(state: GraphState):
     print("--- 节点: 生成产品草案 ---")
-    response = draft_chain.invoke({"user_request": state["user_request"]})
+    response = await draft_chain.ainvoke({"user_request": state["user_request"]})
     print("生成的草案:", response.content)
     return {"product_draft": response.content}
 
 
-def generate_questions_node(state: GraphState):
+async def generate_questions_node(state: GraphState):
     print("--- 节点: 生成结构化问卷 ---")
-    response = questionnaire_chain.invoke({"product_draft": state["product_draft"]})
-    assert isinstance(response.content, str)
-    questions = response.content.strip("```json").strip("```")
-    questions = json.loads(questions)
+    writer = get_stream_writer()
+    # 每个问题生成完就推送，不必等整份问卷
+    content = await astream_json(
+        questionnaire_chain,
+        {"product_draft": state["product_draft"]},
+        [("questions", "*")],
+        lambda path, question: writer({"event": "question", "data": question}),
+    )
+    questions = await parse_structured(
+        content, Questionnaire, "requirement.questionnaire"
+    )
     return {"questionnaire": questions}
 
 
-def finalize_document_node(state: GraphState):
+async def finalize_document_node(state: GraphState):
     """生成最终需求档案"""
     print("--- 节点: 生成最终需求档案 ---")
 
@@ -43,17 +65,26 @@ def finalize_document_node(state: GraphState):
     # 处理额外要求
     additional_requirements = _extract_additional_requirements(state)
 
-    # 调用AI生成最终文档
-    response = finalizer_chain.invoke(
+    # 调用AI生成最终文档，每个字段生成完就推送
+    writer = get_stream_writer()
+    content = await astream_json(
+        finalizer_chain,
         {
             "product_draft": state["product_draft"],
             "questionnaire": questionnaire_str,
             "user_answers": answers_str,
             "additional_requirements": additional_requirements,
-        }
+        },
+        [("*",)],
+        lambda path, value: writer(
+            {"event": "final_document_field", "data": {path[0]: value}}
+        ),
+    )
+    print("生成的最终文档:", content)
+    final_document = await parse_structured(
+        content, RequirementDefinition, "requirement.finalizer"
     )
-    print("生成的最终文档:", response.content)
-    return {"final_document": response}
+    return {"final_document": final_document}
 
 
 def _extract_user_answers(state: GraphState) -> list:
@@ -122,7 +153,7 @@ def _extract_additional_requirements(state: GraphState) -> str:
     return str(state.get("additional_requirements") or "无额外要求")
 
 
-def user_answers_node(state: GraphState):
+async def user_answers_node(state: GraphState):
     """用户回答处理节点"""
     print("--- 节点: 等待用户回答 ---")
 
@@ -0,0 +1,209 @@
+import re
+from collections import deque
+from typing import Any, Dict, List
+
+from biz.agent.workflow.dify_nodes import (
+    create_answer_node,
+    create_if_else_node,
+    create_llm_node,
+    create_start_node,
+    create_tavily_search_tool,
+)
+
+# 可由SOP直接确定、无需LLM参与的结构性节点类型
+TRIGGER_NODE_TYPE = "TRIGGER_USER_INPUT"
+OUTPUT_NODE_TYPE = "OUTPUT_FORMAT"
+STRUCTURAL_NODE_TYPES = {TRIGGER_NODE_TYPE, OUTPUT_NODE_TYPE}
+
+# 回复节点优先引用的主要输出变量
+PRIMARY_OUTPUT_VARIABLES = ("text", "result", "body", "answer", "output")
+IGNORED_OUTPUT_VARIABLES = ("usage", "files", "json")
+
+VARIABLE_REFERENCE_PATTERN = re.compile(r"{{#([\w-]+)\.([\w.-]+)#}}")
+
+# 扇出生成时，每种SOP节点类型固定使用的节点工具及其主要输出变量
+FAN_OUT_TOOLS = {
+    "ACTION_LLM_TRANSFORM": (create_llm_node, ["text"]),
+    "ACTION_WEB_SEARCH": (create_tavily_search_tool, ["text"]),
+    "CONDITION_BRANCH": (create_if_else_node, []),
+}
+
+
+def get_structural_node_ids(sop_definition: Dict[str, Any]) -> List[str]:
+    """返回SOP中由规则编译生成、无需交给代理的节点ID"""
+    return [
+        node_id
+        for node_id, node_data in sop_definition.get("nodes", {}).items()
+        if node_data.get("nodeType") in STRUCTURAL_NODE_TYPES
+    ]
+
+
+def compile_trigger_nodes(sop_definition: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    将SOP中的用户输入节点直接编译为Dify开始节点
+
+    Args:
+        sop_definition: SOP定义
+
+    Returns:
+        与节点工具返回格式相同的结果列表
+    """
+    outputs = []
+    for node_id, node_data in sop_definition.get("nodes", {}).items():
+        if node_data.get("nodeType") != TRIGGER_NODE_TYPE:
+            continue
+        outputs.append(
+            create_start_node.invoke(
+                {
+                    "node_id": node_id,
+                    "title": node_data.get("nodeTitle", "开始"),
+                    "desc": node_data.get("nodeDescription") or "",
+                }
+            )
+        )
+    return outputs
+
+
+def _predecessors(sop_definition: Dict[str, Any]) -> Dict[str, List[str]]:
+    predecessors: Dict[str, List[str]] = {}
+    for node_id, node_data in sop_definition.get("nodes", {}).items():
+        for edge in node_data.get("edges", []):
+            predecessors.setdefault(edge.get("targetNodeId"), []).append(node_id)
+    return predecessors
+
+
+def topological_order(sop_definition: Dict[str, Any]) -> List[str]:
+    """SOP节点的拓扑序；环上的节点按其在SOP中的顺序追加"""
+    nodes = sop_definition.get("nodes", {})
+    in_degree = {node_id: 0 for node_id in nodes}
+    for node_data in nodes.values():
+        for edge in node_data.get("edges", []):
+            if edge.get("targetNodeId") in in_degree:
+                in_degree[edge["targetNodeId"]] += 1
+
+    order = []
+    queue = deque(node_id for node_id, degree in in_degree.items() if degree == 0)
+    while queue:
+        node_id = queue.popleft()
+        order.append(node_id)
+        for edge in nodes[node_id].get("edges", []):
+            target_node_id = edge.get("targetNodeId")
+            if target_node_id not in in_degree:
+                continue
+            in_degree[target_node_id] -= 1
+            if in_degree[target_node_id] == 0:
+                queue.append(target_node_id)
+
+    visited = set(order)
+    return order + [node_id for node_id in nodes if node_id not in visited]
+
+
+def predict_upstream_references(
+    sop_definition: Dict[str, Any],
+) -> Dict[str, List[str]]:
+    """
+    根据SOP拓扑预先推算每个节点可引用的上游变量
+
+    上游节点的输出变量按 FAN_OUT_TOOLS 中固定的节点类型推算，因此各节点可以
+    在上游节点生成之前独立、并发地生成。
+
+    Args:
+        sop_definition: SOP定义
+
+    Returns:
+        节点ID到其所有祖先节点输出变量引用的映射
+    """
+    nodes = sop_definition.get("nodes", {})
+    predecessors = _predecessors(sop_definition)
+
+    references: Dict[str, List[str]] = {}
+    for node_id in nodes:
+        ancestors: List[str] = []
+        visited = {node_id}
+        queue = deque(predecessors.get(node_id, []))
+        while queue:
+            upstream_id = queue.popleft()
+            if upstream_id in visited or upstream_id not in nodes:
+                continue
+            visited.add(upstream_id)
+            ancestors.append(upstream_id)
+            queue.extend(predecessors.get(upstream_id, []))
+
+        node_references = ["{{#sys.query#}}"]
+        for upstream_id in reversed(ancestors):
+            node_type = nodes[upstream_id].get("nodeType")
+            _, variables = FAN_OUT_TOOLS.get(node_type, (None, []))
+            node_references += [
+                f"{{{{#{upstream_id}.{variable}#}}}}" for variable in variables
+            ]
+        references[node_id] = node_references
+    return references
+
+
+def _primary_references(references: List[str]) -> List[str]:
+    variables = [
+        match for ref in references for match in VARIABLE_REFERENCE_PATTERN.findall(ref)
+    ]
+    primary = [v for v in variables if v[1] in PRIMARY_OUTPUT_VARIABLES]
+    if not primary:
+        primary = [v for v in variables if v[1] not in IGNORED_OUTPUT_VARIABLES][:1]
+    return [f"{{{{#{node_id}.{variable}#}}}}" for node_id, variable in primary]
+
+
+def compile_output_nodes(
+    sop_definition: Dict[str, Any], available_variables: List[str]
+) -> List[Dict[str, Any]]:
+    """
+    将SOP中的输出节点编译为Dify回复节点
+
+    回复内容引用最近的、产生输出变量的上游节点；条件分支汇合处会同时引用各分支的输出，
+    未执行分支的变量在Dify中渲染为空。需在内容节点全部创建完成后调用。
+
+    Args:
+        sop_definition: SOP定义
+        available_variables: 已创建节点产生的可用变量
+
+    Returns:
+        与节点工具返回格式相同的结果列表
+    """
+    references_by_node: Dict[str, List[str]] = {}
+    for ref in available_variables:
+        for node_id, _ in VARIABLE_REFERENCE_PATTERN.findall(ref):
+            references_by_node.setdefault(node_id, []).append(ref)
+
+    predecessors = _predecessors(sop_definition)
+
+    outputs = []
+    for node_id, node_data in sop_definition.get("nodes", {}).items():
+        if node_data.get("nodeType") != OUTPUT_NODE_TYPE:
+            continue
+
+        # 反向广度优先，跳过条件分支等不产生输出的节点
+        answer_references: List[str] = []
+        visited = {node_id}
+        queue = deque(predecessors.get(node_id, []))
+        while queue:
+            upstream_id = queue.popleft()
+            if upstream_id in visited:
+                continue
+            visited.add(upstream_id)
+            references = _primary_references(references_by_node.get(upstream_id, []))
+            if references:
+                answer_references += [
+                    r for r in references if r not in answer_references
+                ]
+            else:
+                queue.extend(predecessors.get(upstream_id, []))
+
+        outputs.append(
+            create_answer_node.invoke(
+                {
+                    "node_id": node_id,
+                    "title": node_data.get("nodeTitle", "直接回复"),
+                    "desc": node_data.get("nodeDescription") or "",
+                    "answer_content": "\n".join(answer_references)
+                    or "{{#sys.query#}}",
+                }
+            )
+        )
+    return outputs
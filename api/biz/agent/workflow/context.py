@@ -0,0 +1,92 @@
+import json
+import re
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from biz.agent.workflow.state import AgentState, get_pending_tasks
+
+VARIABLE_REFERENCE_PATTERN = re.compile(r"{{#([\w-]+)\.([\w.-]+)#}}")
+
+
+def format_available_variables(state: AgentState) -> str:
+    """将可用变量按来源节点标注节点ID、标题和类型，便于代理正确引用"""
+    node_info = {
+        node["id"]: (node["data"].get("title", ""), node["data"].get("type", ""))
+        for node in state["nodes_created"]
+    }
+
+    lines = ["- {{#sys.query#}} (系统变量：用户输入)"]
+    for reference in state["available_variables"]:
+        match = VARIABLE_REFERENCE_PATTERN.fullmatch(reference)
+        if not match:
+            lines.append(f"- {reference}")
+            continue
+        node_id, variable = match.groups()
+        title, node_type = node_info.get(node_id, ("", ""))
+        lines.append(
+            f"- {reference} (来自{node_type}节点 {node_id}「{title}」的{variable})"
+        )
+    return "\n".join(lines)
+
+
+def summarize_created_nodes(state: AgentState) -> str:
+    """已完成节点的滚动摘要，代替原始的工具调用记录"""
+    if not state["nodes_created"]:
+        return "（暂无）"
+    return "\n".join(
+        f"- {node['id']} [{node['data'].get('type', '')}] "
+        f"{node['data'].get('title', '')}"
+        for node in state["nodes_created"]
+    )
+
+
+def _last_turn_errors(state: AgentState) -> List[str]:
+    """上一轮失败的工具调用，需要代理在本轮重试"""
+    errors = []
+    for message in reversed(state["messages"]):
+        if isinstance(message, AIMessage):
+            break
+        if isinstance(message, ToolMessage) and message.status == "error":
+            errors.append(str(message.content))
+    return list(reversed(errors))
+
+
+def build_compacted_context(state: AgentState, batch: bool) -> HumanMessage:
+    """
+    构建压缩后的执行上下文，代替完整的消息历史
+
+    每轮只保留当前待办、对应的SOP片段、可用变量和已完成节点摘要，
+    使每轮的提示词长度不随已创建节点数增长。
+
+    Args:
+        state: 工作流代理状态
+        batch: 是否为批量模式，批量模式下提供所有待办任务的SOP片段
+
+    Returns:
+        作为执行上下文的消息
+    """
+    pending_tasks = get_pending_tasks(state)
+    current_tasks = pending_tasks if batch else pending_tasks[:1]
+
+    sop_nodes: Dict[str, Any] = state["sop"].get("nodes", {})
+    sop_fragments = {
+        task["nodeId"]: sop_nodes.get(task["nodeId"], {}) for task in current_tasks
+    }
+
+    sections = [
+        "**To-Do List（待处理）:**",
+        json.dumps(pending_tasks, ensure_ascii=False),
+        "**当前任务对应的SOP节点:**",
+        json.dumps(sop_fragments, ensure_ascii=False),
+        "**已创建的节点:**",
+        summarize_created_nodes(state),
+    ]
+
+    errors = _last_turn_errors(state)
+    if errors:
+        sections += ["**上一轮失败的工具调用（请重试）:**", "\n".join(errors)]
+
+    sections += ["**当前已创建节点产生的可用变量:**", format_available_variables(state)]
+
+    return HumanMessage(content="\n".join(sections))
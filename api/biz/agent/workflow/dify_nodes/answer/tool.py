@@ -9,14 +9,14 @@ from .node import AnswerNodeData
 @tool
 def create_answer_node(
     node_id: Annotated[str, "此节点的唯一标识符（例如，“final_answer”）。"],
-    x_pos: Annotated[int, "节点位置的 X 坐标。"],
-    y_pos: Annotated[int, "节点位置的 Y 坐标。"],
     answer_content: Annotated[
         str,
         "回答的内容。可以使用类似 '{{#llm_node_id.text#}}' 的变量来引用其他节点的结果。此外，如果有必要的话，你也可以结合多个变量和自定义文本来构建复杂内容。",
     ],
     title: Annotated[str, "Answer 节点的显示标题。默认为“直接回复”。"] = "直接回复",
     desc: Annotated[str, "节点的可选描述。"] = "",
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     创建一个回答节点，用于直接回复用户。
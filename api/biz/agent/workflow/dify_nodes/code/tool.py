@@ -10,8 +10,6 @@ from .type import CodeOutput, CodeVariable
 @tool
 def create_code_node(
     node_id: Annotated[str, "此节点的唯一标识符（例如：“code_step_1”）。"],
-    x_pos: Annotated[int, "节点位置的 X 坐标。"],
-    y_pos: Annotated[int, "节点位置的 Y 坐标。"],
     code: Annotated[
         str,
         "要执行的代码。对于Python，应该是一个main函数；对于JavaScript，应该是一个main函数。要执行的代码。 \nPython示例: 'def main(arg1: str, arg2: str) -> dict:\\n    return {'result': arg1 + arg2}' \nJavaScript示例: 'function main(arg1, arg2) {\\n    return {'result': arg1 + arg2};\\n}'",
@@ -38,6 +36,8 @@ def create_code_node(
     desc: Annotated[
         str, "节点的可选描述信息。默认为 '执行自定义代码逻辑'。"
     ] = "执行自定义代码逻辑",
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个代码执行节点。
@@ -9,8 +9,6 @@ from .node import DocumentExtractorNodeData
 @tool
 def create_document_extractor_node(
     node_id: Annotated[str, "节点的唯一标识符 (例如: 'doc_extractor_1')。"],
-    x_pos: Annotated[int, "节点在画布上的X坐标。"],
-    y_pos: Annotated[int, "节点在画布上的Y坐标。"],
     variable_selector: Annotated[
         str,
         "输入的文件变量选择器。\n\
@@ -22,6 +20,8 @@ def create_document_extractor_node(
     desc: Annotated[
         str, "节点的描述信息。默认为 '提取并解析文档文件中的文本内容'。"
     ] = "提取并解析文档文件中的文本内容",
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个文档提取器节点。
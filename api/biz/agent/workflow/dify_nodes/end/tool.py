@@ -10,8 +10,6 @@ from .type import EndOutput
 @tool
 def create_end_node(
     node_id: Annotated[str, "节点的唯一标识符 (例如: 'end_1')。"],
-    x_pos: Annotated[int, "节点在画布上的X坐标。"],
-    y_pos: Annotated[int, "节点在画布上的Y坐标。"],
     outputs: Annotated[
         List[Dict[str, Any]],
         "输出变量配置列表。每个字典代表一个输出变量。\n\
@@ -34,6 +32,8 @@ def create_end_node(
     ],
     title: Annotated[str, "节点的显示标题。默认为 '结束'。"] = "结束",
     desc: Annotated[str, "节点的可选描述信息。"] = "",
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个结束节点。
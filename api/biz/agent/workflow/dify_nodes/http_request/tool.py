@@ -11,8 +11,6 @@ from .type import AuthConfig, HTTPBody, HTTPRetryConfig, HTTPTimeout
 @tool
 def create_http_request_node(
     node_id: Annotated[str, "节点的唯一标识符 (例如: 'http_request_1')。"],
-    x_pos: Annotated[int, "节点在画布上的X坐标。"],
-    y_pos: Annotated[int, "节点在画布上的Y坐标。"],
     url: Annotated[
         str,
         "请求的目标URL。可以包含变量引用，例如 'https://api.example.com/users/{{#user_node.user_id#}}'",
@@ -43,6 +41,8 @@ def create_http_request_node(
     retry_enabled: Annotated[bool, "是否启用重试机制。"] = True,
     max_retries: Annotated[int, "最大重试次数。"] = 3,
     retry_interval: Annotated[int, "重试间隔（毫秒）。"] = 100,
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个HTTP请求节点。
@@ -51,8 +51,6 @@ def create_http_request_node(
         # 简单的GET请求
         create_http_request_node(
             node_id="get_user_info",
-            x_pos=100,
-            y_pos=200,
             url="https://api.example.com/users/{{#user_id#}}",
             method="GET"
         )
@@ -60,8 +58,6 @@ def create_http_request_node(
         # 带认证的POST请求
         create_http_request_node(
             node_id="create_user",
-            x_pos=300,
-            y_pos=200,
             url="https://api.example.com/users",
             method="POST",
             headers='{"Content-Type": "application/json"}',
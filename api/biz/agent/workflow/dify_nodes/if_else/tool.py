@@ -10,8 +10,6 @@ from .type import IfElseCase, IfElseCondition
 @tool
 def create_if_else_node(
     node_id: Annotated[str, "节点的唯一标识符 (例如: 'if_else_1')。"],
-    x_pos: Annotated[int, "节点在画布上的X坐标。"],
-    y_pos: Annotated[int, "节点在画布上的Y坐标。"],
     cases: Annotated[
         List[Dict[str, Any]],
         "条件分支的配置列表。每个字典代表一个case（即一个if或else if分支）。\n\
@@ -44,6 +42,8 @@ def create_if_else_node(
     desc: Annotated[
         str, "节点的可选描述信息。"
     ] = "根据条件判断，将工作流引导至不同分支。",
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个条件分支（If/Else）节点。
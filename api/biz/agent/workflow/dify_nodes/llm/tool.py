@@ -14,8 +14,6 @@ from .type import (
 @tool
 def create_llm_node(
     node_id: Annotated[str, "节点的唯一标识符 (例如: 'llm_step_1')。"],
-    x_pos: Annotated[int, "节点在画布上的X坐标。"],
-    y_pos: Annotated[int, "节点在画布上的Y坐标。"],
     prompt_messages: Annotated[
         List[Dict[str, str]],
         "定义LLM提示词的消息列表。每个字典包含'role'和'text'。\n\
@@ -37,6 +35,8 @@ def create_llm_node(
     desc: Annotated[
         str, "节点的可选描述信息。默认为 '执行语言模型推理'。"
     ] = "执行语言模型推理",
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个大语言模型（LLM）节点。
@@ -10,8 +10,6 @@ from .type import LoopCondition, LoopStartNodeData, LoopVariable
 @tool
 def create_loop_node(
     node_id: str,
-    x_pos: int,
-    y_pos: int,
     loop_variables: List[Dict[str, Any]],
     break_conditions: Optional[List[Dict[str, Any]]] = None,
     loop_count: int = 10,
@@ -19,6 +17,8 @@ def create_loop_node(
     error_handle_mode: str = "terminated",
     title: str = "循环",
     desc: str = "执行循环操作，可以设置循环变量和跳出条件。",
+    x_pos: int = 0,
+    y_pos: int = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个循环节点。
@@ -26,8 +26,8 @@ def create_loop_node(
 
     Args:
         node_id (str): 节点的唯一标识符 (例如: "loop_1")。
-        x_pos (int): 节点在画布上的X坐标。
-        y_pos (int): 节点在画布上的Y坐标。
+        x_pos (int, optional): 节点在画布上的X坐标，可省略，由自动布局计算。
+        y_pos (int, optional): 节点在画布上的Y坐标，可省略，由自动布局计算。
         loop_variables (List[Dict[str, Any]]): 循环变量配置列表。每个字典代表一个循环变量。
             - `id` (str): 变量的唯一标识符
             - `label` (str): 变量名称
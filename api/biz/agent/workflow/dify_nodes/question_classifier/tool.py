@@ -11,14 +11,14 @@ from .type import QuestionClassifierClass
 @tool
 def create_question_classifier_node(
     node_id: Annotated[str, "节点的唯一标识符 (例如: 'classifier-1')。"],
-    x_pos: Annotated[int, "节点在画布上的X坐标。"],
-    y_pos: Annotated[int, "节点在画布上的Y坐标。"],
     query: Annotated[str, "要进行分类的用户问题变量引用 (例如: '{{#sys.query#}}')。"],
     classes: Annotated[List[str], "用于分类的类别名称列表。"] = [],
     title: Annotated[str, "节点的显示标题。默认为 '问题分类器'。"] = "问题分类器",
     model_provider: str = "langgenius/siliconflow/siliconflow",
     model_name: str = "deepseek-ai/DeepSeek-V3",
     desc: str = "根据用户问题进行分类",
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个问题分类器节点。
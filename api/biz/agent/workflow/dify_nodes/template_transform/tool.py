@@ -10,8 +10,6 @@ from .type import TemplateVariable
 @tool
 def create_template_transform_node(
     node_id: Annotated[str, "节点的唯一标识符 (例如: 'template_step_1')。"],
-    x_pos: Annotated[int, "节点在画布上的X坐标。"],
-    y_pos: Annotated[int, "节点在画布上的Y坐标。"],
     template: Annotated[
         str,
         "Jinja2模板内容。支持所有Jinja2语法，包括变量替换、循环、条件等。\n\
@@ -31,6 +29,8 @@ def create_template_transform_node(
     desc: Annotated[
         str, "节点的可选描述信息。默认为 '使用Jinja2模板进行数据转换和文本处理'。"
     ] = "使用Jinja2模板进行数据转换和文本处理",
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个模板转换节点。
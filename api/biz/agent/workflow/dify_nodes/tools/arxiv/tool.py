@@ -9,12 +9,12 @@ from .node import ArxivTool
 @tool
 def create_arxiv_search_tool(
     node_id: str,
-    x_pos: int,
-    y_pos: int,
     query: str,
     title: str = "Arxiv搜索",
     max_results: int = 5,
     desc: str = "使用Arxiv搜索学术论文",
+    x_pos: int = 0,
+    y_pos: int = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个Arxiv搜索工具节点。
@@ -22,8 +22,8 @@ def create_arxiv_search_tool(
 
     Args:
         node_id (str): 节点的唯一标识符 (例如: "arxiv_search_1")。
-        x_pos (int): 节点在画布上的X坐标。
-        y_pos (int): 节点在画布上的Y坐标。
+        x_pos (int, optional): 节点在画布上的X坐标，可省略，由自动布局计算。
+        y_pos (int, optional): 节点在画布上的Y坐标，可省略，由自动布局计算。
         query (str): 搜索查询内容，可以引用其他节点的输出，例如 '{{#sys.query#}}' 或 '{{#previous_node.output#}}'。
         title (str, optional): 节点的显示标题。默认为 "Arxiv搜索"。
         max_results (int, optional): 最大搜索结果数量。默认为 5。
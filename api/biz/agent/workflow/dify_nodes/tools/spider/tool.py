@@ -9,13 +9,13 @@ from .node import SpiderTool
 @tool
 def create_spider_tool(
     node_id: str,
-    x_pos: int,
-    y_pos: int,
     url: str,
     title: str = "网页爬虫",
     user_agent: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.1000.0 Safari/537.36",
     generate_summary: bool = False,
     desc: str = "抓取指定网页的内容",
+    x_pos: int = 0,
+    y_pos: int = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个网页爬虫工具节点。
@@ -23,8 +23,8 @@ def create_spider_tool(
 
     Args:
         node_id (str): 节点的唯一标识符 (例如: "spider_1")。
-        x_pos (int): 节点在画布上的X坐标。
-        y_pos (int): 节点在画布上的Y坐标。
+        x_pos (int, optional): 节点在画布上的X坐标，可省略，由自动布局计算。
+        y_pos (int, optional): 节点在画布上的Y坐标，可省略，由自动布局计算。
         url (str): 要抓取的网页URL，可以引用其他节点的输出，例如 '{{#sys.query#}}' 或 '{{#previous_node.url#}}'。
         title (str, optional): 节点的显示标题。默认为 "网页爬虫"。
         user_agent (str, optional): 请求时使用的User-Agent字符串。默认为Chrome浏览器的UA。
@@ -9,8 +9,6 @@ from .node import TavilySearchTool
 @tool
 def create_tavily_search_tool(
     node_id: str,
-    x_pos: int,
-    y_pos: int,
     query: str,
     title: str = "Tavily搜索",
     search_depth: str = "basic",
@@ -24,6 +22,8 @@ def create_tavily_search_tool(
     include_domains: Optional[str] = None,
     exclude_domains: Optional[str] = None,
     desc: str = "使用Tavily进行网络搜索",
+    x_pos: int = 0,
+    y_pos: int = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个Tavily搜索工具节点。
@@ -31,8 +31,8 @@ def create_tavily_search_tool(
 
     Args:
         node_id (str): 节点的唯一标识符 (例如: "tavily_search_1")。
-        x_pos (int): 节点在画布上的X坐标。
-        y_pos (int): 节点在画布上的Y坐标。
+        x_pos (int, optional): 节点在画布上的X坐标，可省略，由自动布局计算。
+        y_pos (int, optional): 节点在画布上的Y坐标，可省略，由自动布局计算。
         query (str): 搜索查询内容，可以引用其他节点的输出，例如 '{{#sys.query#}}' 或 '{{#previous_node.output#}}'。
         title (str, optional): 节点的显示标题。默认为 "Tavily搜索"。
         search_depth (str, optional): 搜索深度，"basic"或"advanced"。默认为 "basic"。
@@ -10,8 +10,6 @@ from .type import VariableReference
 @tool
 def create_variable_aggregator_node(
     node_id: Annotated[str, "节点的唯一标识符 (例如: 'aggregator_1')。"],
-    x_pos: Annotated[int, "节点在画布上的X坐标。"],
-    y_pos: Annotated[int, "节点在画布上的Y坐标。"],
     variables: Annotated[
         Optional[List[Dict[str, Any]]],
         "要聚合的变量列表。每个变量包含:\n\
@@ -28,6 +26,8 @@ def create_variable_aggregator_node(
     desc: Annotated[
         str, "节点的可选描述信息。默认为 '将多路分支的变量聚合为一个变量'。"
     ] = "将多路分支的变量聚合为一个变量",
+    x_pos: Annotated[int, "节点在画布上的X坐标，可省略，由自动布局计算。"] = 0,
+    y_pos: Annotated[int, "节点在画布上的Y坐标，可省略，由自动布局计算。"] = 0,
 ) -> Dict[str, Any]:
     """
     在工作流中创建一个变量聚合器节点。
@@ -1,27 +1,56 @@
 from langgraph.graph import END, StateGraph
 
 from biz.agent.workflow.node import (
+    after_merge,
     agent_node,
+    fan_out_todo_items,
+    merge_generated_nodes_node,
+    node_generator_node,
+    output_compiler_node,
     planner_node,
     should_continue,
+    structure_compiler_node,
     tool_executor_node,
 )
 from biz.agent.workflow.state import AgentState
 from dal.checkpointer import get_checkpointer
+from settings import settings
 
 workflow = StateGraph(AgentState)
 
 workflow.add_node("planner", planner_node)
 workflow.add_node("agent", agent_node)
 workflow.add_node("tool_executor", tool_executor_node)
-workflow.set_entry_point("planner")
-workflow.add_edge("planner", "agent")
+if settings.WORKFLOW_STRUCTURAL_COMPILER:
+    # 开始/回复等结构性节点由规则编译，代理只负责内容节点
+    workflow.add_node("structure_compiler", structure_compiler_node)
+    workflow.add_node("output_compiler", output_compiler_node)
+    workflow.set_entry_point("structure_compiler")
+    workflow.add_edge("structure_compiler", "planner")
+    workflow.add_edge("output_compiler", END)
+else:
+    workflow.set_entry_point("planner")
+
+end_node = "output_compiler" if settings.WORKFLOW_STRUCTURAL_COMPILER else END
+if settings.WORKFLOW_AGENT_FAN_OUT:
+    # 每个待办项一次独立的LLM调用并发生成，失败的待办项再交给执行代理补齐
+    workflow.add_node("node_generator", node_generator_node)
+    workflow.add_node("merge_generated_nodes", merge_generated_nodes_node)
+    workflow.add_conditional_edges(
+        "planner", fan_out_todo_items, ["node_generator", "merge_generated_nodes"]
+    )
+    workflow.add_edge("node_generator", "merge_generated_nodes")
+    workflow.add_conditional_edges(
+        "merge_generated_nodes", after_merge, {"end": end_node, "agent": "agent"}
+    )
+else:
+    workflow.add_edge("planner", "agent")
 workflow.add_conditional_edges(
     "agent",
     should_continue,
     {
         "call_tool": "tool_executor",
-        "end": END,
+        "end": end_node,
         "continue": "agent",
     },
 )
@@ -34,7 +63,7 @@ _app = None
 def get_workflow_agent():
     global _app
     if _app is None:
-        # checkpointer = get_checkpointer()
-        # _app = workflow.compile(checkpointer=checkpointer)
-        _app = workflow.compile()
+        # 按app_id持久化执行进度，失败重试时只生成剩余的节点
+        checkpointer = get_checkpointer()
+        _app = workflow.compile(checkpointer=checkpointer)
     return _app
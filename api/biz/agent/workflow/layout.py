@@ -0,0 +1,242 @@
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Tuple
+
+# 同层节点之间、相邻层之间的间距
+LAYER_SPACING = 80
+NODE_SPACING = 40
+# 布局原点，与Dify默认模板中开始节点的位置一致
+ORIGIN_X = 80
+ORIGIN_Y = 80
+# 容器（如循环节点）内子节点的起始偏移及右下内边距
+CONTAINER_OFFSET_X = 24
+CONTAINER_OFFSET_Y = 68
+CONTAINER_PADDING = 24
+
+DEFAULT_WIDTH = 244
+DEFAULT_HEIGHT = 54
+
+
+def _size(node: Dict[str, Any]) -> Tuple[int, int]:
+    return node.get("width") or DEFAULT_WIDTH, node.get("height") or DEFAULT_HEIGHT
+
+
+def _break_cycles(
+    node_ids: List[str], successors: Dict[str, List[str]]
+) -> Dict[str, List[str]]:
+    """迭代DFS去除回边，得到无环图"""
+    acyclic: Dict[str, List[str]] = defaultdict(list)
+    state: Dict[str, int] = {}  # 1: 在栈中, 2: 已完成
+    for root in node_ids:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors.get(root, [])))]
+        while stack:
+            node_id, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node_id] = 2
+                stack.pop()
+            elif state.get(child) == 1:
+                continue  # 回边，忽略
+            else:
+                acyclic[node_id].append(child)
+                if child not in state:
+                    state[child] = 1
+                    stack.append((child, iter(successors.get(child, []))))
+    return acyclic
+
+
+def _assign_layers(
+    node_ids: List[str], successors: Dict[str, List[str]]
+) -> Dict[str, int]:
+    """最长路径分层：每个节点位于其所有前驱之后"""
+    in_degree = {node_id: 0 for node_id in node_ids}
+    for node_id in node_ids:
+        for child in successors.get(node_id, []):
+            in_degree[child] += 1
+
+    layers = {node_id: 0 for node_id in node_ids}
+    queue = deque(node_id for node_id in node_ids if in_degree[node_id] == 0)
+    while queue:
+        node_id = queue.popleft()
+        for child in successors.get(node_id, []):
+            layers[child] = max(layers[child], layers[node_id] + 1)
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                queue.append(child)
+    return layers
+
+
+def _order_layers(
+    layers: Dict[str, int],
+    successors: Dict[str, List[str]],
+    predecessors: Dict[str, List[str]],
+    node_ids: List[str],
+) -> List[List[str]]:
+    """按重心法排列同层节点，减少边交叉"""
+    layer_count = max(layers.values(), default=-1) + 1
+    ordered: List[List[str]] = [[] for _ in range(layer_count)]
+    for node_id in node_ids:
+        ordered[layers[node_id]].append(node_id)
+
+    def sweep(layer_indexes, neighbours):
+        for index in layer_indexes:
+            position = {
+                node_id: i
+                for adjacent in (index - 1, index + 1)
+                if 0 <= adjacent < len(ordered)
+                for i, node_id in enumerate(ordered[adjacent])
+            }
+            current = {node_id: i for i, node_id in enumerate(ordered[index])}
+
+            def barycenter(node_id):
+                ranks = [
+                    position[n] for n in neighbours.get(node_id, []) if n in position
+                ]
+                return sum(ranks) / len(ranks) if ranks else current[node_id]
+
+            ordered[index].sort(key=barycenter)
+
+    sweep(range(1, len(ordered)), predecessors)
+    sweep(range(len(ordered) - 2, -1, -1), successors)
+    return ordered
+
+
+def _layout_level(
+    nodes: List[Dict[str, Any]],
+    edges: List[Tuple[str, str]],
+    origin_x: int,
+    origin_y: int,
+) -> Tuple[int, int]:
+    """对同一层级（同一父节点下）的节点进行分层布局，返回占用区域的宽和高"""
+    if not nodes:
+        return 0, 0
+
+    node_map = {node["id"]: node for node in nodes}
+    node_ids = list(node_map)
+
+    successors: Dict[str, List[str]] = defaultdict(list)
+    for source, target in edges:
+        if source in node_map and target in node_map and source != target:
+            successors[source].append(target)
+
+    acyclic = _break_cycles(node_ids, successors)
+    predecessors: Dict[str, List[str]] = defaultdict(list)
+    for source, targets in acyclic.items():
+        for target in targets:
+            predecessors[target].append(source)
+
+    layers = _assign_layers(node_ids, acyclic)
+    ordered = _order_layers(layers, acyclic, predecessors, node_ids)
+
+    layer_widths = [max(_size(node_map[n])[0] for n in layer) for layer in ordered]
+    layer_heights = [
+        sum(_size(node_map[n])[1] for n in layer) + NODE_SPACING * (len(layer) - 1)
+        for layer in ordered
+    ]
+    total_height = max(layer_heights)
+
+    x = origin_x
+    for layer, layer_width, layer_height in zip(
+        ordered, layer_widths, layer_heights
+    ):
+        # 每层垂直居中
+        y = origin_y + (total_height - layer_height) // 2
+        for node_id in layer:
+            node_map[node_id]["position"] = {"x": x, "y": y}
+            y += _size(node_map[node_id])[1] + NODE_SPACING
+        x += layer_width + LAYER_SPACING
+
+    return x - LAYER_SPACING - origin_x, total_height
+
+
+def layout_workflow_nodes(
+    nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    为Dify节点自动计算坐标（分层DAG布局）
+
+    依次进行去环、最长路径分层、重心法排序和坐标分配，复杂度接近线性。
+    带有parentId的子节点（如循环内部节点）在父容器内单独布局，坐标相对于父节点，
+    父容器的尺寸随子节点范围扩展。
+
+    Args:
+        nodes: Dify节点定义列表，会被原地修改
+        edges: Dify边定义列表
+
+    Returns:
+        更新了position和positionAbsolute的节点列表
+    """
+    node_map = {node["id"]: node for node in nodes}
+    children: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for node in nodes:
+        parent_id = node.get("parentId")
+        children[parent_id if parent_id in node_map else None].append(node)
+
+    def container_of(node_id: str) -> Any:
+        parent_id = node_map[node_id].get("parentId")
+        return parent_id if parent_id in node_map else None
+
+    def depth_of(node_id: str) -> int:
+        depth = 0
+        while (node_id := container_of(node_id)) is not None:
+            depth += 1
+        return depth
+
+    # 按所属容器对边分组；跨容器的边提升为同一容器内祖先节点之间的边
+    level_edges: Dict[Any, List[Tuple[str, str]]] = defaultdict(list)
+    for edge in edges:
+        source, target = edge.get("source"), edge.get("target")
+        if source not in node_map or target not in node_map:
+            continue
+        source_depth, target_depth = depth_of(source), depth_of(target)
+        while source_depth > target_depth:
+            source, source_depth = container_of(source), source_depth - 1
+        while target_depth > source_depth:
+            target, target_depth = container_of(target), target_depth - 1
+        while container_of(source) != container_of(target):
+            source, target = container_of(source), container_of(target)
+        level_edges[container_of(source)].append((source, target))
+
+    def layout_container(parent_id: Any):
+        # 先布局子容器，确定其尺寸
+        for child in children.get(parent_id, []):
+            if child["id"] in children:
+                layout_container(child["id"])
+
+        if parent_id is None:
+            _layout_level(children[None], level_edges[None], ORIGIN_X, ORIGIN_Y)
+            return
+
+        width, height = _layout_level(
+            children[parent_id],
+            level_edges[parent_id],
+            CONTAINER_OFFSET_X,
+            CONTAINER_OFFSET_Y,
+        )
+        parent = node_map[parent_id]
+        parent_width, parent_height = _size(parent)
+        parent["width"] = max(
+            parent_width, CONTAINER_OFFSET_X + width + CONTAINER_PADDING
+        )
+        parent["height"] = max(
+            parent_height, CONTAINER_OFFSET_Y + height + CONTAINER_PADDING
+        )
+
+    layout_container(None)
+
+    # 由父节点坐标推导绝对坐标
+    def set_absolute(node: Dict[str, Any], offset_x: int, offset_y: int):
+        absolute = {
+            "x": offset_x + node["position"]["x"],
+            "y": offset_y + node["position"]["y"],
+        }
+        node["positionAbsolute"] = absolute
+        for child in children.get(node["id"], []):
+            set_absolute(child, absolute["x"], absolute["y"])
+
+    for node in children[None]:
+        set_absolute(node, 0, 0)
+
+    return nodes
@@ -1,49 +1,120 @@
+import asyncio
 import json
+import weakref
+from typing import List
 
 from langchain_core.messages import HumanMessage, ToolMessage
+from langgraph.config import get_stream_writer
+from langgraph.types import Send
 
+from biz.agent.workflow.compiler import (
+    FAN_OUT_TOOLS,
+    VARIABLE_REFERENCE_PATTERN,
+    compile_output_nodes,
+    compile_trigger_nodes,
+    get_structural_node_ids,
+    predict_upstream_references,
+    topological_order,
+)
+from biz.agent.workflow.context import build_compacted_context
 from biz.agent.workflow.dify_nodes import tool_map, tools_list
-from biz.agent.workflow.prompt import EXECUTOR_SYSTEM_PROMPT, PLANNER_PROMPT
-from biz.agent.workflow.state import AgentState
-from common.utils.get_llm_model import get_llm_model
+from biz.agent.workflow.prompt import (
+    EXECUTOR_BATCH_SYSTEM_PROMPT,
+    EXECUTOR_SYSTEM_PROMPT,
+    NODE_GENERATOR_PROMPT,
+    PLANNER_PROMPT,
+)
+from biz.agent.workflow.state import (
+    TODO_COMPLETED,
+    TODO_PENDING,
+    AgentState,
+    NodeGenerationState,
+    TodoItem,
+    all_tasks_completed,
+    get_pending_tasks,
+    mark_nodes_completed,
+)
+from common.utils.json_stream import astream_json
+from common.utils.llm_stage import get_stage_llm
+from common.utils.structured_output import parse_structured
+from settings import settings
 
-llm = get_llm_model(model_name="gemini-2.5-pro", temperature=0)
+planner_llm = get_stage_llm("workflow.planner", temperature=0)
 
-def tool_executor_node(state: AgentState):
-    last_message = state["messages"][-1]
-    if not last_message.tool_calls:
-        return {}
 
-    tool_call = last_message.tool_calls[0]
+async def _call_tool(tool_call: dict):
     tool_name = tool_call["name"]
-    tool_args = tool_call["args"]
     if tool_name not in tool_map:
         raise ValueError(f"Tool '{tool_name}' not found in the provided tool map.")
+    return await tool_map[tool_name].ainvoke(tool_call["args"])
+
+
+async def tool_executor_node(state: AgentState):
+    last_message = state["messages"][-1]
+    if not last_message.tool_calls:
+        return {}
 
-    tool_to_call = tool_map[tool_name]
-    tool_output = tool_to_call.invoke(tool_args)
-    observation = tool_output["observation"]
-    tool_message = ToolMessage(content=str(observation), tool_call_id=tool_call["id"])
+    tool_calls = last_message.tool_calls
+    # 同一轮的多个工具调用互不依赖，并发执行
+    tool_outputs = await asyncio.gather(
+        *[_call_tool(tool_call) for tool_call in tool_calls], return_exceptions=True
+    )
 
-    new_nodes_created = state["nodes_created"] + [tool_output["node"]]
-    new_available_variables = state["available_variables"] + tool_output["output"]
+    tool_messages = []
+    new_nodes = []
+    new_variables = []
+    for tool_call, tool_output in zip(tool_calls, tool_outputs):
+        if isinstance(tool_output, Exception):
+            # 单个调用失败不影响同批其他节点，由代理在下一轮重试
+            tool_messages.append(
+                ToolMessage(
+                    content=f"工具调用失败：{tool_output}",
+                    tool_call_id=tool_call["id"],
+                    status="error",
+                )
+            )
+            continue
 
-    current_node_title = tool_output["node"]["data"]["title"]
-    updated_todo_list = state["todo_list"]
-    for task in updated_todo_list:
-        if task["nodeTitle"] == current_node_title and task["status"] == "pending":
-            task["status"] = "completed"
-            break
+        tool_messages.append(
+            ToolMessage(
+                content=str(tool_output["observation"]),
+                tool_call_id=tool_call["id"],
+            )
+        )
+        new_nodes.append(tool_output["node"])
+        new_variables.extend(tool_output["output"])
 
+    # 只返回本步的增量，由AgentState的reducer追加/合并
     return {
-        "messages": [tool_message],
-        "nodes_created": new_nodes_created,
-        "available_variables": new_available_variables,
-        "todo_list": updated_todo_list,
+        "messages": tool_messages,
+        "nodes_created": new_nodes,
+        "available_variables": new_variables,
+        "todo_status": mark_nodes_completed(state, new_nodes),
     }
 
 
-def planner_node(state: AgentState):
+def _merge_tool_outputs(tool_outputs: list) -> dict:
+    return {
+        "nodes_created": [output["node"] for output in tool_outputs],
+        "available_variables": [
+            ref for output in tool_outputs for ref in output["output"]
+        ],
+    }
+
+
+async def structure_compiler_node(state: AgentState):
+    """规划前由规则直接生成开始节点等结构性节点，不调用LLM"""
+    return _merge_tool_outputs(compile_trigger_nodes(state["sop"]))
+
+
+async def output_compiler_node(state: AgentState):
+    """内容节点全部完成后，由规则生成引用上游输出的回复节点"""
+    return _merge_tool_outputs(
+        compile_output_nodes(state["sop"], state["available_variables"])
+    )
+
+
+async def planner_node(state: AgentState):
     tools_summary = "\n".join(
         [f"- {tool.name}: {tool.description}" for tool in tools_list]
     )
@@ -53,11 +124,22 @@ def planner_node(state: AgentState):
         sop=state["sop"],
         requirement_doc=state["requirement_doc"],
     )
-    response = llm.invoke(prompt)
-    assert isinstance(response.content, str)
-    response = response.content.strip("```json").strip("```")
+    writer = get_stream_writer()
+    # 每个待办项生成完就推送，前端可以先展示规划出的节点
+    content = await astream_json(
+        planner_llm,
+        prompt,
+        [("*",)],
+        lambda path, task: writer({"event": "todo_item", "data": task}),
+    )
+    todo_list = await parse_structured(content, List[TodoItem], "workflow.planner")
 
-    todo_list = json.loads(response)
+    if settings.WORKFLOW_STRUCTURAL_COMPILER:
+        # 结构性节点由规则编译生成，不交给执行代理
+        structural_node_ids = set(get_structural_node_ids(state["sop"]))
+        for task in todo_list:
+            if task["nodeId"] in structural_node_ids:
+                task["status"] = TODO_COMPLETED
 
     # 初始化执行代理的第一条消息
     initial_message = HumanMessage(
@@ -72,30 +154,181 @@ def planner_node(state: AgentState):
 """
     )
 
-    return {"todo_list": todo_list, "messages": [initial_message]}
+    return {
+        "todo_list": todo_list,
+        "todo_status": {task["nodeId"]: task["status"] for task in todo_list},
+        "messages": [initial_message],
+    }
 
 
-agent_llm = llm.bind_tools(tools_list)
+agent_llm = get_stage_llm("workflow.agent", temperature=0, tools=tools_list)
 
 
-def agent_node(state: AgentState):
-    system_prompt = EXECUTOR_SYSTEM_PROMPT.format(
-        available_variables=state["available_variables"]
+async def agent_node(state: AgentState):
+    # 系统提示词不含动态内容，每轮都是相同的前缀；可用变量放在最后一条消息中
+    system_prompt = (
+        EXECUTOR_BATCH_SYSTEM_PROMPT
+        if settings.WORKFLOW_AGENT_BATCH_TOOL_CALLS
+        else EXECUTOR_SYSTEM_PROMPT
     )
-    messages_with_system_prompt = [HumanMessage(content=system_prompt)] + state[
-        "messages"
-    ]
+    if settings.WORKFLOW_AGENT_COMPACT_HISTORY:
+        messages_with_system_prompt = [
+            HumanMessage(content=system_prompt),
+            build_compacted_context(
+                state, batch=settings.WORKFLOW_AGENT_BATCH_TOOL_CALLS
+            ),
+        ]
+    else:
+        # 消息历史只追加不修改，也属于可缓存的前缀
+        variables_message = HumanMessage(
+            content=f"**当前已创建节点产生的可用变量:**\n{state['available_variables']}"
+        )
+        messages_with_system_prompt = (
+            [HumanMessage(content=system_prompt)]
+            + state["messages"]
+            + [variables_message]
+        )
 
-    response = agent_llm.invoke(messages_with_system_prompt)
+    response = await agent_llm.ainvoke(messages_with_system_prompt)
     print(response)
-    return {"messages": [response]}
+
+    # 记录每轮提示词规模，用于确认压缩后提示词长度不随节点数增长
+    usage = response.usage_metadata or {}
+    turn_usage = {
+        "turn": len(state.get("token_usage") or []) + 1,
+        "nodes_created": len(state["nodes_created"]),
+        "prompt_messages": len(messages_with_system_prompt),
+        "prompt_chars": sum(len(str(m.content)) for m in messages_with_system_prompt),
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+    }
+    print("workflow agent token usage:", turn_usage)
+
+    return {
+        "messages": [response],
+        "token_usage": [turn_usage],
+    }
 
 
 def should_continue(state: AgentState) -> str:
     last_message = state["messages"][-1]
     if last_message.tool_calls:
         return "call_tool"
-    if all(task["status"] == "completed" for task in state["todo_list"]):
+    if all_tasks_completed(state):
         return "end"
     else:
         return "continue"
+
+
+# 事件循环 -> 扇出生成的并发信号量；信号量绑定创建它的事件循环，
+# worker进程与API进程（或测试）中的图各自使用自己循环上的信号量
+_fan_out_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _fan_out_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _fan_out_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.WORKFLOW_AGENT_FAN_OUT_CONCURRENCY)
+        _fan_out_semaphores[loop] = semaphore
+    return semaphore
+
+
+def fan_out_todo_items(state: AgentState) -> list:
+    """
+    规划完成后为每个待办项发送一个独立的生成任务
+
+    各节点可引用的上游变量由SOP拓扑预先推算，生成时不依赖上游节点的实际结果，
+    因此所有待办项可以同时生成。
+    """
+    sop_nodes = state["sop"].get("nodes", {})
+    upstream_references = predict_upstream_references(state["sop"])
+    order = {node_id: i for i, node_id in enumerate(topological_order(state["sop"]))}
+
+    sends = [
+        Send(
+            "node_generator",
+            {
+                "node_id": task["nodeId"],
+                "order": order.get(task["nodeId"], len(order)),
+                "sop_node": sop_nodes.get(task["nodeId"], {}),
+                "upstream_references": upstream_references.get(
+                    task["nodeId"], ["{{#sys.query#}}"]
+                ),
+            },
+        )
+        for task in get_pending_tasks(state)
+    ]
+    # 没有待办项时直接进入汇总节点
+    return sends or ["merge_generated_nodes"]
+
+
+def _format_upstream_references(state: NodeGenerationState) -> str:
+    lines = []
+    for reference in state["upstream_references"]:
+        match = VARIABLE_REFERENCE_PATTERN.fullmatch(reference)
+        if not match or match.group(1) == "sys":
+            lines.append(f"- {reference} (系统变量：用户输入)")
+            continue
+        lines.append(f"- {reference} (来自上游节点 {match.group(1)} 的{match.group(2)})")
+    return "\n".join(lines)
+
+
+async def node_generator_node(state: NodeGenerationState):
+    """扇出模式下生成单个节点：一次LLM调用加一次工具调用"""
+    node_type = state["sop_node"].get("nodeType")
+    if node_type in FAN_OUT_TOOLS:
+        tool = FAN_OUT_TOOLS[node_type][0]
+        tools, tool_choice = [tool], tool.name
+    else:
+        tools, tool_choice = tools_list, "any"
+    generator_llm = get_stage_llm(
+        "workflow.node_generator", temperature=0, tools=tools, tool_choice=tool_choice
+    )
+
+    prompt = NODE_GENERATOR_PROMPT.format(
+        node_id=state["node_id"],
+        sop_node=json.dumps(state["sop_node"], ensure_ascii=False),
+        available_variables=_format_upstream_references(state),
+    )
+
+    result = {"nodeId": state["node_id"], "order": state["order"]}
+    try:
+        async with _fan_out_semaphore():
+            response = await generator_llm.ainvoke([HumanMessage(content=prompt)])
+        if not response.tool_calls:
+            raise ValueError("模型没有返回工具调用")
+        tool_call = response.tool_calls[0]
+        # 节点ID必须与SOP一致，后续按SOP的边连接节点
+        tool_call["args"]["node_id"] = state["node_id"]
+        result["tool_output"] = await _call_tool(tool_call)
+    except Exception as e:
+        print(f"节点 {state['node_id']} 生成失败: {e}")
+        result["error"] = str(e)
+
+    return {"generated_nodes": [result]}
+
+
+async def merge_generated_nodes_node(state: AgentState):
+    """按拓扑序合并扇出生成的节点，失败的待办项保留为pending交给执行代理"""
+    todo_status = state.get("todo_status") or {}
+    results = sorted(
+        (
+            result
+            for result in state.get("generated_nodes") or []
+            if todo_status.get(result["nodeId"]) == TODO_PENDING
+            and "tool_output" in result
+        ),
+        key=lambda result: result["order"],
+    )
+
+    return {
+        **_merge_tool_outputs([result["tool_output"] for result in results]),
+        "todo_status": {result["nodeId"]: TODO_COMPLETED for result in results},
+    }
+
+
+def after_merge(state: AgentState) -> str:
+    if all_tasks_completed(state):
+        return "end"
+    return "agent"
@@ -1,16 +1,101 @@
+import operator
 from typing import Annotated, Dict, List, TypedDict
 
 from langgraph.graph.message import add_messages
+from pydantic import BaseModel
+
+TODO_PENDING = "pending"
+TODO_COMPLETED = "completed"
+
+
+def merge_todo_status(
+    existing: Dict[str, str], updates: Dict[str, str]
+) -> Dict[str, str]:
+    """待办状态按nodeId合并，节点只需返回状态发生变化的待办项"""
+    if not existing:
+        return dict(updates)
+    return {**existing, **updates}
+
+
+class TodoItem(BaseModel):
+    """规划器输出的待办项"""
+
+    nodeId: str
+    nodeTitle: str
+    status: str = TODO_PENDING
 
 
 class AgentState(TypedDict):
     requirement_doc: Dict
     sop: Dict
+    # 规划结果，规划完成后不再修改；各待办项的当前状态以 todo_status 为准
     todo_list: List[
         Dict
     ]  # 格式: [{"nodeId": "node-001", "nodeTitle": "...", "status": "pending"}]
+    # 待办索引: nodeId -> "pending" | "completed"
+    todo_status: Annotated[Dict[str, str], merge_todo_status]
 
-    # 执行阶段的追踪
-    nodes_created: List[Dict]
-    available_variables: List[str]
+    # 执行阶段的追踪，各节点只返回本步新增的部分，由reducer追加
+    nodes_created: Annotated[List[Dict], operator.add]
+    available_variables: Annotated[List[str], operator.add]
     messages: Annotated[list, add_messages]
+
+    # 每轮代理调用的提示词规模统计
+    token_usage: Annotated[List[Dict], operator.add]
+
+    # 扇出模式下各待办项的生成结果，由并发分支追加，汇总节点统一合并
+    generated_nodes: Annotated[List[Dict], operator.add]
+
+
+class NodeGenerationState(TypedDict):
+    """扇出模式下单个待办项的生成输入"""
+
+    node_id: str
+    order: int
+    sop_node: Dict
+    upstream_references: List[str]
+
+
+def get_pending_tasks(state: AgentState) -> List[Dict]:
+    """按规划顺序返回仍未完成的待办项"""
+    todo_status = state.get("todo_status") or {}
+    return [
+        {**task, "status": TODO_PENDING}
+        for task in state["todo_list"]
+        if todo_status.get(task["nodeId"], task["status"]) == TODO_PENDING
+    ]
+
+
+def all_tasks_completed(state: AgentState) -> bool:
+    todo_status = state.get("todo_status") or {}
+    return all(
+        todo_status.get(task["nodeId"], task["status"]) == TODO_COMPLETED
+        for task in state["todo_list"]
+    )
+
+
+def mark_nodes_completed(state: AgentState, new_nodes: List[Dict]) -> Dict[str, str]:
+    """
+    返回新建节点对应待办项的状态增量
+
+    按节点ID在待办索引中查找，与已创建节点数量无关；代理未沿用SOP节点ID时，
+    退回按标题匹配第一个未完成的待办项。
+    """
+    todo_status = state.get("todo_status") or {}
+    updates: Dict[str, str] = {}
+    for node in new_nodes:
+        node_id = node["id"]
+        if todo_status.get(node_id) != TODO_PENDING:
+            node_id = next(
+                (
+                    task["nodeId"]
+                    for task in get_pending_tasks(state)
+                    if task["nodeTitle"] == node["data"].get("title")
+                    and task["nodeId"] not in updates
+                ),
+                None,
+            )
+            if node_id is None:
+                continue
+        updates[node_id] = TODO_COMPLETED
+    return updates
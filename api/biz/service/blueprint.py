@@ -1,23 +1,36 @@
+import asyncio
 import json
+from typing import Optional, Tuple
+
 from common.utils.dify_client import DifyClient
-from fastapi import BackgroundTasks
 from langchain_core.runnables.config import RunnableConfig
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from biz.agent.blueprint.chat_graph import get_chat_workflow
 from biz.agent.blueprint.graph import get_blueprint_workflow
+from biz.agent.blueprint.utils import create_mermaid_code
 from biz.agent.workflow.graph import get_workflow_agent
 from biz.agent.blueprint.state import GraphState
+from biz.service.stage_event import StageEventBIZ, StageEventHandler
 from common.dto.blueprint import BlueprintResponse, Workflow, DifyWorkflowResponse
 from common.dto.user import UserInfo
 from common.enums.error_code import ErrorCode
-from common.enums.task import TaskStatus
+from common.enums.job import JobType
+from common.enums.task import TaskKind, TaskStatus
 from common.exceptions.general_exception import GeneralException
+from common.utils.llm_governor import check_admission
+from common.utils.resume_graph import ainvoke_with_resume
+from dal.dao.job import JobDAO
 from dal.dao.requirement import RequirementDAO
 from dal.dao.blueprint import BlueprintDAO
 from dal.dao.dify_workflow import DifyWorkflowDAO
+from dal.dao.version import changed_since
+from dal.checkpointer import get_checkpointer
 from dal.database import get_db
+from biz.agent.workflow.layout import layout_workflow_nodes
 from biz.agent.workflow.utils import create_workflow_edges
+from settings import settings
 
 class BlueprintBIZ:
     @staticmethod
@@ -25,7 +38,6 @@ class BlueprintBIZ:
         db: Session,
         thread_id: str,
         user_info: UserInfo,
-        background_tasks: BackgroundTasks,
     ):
         try:
             with db.begin():
@@ -42,15 +54,21 @@ class BlueprintBIZ:
                 if getattr(requirement, "final_document") is None:
                     raise GeneralException(ErrorCode.NOT_FOUND, detail="文档尚未生成")
 
+                check_admission(db, JobType.BLUEPRINT_CREATE)
                 blueprint_id = BlueprintDAO.create_blueprint(db, thread_id, user_info)
-
-            background_tasks.add_task(
-                BlueprintBIZ._process_blueprint_task,
-                blueprint_id,
-                requirement.final_document,
-            )
+                JobDAO.create_job(
+                    db,
+                    JobType.BLUEPRINT_CREATE,
+                    {
+                        "blueprint_id": blueprint_id,
+                        "final_document": requirement.final_document,
+                    },
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                )
 
             return blueprint_id
+        except GeneralException:
+            raise
         except SQLAlchemyError as e:
             raise GeneralException(ErrorCode.DATABASE_ERROR, detail=str(e))
         except Exception as e:
@@ -97,6 +115,7 @@ class BlueprintBIZ:
                 blueprint_id=blueprint.id,
                 status=TaskStatus(getattr(blueprint, "status")),
                 progress=getattr(blueprint, "progress") or "处理中...",
+                version=getattr(blueprint, "version"),
             )
 
             workflow_data = getattr(blueprint, "workflow")
@@ -111,6 +130,9 @@ class BlueprintBIZ:
             if error_message:
                 response.error = error_message
 
+            response.eta_seconds, response.next_poll_after_ms = StageEventBIZ.estimate(
+                db, TaskKind.BLUEPRINT, blueprint.id, response.status
+            )
             return response
 
         except GeneralException:
@@ -119,7 +141,7 @@ class BlueprintBIZ:
             raise GeneralException(ErrorCode.INTERNAL_SERVER_ERROR, detail=str(e))
         
     @staticmethod
-    def get_dify_workflow_status(db, app_id, user_info):
+    def get_dify_workflow_status(db, app_id, user_info, since: Optional[int] = None):
         try:
             dify_workflow = DifyWorkflowDAO.get_dify_workflow_by_id(db, app_id)
 
@@ -129,20 +151,97 @@ class BlueprintBIZ:
             response = DifyWorkflowResponse(
                 app_id=app_id,
                 status=TaskStatus(getattr(dify_workflow, "status")),
-                edges=getattr(dify_workflow, "edges"),
-                nodes=getattr(dify_workflow, "nodes")
+                progress=getattr(dify_workflow, "progress"),
+                version=getattr(dify_workflow, "version"),
+            )
+            # 节点和连线较大，增量查询时只返回有变化的
+            fields = ["nodes", "edges"]
+            if since is not None:
+                fields = changed_since(dify_workflow, since, fields)
+            for field in fields:
+                setattr(response, field, getattr(dify_workflow, field))
+            response.eta_seconds, response.next_poll_after_ms = StageEventBIZ.estimate(
+                db, TaskKind.WORKFLOW, app_id, response.status
             )
             return response
-    
+
         except GeneralException:
             raise
         except Exception as e:
             raise GeneralException(ErrorCode.INTERNAL_SERVER_ERROR, detail=str(e))
-        
+
+    @staticmethod
+    def get_dify_workflow_version(db, app_id) -> int:
+        version = DifyWorkflowDAO.get_dify_workflow_version(db, app_id)
+        if version is None:
+            raise GeneralException(ErrorCode.NOT_FOUND, detail="app不存在")
+        return version
+
+    @staticmethod
+    def get_latest_blueprint_etag_parts(db: Session, thread_id: str):
+        """最新蓝图的ID和版本号，对话修改工作流后会生成新的蓝图，两者共同组成ETag"""
+        row = BlueprintDAO.get_latest_blueprint_version(db, thread_id)
+        if not row:
+            raise GeneralException(ErrorCode.NOT_FOUND, detail="蓝图不存在")
+        return row.id, row.version
+
+    @staticmethod
+    def get_blueprint_version(db: Session, blueprint_id: str) -> int:
+        version = BlueprintDAO.get_blueprint_version(db, blueprint_id)
+        if version is None:
+            raise GeneralException(ErrorCode.NOT_FOUND, detail="蓝图不存在")
+        return version
+
+    @staticmethod
+    def get_blueprint_poll_hints(
+        db: Session, blueprint_id: str
+    ) -> Tuple[Optional[float], int]:
+        """304响应使用的剩余时间和轮询间隔，只查询状态，不加载工作流"""
+        status = BlueprintDAO.get_blueprint_task_status(db, blueprint_id)
+        if status is None:
+            raise GeneralException(ErrorCode.NOT_FOUND, detail="蓝图不存在")
+        return StageEventBIZ.estimate(
+            db, TaskKind.BLUEPRINT, blueprint_id, TaskStatus(status)
+        )
+
+    @staticmethod
+    def get_dify_workflow_poll_hints(
+        db: Session, app_id: str
+    ) -> Tuple[Optional[float], int]:
+        """304响应使用的剩余时间和轮询间隔，只查询状态，不加载节点和连线"""
+        status = DifyWorkflowDAO.get_dify_workflow_task_status(db, app_id)
+        if status is None:
+            raise GeneralException(ErrorCode.NOT_FOUND, detail="app不存在")
+        return StageEventBIZ.estimate(db, TaskKind.WORKFLOW, app_id, TaskStatus(status))
+
+    @staticmethod
+    def check_blueprint_owner(db: Session, blueprint_id: str, user_info: UserInfo):
+        user_id = BlueprintDAO.get_blueprint_user_id(db, blueprint_id)
+        if user_id is None:
+            raise GeneralException(ErrorCode.NOT_FOUND, detail="蓝图不存在")
+        if user_id != user_info.id:
+            raise GeneralException(ErrorCode.FORBIDDEN, detail="无权限访问此蓝图")
+
+    @staticmethod
+    def check_dify_workflow_owner(db: Session, app_id: str, user_info: UserInfo):
+        thread_id = DifyWorkflowDAO.get_dify_workflow_thread_id(db, app_id)
+        if thread_id is None:
+            raise GeneralException(ErrorCode.NOT_FOUND, detail="app不存在")
+        row = RequirementDAO.get_requirement_version(db, thread_id)
+        if not row or row.user_id != user_info.id:
+            raise GeneralException(ErrorCode.FORBIDDEN, detail="无权限访问此应用")
+
     @staticmethod
     def get_blueprint_status(
-        db: Session, blueprint_id: str, user_info: UserInfo
+        db: Session,
+        blueprint_id: str,
+        user_info: UserInfo,
+        since: Optional[int] = None,
     ) -> BlueprintResponse:
+        """
+        Args:
+            since: 客户端已有的版本号，指定时只返回该版本之后修改过的字段
+        """
         try:
             blueprint = BlueprintDAO.get_blueprint_by_id(db, blueprint_id)
 
@@ -153,22 +252,28 @@ class BlueprintBIZ:
                 blueprint_id=blueprint_id,
                 status=TaskStatus(getattr(blueprint, "status")),
                 progress=getattr(blueprint, "progress") or "处理中...",
+                version=getattr(blueprint, "version"),
             )
 
-            workflow_data = getattr(blueprint, "workflow")
+            fields = ["workflow", "mermaid_code", "error_message"]
+            if since is not None:
+                fields = changed_since(blueprint, since, fields)
 
-            if workflow_data:
+            workflow_data = getattr(blueprint, "workflow")
+            if workflow_data and "workflow" in fields:
                 response.workflow = Workflow.model_validate(workflow_data)
 
-
             mermaid_code_data = getattr(blueprint, "mermaid_code")
-            if mermaid_code_data:
+            if mermaid_code_data and "mermaid_code" in fields:
                 response.mermaid_code = mermaid_code_data
 
             error_message = getattr(blueprint, "error_message")
-            if error_message:
+            if error_message and "error_message" in fields:
                 response.error = error_message
 
+            response.eta_seconds, response.next_poll_after_ms = StageEventBIZ.estimate(
+                db, TaskKind.BLUEPRINT, blueprint_id, response.status
+            )
             return response
 
         except GeneralException:
@@ -177,20 +282,101 @@ class BlueprintBIZ:
             raise GeneralException(ErrorCode.INTERNAL_SERVER_ERROR, detail=str(e))
 
     @staticmethod
-    def update_blueprint_by_thread(thread_id, final_workflow, final_mermaid):
+    def update_blueprint_by_thread(thread_id, final_workflow, final_mermaid=None):
+        if not final_mermaid:
+            final_mermaid = create_mermaid_code(final_workflow)
         db = next(get_db())
-        BlueprintDAO.save_new_blueprint(
-            db, thread_id, workflow=final_workflow, mermaid_code=final_mermaid
-        )
-        db.commit()
+        try:
+            BlueprintDAO.save_new_blueprint(
+                db, thread_id, workflow=final_workflow, mermaid_code=final_mermaid
+            )
+            db.commit()
+        finally:
+            db.close()
 
     @staticmethod
-    def _process_blueprint_task(blueprint_id: str, final_document: str):
-        db = next(get_db())
+    async def stream_chat(thread_id: str, prompt: str, workflow):
+        """
+        运行蓝图对话图，逐个产出事件：{"chunk": 回复token}、{"partial": 已生成的节点}
+
+        对话结束后如果工作流有修改，在线程池中保存新版本蓝图，不阻塞事件循环。
+        """
+        initial_state = {
+            "initial_messages": prompt,
+            "workflow": workflow,
+            "refined_workflow": None,
+            "decision": None,
+            "mermaid_code": None,
+        }
+        config = RunnableConfig(configurable={"thread_id": thread_id})
+        decision = None
+        async for mode, output in get_chat_workflow().astream(
+            initial_state, config=config, stream_mode=["messages", "custom"]
+        ):
+            if mode == "custom":
+                # 更新工作流时逐个推送已生成的节点
+                yield {"partial": output}
+                continue
+            message = output[0]
+            if not message or not message.content:
+                continue
+            if message.content in ["update", "end"]:
+                decision = message.content
+            # 决策之后是修改工作流和流程图的输出，不推送给用户
+            if decision is None:
+                yield {"chunk": message.content}
+
+        checkpoint = await get_checkpointer().aget(config)
+        if not checkpoint:
+            return
+        if decision == "end":
+            yield {"chunk": "目前无需更新工作流。"}
+            return
+
+        final_workflow = checkpoint["channel_values"].get("refined_workflow")
+        final_mermaid = checkpoint["channel_values"].get("mermaid_code")
+        if final_workflow:
+            await asyncio.to_thread(
+                BlueprintBIZ.update_blueprint_by_thread,
+                thread_id,
+                final_workflow,
+                final_mermaid,
+            )
+            yield {"chunk": "工作流和流程图已更新完毕！"}
 
+    @staticmethod
+    def _update_status(
+        blueprint_id: str, status: TaskStatus, progress: str, **fields
+    ):
+        """在独立的会话中更新蓝图状态并提交，供后台任务在线程中调用"""
+        db = next(get_db())
         try:
             BlueprintDAO.update_blueprint_status(
-                db, blueprint_id, TaskStatus.PROCESSING, "开始处理需求..."
+                db, blueprint_id, status, progress, **fields
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _save_progress(blueprint_id: str, progress: str, **fields):
+        """保存流式生成的部分结果，保存失败不影响生成本身"""
+        try:
+            BlueprintBIZ._update_status(
+                blueprint_id, TaskStatus.PROCESSING, progress, **fields
+            )
+        except Exception as e:
+            print(f"保存蓝图 {blueprint_id} 的生成进度失败: {e}")
+
+    @staticmethod
+    async def _process_blueprint_task(blueprint_id: str, final_document: str):
+        # 数据库读写均为同步调用，放到线程中执行，以免阻塞与API共用的事件循环
+        try:
+            await asyncio.to_thread(
+                BlueprintBIZ._update_status,
+                blueprint_id,
+                TaskStatus.PROCESSING,
+                "开始处理需求...",
             )
             app = get_blueprint_workflow()
 
@@ -201,53 +387,75 @@ class BlueprintBIZ:
                 "error": None,
             }
 
-            config = RunnableConfig(configurable={"thread_id": blueprint_id})
-            result = app.invoke(initial_state, config=config)
+            config = RunnableConfig(
+                configurable={"thread_id": blueprint_id},
+                callbacks=[StageEventHandler(TaskKind.BLUEPRINT, blueprint_id)],
+            )
+            fields: dict = {}
+            nodes: dict = {}
+
+            async def on_progress(event: dict):
+                # 节点逐个保存，字段齐全后状态查询接口即可展示部分工作流
+                if event.get("event") == "workflow_field":
+                    fields.update(event["data"])
+                elif event.get("event") == "workflow_node":
+                    nodes[event["data"]["id"]] = event["data"]["node"]
+                else:
+                    return
+                partial_workflow = {**fields, "nodes": dict(nodes)}
+                try:
+                    Workflow.model_validate(partial_workflow)
+                except ValueError:
+                    return
+                await asyncio.to_thread(
+                    BlueprintBIZ._save_progress,
+                    blueprint_id,
+                    f"正在生成工作流，已生成 {len(nodes)} 个节点",
+                    workflow=partial_workflow,
+                )
+
+            result = await ainvoke_with_resume(
+                app, initial_state, config, on_progress=on_progress
+            )
 
             if result.get("error"):
-                BlueprintDAO.update_blueprint_status(
-                    db,
+                await asyncio.to_thread(
+                    BlueprintBIZ._update_status,
                     blueprint_id,
                     TaskStatus.FAILED,
                     "处理过程中发生错误",
                     error_message=result["error"],
                 )
-                db.commit()
             elif result.get("workflow") and result.get("mermaid_code"):
-                BlueprintDAO.update_blueprint_status(
-                    db,
+                await asyncio.to_thread(
+                    BlueprintBIZ._update_status,
                     blueprint_id,
                     TaskStatus.COMPLETED,
                     "工作流和流程图均已生成",
                     workflow=result["workflow"],
                     mermaid_code=result["mermaid_code"],
                 )
-                db.commit()
             else:
-                BlueprintDAO.update_requirement_status(
-                    db,
+                await asyncio.to_thread(
+                    BlueprintBIZ._update_status,
                     blueprint_id,
                     TaskStatus.FAILED,
                     "蓝图生成失败！",
                 )
-                db.commit()
 
         except Exception as e:
-            import traceback
-
-            error_traceback = traceback.format_exc()
-
-            BlueprintDAO.update_blueprint_status(
-                db,
-                blueprint_id,
-                TaskStatus.FAILED,
-                "处理过程中发生错误",
-                error_message=str(e),
-            )
-            print(error_traceback)
-            db.commit()
-        finally:
-            db.close()
+            # 记录本次错误后交给任务队列重试，从检查点继续；重试次数耗尽后才标记为失败
+            try:
+                await asyncio.to_thread(
+                    BlueprintBIZ._update_status,
+                    blueprint_id,
+                    TaskStatus.PROCESSING,
+                    "处理过程中发生错误，等待重试...",
+                    error_message=str(e),
+                )
+            except Exception as save_error:
+                print(f"记录蓝图 {blueprint_id} 的错误失败: {save_error}")
+            raise
 
     @staticmethod
     def create_node(
@@ -256,7 +464,6 @@ class BlueprintBIZ:
         app_type: str,
         app_name: str,
         app_description: str,
-        background_tasks: BackgroundTasks,
         user_info: UserInfo,
         thread_id: str
     ):  
@@ -272,15 +479,86 @@ class BlueprintBIZ:
                     user_info
                 )
 
-                background_tasks.add_task(BlueprintBIZ._get_node, user_info, thread_id, app_id)
+                JobDAO.create_job(
+                    db,
+                    JobType.DIFY_NODE_CREATE,
+                    {
+                        "user_info": user_info.model_dump(),
+                        "thread_id": thread_id,
+                        "app_id": app_id,
+                    },
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                )
         except SQLAlchemyError as e:
             raise GeneralException(ErrorCode.DATABASE_ERROR, detail=str(e))
         except Exception as e:
             raise GeneralException(ErrorCode.INTERNAL_SERVER_ERROR, detail=str(e))
 
-    def _get_node(user_info: UserInfo, thread_id: str, app_id: str):
+    @staticmethod
+    def resume_node(db: Session, app_id: str, user_info: UserInfo):
+        """重新执行失败的节点生成任务，已生成的节点从检查点恢复，不再调用LLM"""
+        try:
+            with db.begin():
+                dify_workflow = DifyWorkflowDAO.get_dify_workflow_by_id(db, app_id)
+
+                if not dify_workflow:
+                    raise GeneralException(ErrorCode.NOT_FOUND, detail="app不存在")
+
+                requirement = RequirementDAO.get_requirement_by_id(
+                    db, getattr(dify_workflow, "thread_id")
+                )
+                if not requirement or getattr(requirement, "user_id") != user_info.id:
+                    raise GeneralException(
+                        ErrorCode.FORBIDDEN, detail="无权限访问此应用"
+                    )
+
+                if getattr(dify_workflow, "status") != TaskStatus.FAILED.value:
+                    raise GeneralException(
+                        ErrorCode.BAD_REQUEST, detail="只有失败的任务可以恢复"
+                    )
+
+                DifyWorkflowDAO.update_dify_workflow(
+                    db, app_id=app_id, status=TaskStatus.PENDING
+                )
+
+                JobDAO.create_job(
+                    db,
+                    JobType.DIFY_NODE_CREATE,
+                    {
+                        "user_info": user_info.model_dump(),
+                        "thread_id": getattr(dify_workflow, "thread_id"),
+                        "app_id": app_id,
+                    },
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                )
+
+            return DifyWorkflowResponse(
+                app_id=app_id,
+                status=TaskStatus.PENDING,
+                nodes=getattr(dify_workflow, "nodes"),
+            )
+        except GeneralException:
+            raise
+        except SQLAlchemyError as e:
+            raise GeneralException(ErrorCode.DATABASE_ERROR, detail=str(e))
+        except Exception as e:
+            raise GeneralException(ErrorCode.INTERNAL_SERVER_ERROR, detail=str(e))
+
+    @staticmethod
+    def _update_dify_workflow(app_id: str, **fields):
+        """在独立的会话中更新应用的生成状态并提交，供后台任务在线程中调用"""
+        db = next(get_db())
+        try:
+            DifyWorkflowDAO.update_dify_workflow(db, app_id=app_id, **fields)
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _load_node_inputs(thread_id: str):
+        """读取生成节点所需的需求文档和最新蓝图的SOP"""
+        db = next(get_db())
         try:
-            db = next(get_db())
             requirement = RequirementDAO.get_requirement_by_id(db, thread_id)
 
             requirement_doc_keys = [
@@ -298,10 +576,29 @@ class BlueprintBIZ:
             }
 
             blueprint = BlueprintDAO.get_lastest_blueprint(db, thread_id)
-            
-            sop_json = getattr(blueprint, "workflow")
+            return requirement_doc_json, getattr(blueprint, "workflow")
+        finally:
+            db.close()
+
+    @staticmethod
+    async def _get_node(user_info: UserInfo, thread_id: str, app_id: str):
+        app = get_workflow_agent()
+        # 检查点按app_id区分，与需求/蓝图图的thread_id互不干扰
+        config = RunnableConfig(
+            configurable={"thread_id": app_id},
+            callbacks=[StageEventHandler(TaskKind.WORKFLOW, app_id)],
+        )
+        # 数据库读写均为同步调用，放到线程中执行，以免阻塞与API共用的事件循环
+        try:
+            await asyncio.to_thread(
+                BlueprintBIZ._update_dify_workflow,
+                app_id,
+                status=TaskStatus.PROCESSING,
+            )
 
-            app = get_workflow_agent()
+            requirement_doc_json, sop_json = await asyncio.to_thread(
+                BlueprintBIZ._load_node_inputs, thread_id
+            )
 
             initial_input = {
                 "requirement_doc": requirement_doc_json,
@@ -309,25 +606,51 @@ class BlueprintBIZ:
                 "nodes_created": [],
                 "available_variables": [],
                 "messages": [],
+                "token_usage": [],
+                "todo_status": {},
+                "generated_nodes": [],
             }
 
-            config = RunnableConfig(configurable={"thread_id": thread_id})
-            final_state = app.invoke(initial_input, config=config)
+            planned_nodes: list = []
+
+            async def on_progress(event: dict):
+                if event.get("event") != "todo_item":
+                    return
+                planned_nodes.append(event["data"])
+                try:
+                    await asyncio.to_thread(
+                        BlueprintBIZ._update_dify_workflow,
+                        app_id,
+                        status=TaskStatus.PROCESSING,
+                        progress=f"已规划 {len(planned_nodes)} 个节点",
+                    )
+                except Exception as e:
+                    print(f"保存应用 {app_id} 的生成进度失败: {e}")
+
+            # 已有检查点时从最后完成的步骤继续，已生成的节点不再重复调用LLM
+            final_state = await ainvoke_with_resume(
+                app, initial_input, config, on_progress=on_progress
+            )
 
             print("node init")
 
             node_json = final_state['nodes_created']
             edge_json = create_workflow_edges(sop_json, node_json)
+            layout_workflow_nodes(node_json, edge_json)
 
             print("edge init")
 
-            client = DifyClient()
+            # Dify客户端为同步请求，放到线程中执行以免阻塞事件循环
+            client = await asyncio.to_thread(DifyClient)
 
-            draft = client.get_draft(app_id)
+            draft = await asyncio.to_thread(client.get_draft, app_id)
             draft['graph']['edges'] = edge_json
             draft['graph']['nodes'] = node_json
 
-            result = client.set_draft(app_id, draft)
+            async with StageEventBIZ.record_stage(
+                TaskKind.WORKFLOW, app_id, "set_draft"
+            ):
+                result = await asyncio.to_thread(client.set_draft, app_id, draft)
 
             print("result", result)
 
@@ -336,23 +659,27 @@ class BlueprintBIZ:
                     ErrorCode.DIFY_CLIENT_ERROR, "应用更新失败"
                 )
 
-            DifyWorkflowDAO.update_dify_workflow(db, 
-                                                app_id=app_id, 
-                                                status=TaskStatus.COMPLETED, 
-                                                edges=edge_json,
-                                                nodes=node_json
-                                            )
-            db.commit()
-        
-        except Exception as e:
-            DifyWorkflowDAO.update_dify_workflow(
-                db,
-                app_id=app_id,
-                status=TaskStatus.FAILED
+            await asyncio.to_thread(
+                BlueprintBIZ._update_dify_workflow,
+                app_id,
+                status=TaskStatus.COMPLETED,
+                edges=edge_json,
+                nodes=node_json,
             )
+        
+        except Exception:
             import traceback
             traceback.print_exc()
-            db.commit()
-        finally:
-            db.close()
-        return final_state["nodes_created"]
+            # 保存已生成的部分节点，任务交给队列重试，重试次数耗尽后才标记为失败；
+            # 保存失败时只记录日志，始终抛出原始错误
+            try:
+                snapshot = await app.aget_state(config)
+                await asyncio.to_thread(
+                    BlueprintBIZ._update_dify_workflow,
+                    app_id,
+                    status=TaskStatus.PROCESSING,
+                    nodes=(snapshot.values or {}).get("nodes_created"),
+                )
+            except Exception as save_error:
+                print(f"保存应用 {app_id} 已生成的节点失败: {save_error}")
+            raise
@@ -1,8 +1,8 @@
 from langchain.schema import HumanMessage
 from typing import AsyncIterable
-from common.utils.get_llm_model import get_llm_model
+from common.utils.llm_stage import get_stage_llm
 
-llm = get_llm_model(model_name="gemini-2.5-flash", temperature=0.5)
+llm = get_stage_llm("llm.stream", temperature=0.5)
 
 
 class LLMBIZ:
@@ -1,13 +1,18 @@
-import json
-from typing import Optional
+import asyncio
+from typing import Optional, Tuple
 
-from fastapi import BackgroundTasks
 from langchain_core.runnables.config import RunnableConfig
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from biz.agent.requirement.graph import get_requirement_workflow
-from biz.agent.requirement.state import GraphState, Questionnaire, RequirementDefinition
+from biz.agent.requirement.state import (
+    GraphState,
+    Question,
+    Questionnaire,
+    RequirementDefinition,
+)
+from biz.service.stage_event import StageEventBIZ, StageEventHandler
 from common.dto.requirement import (
     RequirementCreate,
     RequirementFields,
@@ -16,10 +21,17 @@ from common.dto.requirement import (
 )
 from common.dto.user import UserInfo
 from common.enums.error_code import ErrorCode
-from common.enums.task import TaskStatus
+from common.enums.job import JobType
+from common.enums.task import TaskKind, TaskStatus
 from common.exceptions.general_exception import GeneralException
+from common.utils.llm_governor import check_admission
+from common.utils.resume_graph import ainvoke_with_resume
+from common.utils.structured_output import parse_locally
+from dal.dao.job import JobDAO
 from dal.dao.requirement import RequirementDAO
+from dal.dao.version import changed_since
 from dal.database import get_db
+from settings import settings
 
 
 class RequirementBIZ:
@@ -28,30 +40,75 @@ class RequirementBIZ:
         db: Session,
         requirement: RequirementCreate,
         user_info: UserInfo,
-        background_tasks: BackgroundTasks,
     ):
         try:
             with db.begin():
+                check_admission(db, JobType.REQUIREMENT_CREATE)
                 thread_id = RequirementDAO.create_requirement(
                     db, requirement, user_info
                 )
-
-            background_tasks.add_task(
-                RequirementBIZ._process_requirement_task,
-                thread_id,
-                requirement.initial_requirement,
-            )
+                JobDAO.create_job(
+                    db,
+                    JobType.REQUIREMENT_CREATE,
+                    {
+                        "thread_id": thread_id,
+                        "initial_requirement": requirement.initial_requirement,
+                    },
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                )
 
             return thread_id
+        except GeneralException:
+            raise
         except SQLAlchemyError as e:
             raise GeneralException(ErrorCode.DATABASE_ERROR, detail=str(e))
         except Exception as e:
             raise GeneralException(ErrorCode.INTERNAL_SERVER_ERROR, detail=str(e))
 
     @staticmethod
-    def get_requirement_status(
+    def get_requirement_version(
         db: Session, thread_id: str, user_info: UserInfo
+    ) -> int:
+        """只查询版本号，用于 If-None-Match 判断，不加载问卷和文档"""
+        try:
+            row = RequirementDAO.get_requirement_version(db, thread_id)
+
+            if not row:
+                raise GeneralException(ErrorCode.NOT_FOUND, detail="需求不存在")
+
+            if row.user_id != user_info.id:
+                raise GeneralException(ErrorCode.FORBIDDEN, detail="无权限访问此需求")
+
+            return row.version
+
+        except GeneralException:
+            raise
+        except Exception as e:
+            raise GeneralException(ErrorCode.INTERNAL_SERVER_ERROR, detail=str(e))
+
+    @staticmethod
+    def get_requirement_poll_hints(
+        db: Session, thread_id: str
+    ) -> Tuple[Optional[float], int]:
+        """304响应使用的剩余时间和轮询间隔，只查询状态，不加载问卷和文档"""
+        row = RequirementDAO.get_requirement_version(db, thread_id)
+        if not row:
+            raise GeneralException(ErrorCode.NOT_FOUND, detail="需求不存在")
+        return StageEventBIZ.estimate(
+            db, TaskKind.REQUIREMENT, thread_id, TaskStatus(row.status)
+        )
+
+    @staticmethod
+    def get_requirement_status(
+        db: Session,
+        thread_id: str,
+        user_info: UserInfo,
+        since: Optional[int] = None,
     ) -> RequirementTaskResponse:
+        """
+        Args:
+            since: 客户端已有的版本号，指定时只返回该版本之后修改过的字段
+        """
         try:
             requirement = RequirementDAO.get_requirement_by_id(db, thread_id)
 
@@ -65,24 +122,32 @@ class RequirementBIZ:
                 thread_id=thread_id,
                 status=TaskStatus(getattr(requirement, "status")),
                 progress=getattr(requirement, "progress") or "处理中...",
+                version=getattr(requirement, "version"),
             )
 
+            fields = ["questionnaire", "final_document", "error_message"]
+            if since is not None:
+                fields = changed_since(requirement, since, fields)
+
             questionnaire_data = getattr(requirement, "questionnaire")
-            if questionnaire_data:
+            if questionnaire_data and "questionnaire" in fields:
                 response.questionnaire = Questionnaire.model_validate(
                     questionnaire_data
                 )
 
             final_document_data = getattr(requirement, "final_document")
-            if final_document_data:
+            if final_document_data and "final_document" in fields:
                 response.final_document = RequirementDefinition.model_validate(
                     final_document_data
                 )
 
             error_message = getattr(requirement, "error_message")
-            if error_message:
+            if error_message and "error_message" in fields:
                 response.error = error_message
 
+            response.eta_seconds, response.next_poll_after_ms = StageEventBIZ.estimate(
+                db, TaskKind.REQUIREMENT, thread_id, response.status
+            )
             return response
 
         except GeneralException:
@@ -91,15 +156,17 @@ class RequirementBIZ:
             raise GeneralException(ErrorCode.INTERNAL_SERVER_ERROR, detail=str(e))
 
     @staticmethod
-    def _process_requirement_task(
+    async def _process_requirement_task(
         thread_id: str,
         initial_requirement: str,
     ):
-        db = next(get_db())
-
+        # 数据库读写均为同步调用，放到线程中执行，以免阻塞与API共用的事件循环
         try:
-            RequirementDAO.update_requirement_status(
-                db, thread_id, TaskStatus.PROCESSING, "开始处理需求..."
+            await asyncio.to_thread(
+                RequirementBIZ._update_status,
+                thread_id,
+                TaskStatus.PROCESSING,
+                "开始处理需求...",
             )
 
             app = get_requirement_workflow()
@@ -114,47 +181,69 @@ class RequirementBIZ:
                 "error": None,
             }
 
-            config = RunnableConfig(configurable={"thread_id": thread_id})
-            result = app.invoke(initial_state, config=config)
+            config = RunnableConfig(
+                configurable={"thread_id": thread_id},
+                callbacks=[StageEventHandler(TaskKind.REQUIREMENT, thread_id)],
+            )
+            questions: list = []
+
+            async def on_progress(event: dict):
+                # 问卷逐题保存，状态查询接口可以先展示已生成的问题
+                if event.get("event") != "question":
+                    return
+                try:
+                    Question.model_validate(event["data"])
+                except ValueError:
+                    return
+                questions.append(event["data"])
+                await asyncio.to_thread(
+                    RequirementBIZ._save_progress,
+                    thread_id,
+                    f"正在生成问卷，已生成 {len(questions)} 个问题",
+                    questionnaire={"questions": list(questions)},
+                )
+
+            result = await ainvoke_with_resume(
+                app, initial_state, config, on_progress=on_progress
+            )
 
             if result.get("error"):
-                RequirementDAO.update_requirement_status(
-                    db,
+                await asyncio.to_thread(
+                    RequirementBIZ._update_status,
                     thread_id,
                     TaskStatus.FAILED,
                     "处理过程中发生错误",
                     error_message=result["error"],
                 )
-                db.commit()
             elif result.get("questionnaire"):
-                RequirementDAO.update_requirement_status(
-                    db,
+                await asyncio.to_thread(
+                    RequirementBIZ._update_status,
                     thread_id,
                     TaskStatus.WAITING_FOR_ANSWERS,
                     "问卷已生成，等待用户回答",
                     questionnaire=result["questionnaire"],
                 )
-                db.commit()
             else:
-                RequirementDAO.update_requirement_status(
-                    db,
+                await asyncio.to_thread(
+                    RequirementBIZ._update_status,
                     thread_id,
                     TaskStatus.FAILED,
                     "问卷生成失败",
                 )
-                db.commit()
 
         except Exception as e:
-            RequirementDAO.update_requirement_status(
-                db,
-                thread_id,
-                TaskStatus.FAILED,
-                "处理过程中发生错误",
-                error_message=str(e),
-            )
-            db.commit()
-        finally:
-            db.close()
+            # 记录本次错误后交给任务队列重试，从检查点继续；重试次数耗尽后才标记为失败
+            try:
+                await asyncio.to_thread(
+                    RequirementBIZ._update_status,
+                    thread_id,
+                    TaskStatus.PROCESSING,
+                    "处理过程中发生错误，等待重试...",
+                    error_message=str(e),
+                )
+            except Exception as save_error:
+                print(f"记录需求 {thread_id} 的错误失败: {save_error}")
+            raise
 
     @staticmethod
     def submit_answers(
@@ -162,7 +251,6 @@ class RequirementBIZ:
         thread_id: str,
         user_answers: UserAnswers,
         user_info: UserInfo,
-        background_tasks: BackgroundTasks,
     ):
         """提交用户答案并继续处理"""
         try:
@@ -191,15 +279,19 @@ class RequirementBIZ:
                 user_answers=user_answers_data,
                 additional_requirements=user_answers.additional_requirements,
             )
-            db.commit()
 
-            # 启动后台任务继续处理
-            background_tasks.add_task(
-                RequirementBIZ._continue_requirement_task,
-                thread_id,
-                user_answers.answers,
-                user_answers.additional_requirements,
+            # 与答案一同提交后台任务，由worker继续处理
+            JobDAO.create_job(
+                db,
+                JobType.REQUIREMENT_CONTINUE,
+                {
+                    "thread_id": thread_id,
+                    "user_answers": user_answers_data,
+                    "additional_requirements": user_answers.additional_requirements,
+                },
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
             )
+            db.commit()
 
             return {"message": "答案已提交，正在生成最终文档..."}
 
@@ -209,14 +301,12 @@ class RequirementBIZ:
             raise GeneralException(ErrorCode.INTERNAL_SERVER_ERROR, detail=str(e))
 
     @staticmethod
-    def _continue_requirement_task(
+    async def _continue_requirement_task(
         thread_id: str,
         user_answers: list,
         additional_requirements: Optional[str] = None,
     ):
         """继续处理需求任务 - 恢复LangGraph执行并提供用户答案"""
-        db = next(get_db())
-
         try:
             from langgraph.types import Command
 
@@ -224,10 +314,16 @@ class RequirementBIZ:
             from biz.agent.requirement.state import UserAnswer
 
             app = get_requirement_workflow()
-            config = RunnableConfig(configurable={"thread_id": thread_id})
+            config = RunnableConfig(
+                configurable={"thread_id": thread_id},
+                callbacks=[StageEventHandler(TaskKind.REQUIREMENT, thread_id)],
+            )
 
-            RequirementDAO.update_requirement_status(
-                db, thread_id, TaskStatus.PROCESSING, "正在生成最终需求文档..."
+            await asyncio.to_thread(
+                RequirementBIZ._update_status,
+                thread_id,
+                TaskStatus.PROCESSING,
+                "正在生成最终需求文档...",
             )
 
             # 准备恢复数据
@@ -242,27 +338,79 @@ class RequirementBIZ:
             if additional_requirements:
                 resume_value["additional_requirements"] = additional_requirements  # type: ignore
 
+            document: dict = {}
+            total_fields = len(RequirementDefinition.model_fields)
+
+            async def on_progress(event: dict):
+                # 最终文档逐字段保存
+                if event.get("event") != "final_document_field":
+                    return
+                document.update(event["data"])
+                await asyncio.to_thread(
+                    RequirementBIZ._save_progress,
+                    thread_id,
+                    f"正在生成最终需求文档（{len(document)}/{total_fields}）",
+                    final_document=dict(document),
+                )
+
             # 恢复执行工作流
-            result = app.invoke(Command(resume=resume_value), config=config)
+            result = await ainvoke_with_resume(
+                app, Command(resume=resume_value), config, on_progress=on_progress
+            )
 
             # 处理结果
-            RequirementBIZ._handle_workflow_result(db, thread_id, result)
+            await asyncio.to_thread(
+                RequirementBIZ._handle_workflow_result, thread_id, result
+            )
 
         except Exception as e:
+            # 记录本次错误后交给任务队列重试，从检查点继续；重试次数耗尽后才标记为失败
+            try:
+                await asyncio.to_thread(
+                    RequirementBIZ._update_status,
+                    thread_id,
+                    TaskStatus.PROCESSING,
+                    "生成最终文档时发生错误，等待重试...",
+                    error_message=str(e),
+                )
+            except Exception as save_error:
+                print(f"记录需求 {thread_id} 的错误失败: {save_error}")
+            raise
+
+    @staticmethod
+    def _update_status(thread_id: str, status: TaskStatus, progress: str, **fields):
+        """在独立的会话中更新需求状态并提交，供后台任务在线程中调用"""
+        db = next(get_db())
+        try:
             RequirementDAO.update_requirement_status(
-                db,
-                thread_id,
-                TaskStatus.FAILED,
-                "生成最终文档时发生错误",
-                error_message=str(e),
+                db, thread_id, status, progress, **fields
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _save_progress(thread_id: str, progress: str, **fields):
+        """保存流式生成的部分结果，保存失败不影响生成本身"""
+        try:
+            RequirementBIZ._update_status(
+                thread_id, TaskStatus.PROCESSING, progress, **fields
             )
+        except Exception as e:
+            print(f"保存需求 {thread_id} 的生成进度失败: {e}")
+
+    @staticmethod
+    def _handle_workflow_result(thread_id: str, result: dict):
+        """处理工作流执行结果，在独立的会话中保存"""
+        db = next(get_db())
+        try:
+            RequirementBIZ._save_workflow_result(db, thread_id, result)
             db.commit()
         finally:
             db.close()
 
     @staticmethod
-    def _handle_workflow_result(db: Session, thread_id: str, result: dict):
-        """处理工作流执行结果"""
+    def _save_workflow_result(db: Session, thread_id: str, result: dict):
         if result and result.get("error"):
             RequirementDAO.update_requirement_status(
                 db,
@@ -279,7 +427,6 @@ class RequirementBIZ:
             RequirementDAO.update_requirement_status(
                 db, thread_id, TaskStatus.FAILED, "最终文档生成失败"
             )
-        db.commit()
 
     @staticmethod
     def _parse_final_document(final_document_raw):
@@ -288,15 +435,12 @@ class RequirementBIZ:
             return None
 
         if hasattr(final_document_raw, "content"):
-            # 如果是 AI 消息，解析其内容
+            # 旧检查点中保存的是 AI 消息，本地修复后解析其内容
             try:
-                content = str(final_document_raw.content).strip()
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                return json.loads(content.strip())
-            except json.JSONDecodeError:
+                return parse_locally(
+                    str(final_document_raw.content), RequirementDefinition
+                )
+            except ValueError:
                 # 如果解析失败，直接使用内容
                 return {"content": str(final_document_raw.content)}
         elif hasattr(final_document_raw, "dict"):
@@ -0,0 +1,248 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from sqlalchemy.orm import Session
+
+from common.enums.task import TaskKind, TaskStatus
+from dal.dao.stage_event import StageEventDAO
+from dal.database import get_db
+from settings import settings
+
+_cache_lock = threading.Lock()
+# 分位数缓存：(刷新时间, 按环节, 按环节和模型)
+_cache: Tuple[float, Dict[str, Dict[str, Any]], List[Dict[str, Any]]] = (0.0, {}, [])
+
+
+def stage_pipelines(kind: TaskKind) -> List[List[str]]:
+    """
+    各类任务依次经过的阶段，内层列表为一次连续执行（中间不等待用户）的阶段
+
+    阶段名即图节点名，另有 set_draft 表示保存Dify草稿。
+    """
+    if kind == TaskKind.REQUIREMENT:
+        return [["draft_generator", "question_generator"], ["document_finalizer"]]
+    if kind == TaskKind.BLUEPRINT:
+        return [["workflow_generator", "mermaid_generator"]]
+    agent = "node_generator" if settings.WORKFLOW_AGENT_FAN_OUT else "agent"
+    return [["planner", agent, "set_draft"]]
+
+
+def _start(kind: TaskKind, entity_id: str, stage: str) -> Optional[int]:
+    db = next(get_db())
+    try:
+        event_id = StageEventDAO.start_stage(db, kind, entity_id, stage)
+        db.commit()
+        return event_id
+    except Exception as e:
+        db.rollback()
+        print(f"记录阶段 {stage} 开始失败: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def _finish(event_id: int, ok: bool, duration: float, model: Optional[str]):
+    db = next(get_db())
+    try:
+        StageEventDAO.finish_stage(db, event_id, ok, int(duration * 1000), model)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"记录阶段结束失败: {e}")
+    finally:
+        db.close()
+
+
+class StageEventHandler(AsyncCallbackHandler):
+    """
+    记录图中各节点的开始和结束，以及节点内调用的模型
+
+    同一节点可能并发执行多次（扇出生成），按 langgraph_checkpoint_ns 区分每次执行。
+    """
+
+    def __init__(self, kind: TaskKind, entity_id: str):
+        self.kind = kind
+        self.entity_id = entity_id
+        self._stages = {stage for stages in stage_pipelines(kind) for stage in stages}
+        # 节点运行ID -> (阶段记录ID, 开始时间, checkpoint_ns)
+        self._runs: Dict[UUID, Tuple[int, float, str]] = {}
+        # checkpoint_ns -> 模型
+        self._models: Dict[str, str] = {}
+
+    async def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Dict[str, Any],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        # 节点内的子链也带有langgraph_node，只记录节点本身
+        if node not in self._stages or kwargs.get("name") != node:
+            return
+        event_id = await asyncio.to_thread(_start, self.kind, self.entity_id, node)
+        if event_id is not None:
+            namespace = metadata.get("langgraph_checkpoint_ns", node)
+            self._runs[run_id] = (event_id, time.monotonic(), namespace)
+
+    async def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        metadata = metadata or {}
+        namespace = metadata.get("langgraph_checkpoint_ns")
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name")
+        if namespace and model:
+            self._models[namespace] = model
+
+    async def _end(self, run_id: UUID, ok: bool):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        event_id, start, namespace = run
+        model = self._models.pop(namespace, None)
+        await asyncio.to_thread(
+            _finish, event_id, ok, time.monotonic() - start, model
+        )
+
+    async def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        await self._end(run_id, True)
+
+    async def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ):
+        await self._end(run_id, False)
+
+
+class StageEventBIZ:
+    @staticmethod
+    @asynccontextmanager
+    async def record_stage(kind: TaskKind, entity_id: str, stage: str):
+        """记录图之外的阶段，如保存Dify草稿"""
+        event_id = await asyncio.to_thread(_start, kind, entity_id, stage)
+        start = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            if event_id is not None:
+                await asyncio.to_thread(
+                    _finish, event_id, ok, time.monotonic() - start, None
+                )
+
+    @staticmethod
+    def _refresh(db: Session):
+        global _cache
+        with _cache_lock:
+            if time.monotonic() - _cache[0] < settings.STAGE_STATS_CACHE_SECONDS:
+                return _cache
+        window = timedelta(hours=settings.STAGE_STATS_WINDOW_HOURS)
+
+        def row_to_dict(row) -> Dict[str, Any]:
+            stage, model, count, p50, p90, p95 = row
+            return {
+                "stage": stage,
+                "model": model,
+                "count": count,
+                "p50_ms": round(p50),
+                "p90_ms": round(p90),
+                "p95_ms": round(p95),
+            }
+
+        by_stage = {
+            row[0]: row_to_dict(row)
+            for row in StageEventDAO.get_percentiles(db, window, by_model=False)
+        }
+        by_model = [
+            row_to_dict(row)
+            for row in StageEventDAO.get_percentiles(db, window, by_model=True)
+        ]
+        with _cache_lock:
+            _cache = (time.monotonic(), by_stage, by_model)
+            return _cache
+
+    @staticmethod
+    def get_stage_stats(db: Session) -> Dict[str, Any]:
+        """最近一段时间各阶段及各模型的耗时分位数，作为延迟看板"""
+        _, by_stage, by_model = StageEventBIZ._refresh(db)
+        return {"stages": list(by_stage.values()), "models": by_model}
+
+    @staticmethod
+    def estimate(
+        db: Session, kind: TaskKind, entity_id: str, status: TaskStatus
+    ) -> Tuple[Optional[float], int]:
+        """
+        按历史耗时估算剩余时间和下一次轮询的间隔
+
+        剩余时间 = 当前阶段的p50减去已耗时（不小于0）+ 后续阶段的p50之和；
+        下一次轮询安排在当前阶段预计完成时，阶段已超时则按最短间隔轮询。
+
+        Returns:
+            (eta_seconds, next_poll_after_ms)，没有历史数据时eta为None
+        """
+        default_poll = settings.STATUS_POLL_DEFAULT_MS
+        if status not in (TaskStatus.PENDING, TaskStatus.PROCESSING):
+            return None, default_poll
+        try:
+            _, by_stage, _ = StageEventBIZ._refresh(db)
+            events = StageEventDAO.get_recent_events(db, kind, entity_id)
+        except Exception as e:
+            db.rollback()
+            print(f"估算 {kind.value} {entity_id} 的剩余时间失败: {e}")
+            return None, default_poll
+
+        def p50(stage: str) -> Optional[float]:
+            stats = by_stage.get(stage)
+            return stats["p50_ms"] / 1000 if stats else None
+
+        pipelines = stage_pipelines(kind)
+        current_remaining = 0.0
+        rest: List[str] = pipelines[0]
+        if events:
+            last = events[-1]
+            for index, stages in enumerate(pipelines):
+                if last.stage not in stages:
+                    continue
+                position = stages.index(last.stage)
+                rest = stages[position + 1 :]
+                if last.finished_at is None:
+                    expected = p50(last.stage)
+                    if expected is None:
+                        return None, default_poll
+                    elapsed = (
+                        datetime.now(timezone.utc) - last.started_at
+                    ).total_seconds()
+                    current_remaining = expected - elapsed
+                elif not rest and index + 1 < len(pipelines):
+                    rest = pipelines[index + 1]
+                break
+
+        expected_rest = [p50(stage) for stage in rest]
+        if any(value is None for value in expected_rest):
+            return None, default_poll
+        eta = max(current_remaining, 0.0) + sum(expected_rest)
+
+        if current_remaining > 0:
+            next_poll = current_remaining * 1000
+        else:
+            next_poll = settings.STATUS_POLL_MIN_MS
+        next_poll = min(
+            max(next_poll, settings.STATUS_POLL_MIN_MS), settings.STATUS_POLL_MAX_MS
+        )
+        return round(eta, 1), int(next_poll)
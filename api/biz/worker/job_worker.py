@@ -0,0 +1,232 @@
+import asyncio
+import os
+import socket
+import traceback
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from biz.service.blueprint import BlueprintBIZ
+from biz.service.requirement import RequirementBIZ
+from common.dto.user import UserInfo
+from common.enums.job import JobStatus, JobType
+from common.enums.llm import LLMPriority
+from common.enums.task import TaskStatus
+from common.utils.llm_governor import governor, llm_priority
+from dal.dao.blueprint import BlueprintDAO
+from dal.dao.dify_workflow import DifyWorkflowDAO
+from dal.dao.job import JobDAO
+from dal.dao.requirement import RequirementDAO
+from dal.database import get_db
+from settings import settings
+
+# 任务类型 -> 处理函数，payload 即处理函数的关键字参数
+JOB_HANDLERS: Dict[JobType, Callable[..., Awaitable]] = {
+    JobType.REQUIREMENT_CREATE: RequirementBIZ._process_requirement_task,
+    JobType.REQUIREMENT_CONTINUE: RequirementBIZ._continue_requirement_task,
+    JobType.BLUEPRINT_CREATE: BlueprintBIZ._process_blueprint_task,
+    JobType.DIFY_NODE_CREATE: lambda user_info, **kwargs: BlueprintBIZ._get_node(
+        user_info=UserInfo.model_validate(user_info), **kwargs
+    ),
+}
+
+# 任务中LLM调用的优先级：需求澄清有用户在等待，蓝图和节点生成属于批量任务
+JOB_PRIORITIES: Dict[JobType, LLMPriority] = {
+    JobType.REQUIREMENT_CREATE: LLMPriority.STANDARD,
+    JobType.REQUIREMENT_CONTINUE: LLMPriority.STANDARD,
+    JobType.BLUEPRINT_CREATE: LLMPriority.BATCH,
+    JobType.DIFY_NODE_CREATE: LLMPriority.BATCH,
+}
+
+
+def _mark_job_target_failed(db: Session, job_type: JobType, payload: dict):
+    """任务彻底失败时，将对应的业务记录标记为失败，避免永远停留在processing"""
+    if job_type in (JobType.REQUIREMENT_CREATE, JobType.REQUIREMENT_CONTINUE):
+        RequirementDAO.update_requirement_status(
+            db,
+            payload["thread_id"],
+            TaskStatus.FAILED,
+            "任务执行失败，重试次数已耗尽",
+        )
+    elif job_type == JobType.BLUEPRINT_CREATE:
+        BlueprintDAO.update_blueprint_status(
+            db,
+            payload["blueprint_id"],
+            TaskStatus.FAILED,
+            "任务执行失败，重试次数已耗尽",
+        )
+    elif job_type == JobType.DIFY_NODE_CREATE:
+        DifyWorkflowDAO.update_dify_workflow(
+            db, app_id=payload["app_id"], status=TaskStatus.FAILED
+        )
+
+
+class JobWorker:
+    """
+    基于Postgres的任务消费者
+
+    每种任务类型一个消费循环，通过 SELECT ... FOR UPDATE SKIP LOCKED 领取任务，
+    执行期间定期续租。进程崩溃后租约过期，任务会被其他worker重新领取，并从该
+    thread_id 的LangGraph检查点继续执行。
+    """
+
+    def __init__(self, concurrency: Optional[Dict[str, int]] = None):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency or settings.JOB_CONCURRENCY
+        self._stopping = asyncio.Event()
+        self._loops: Set[asyncio.Task] = set()
+        self._running: Set[asyncio.Task] = set()
+
+    async def start(self):
+        for job_type in JobType:
+            limit = self.concurrency.get(job_type.value, 0)
+            if limit <= 0:
+                continue
+            self._loops.add(asyncio.create_task(self._consume(job_type, limit)))
+        self._loops.add(asyncio.create_task(self._sweep()))
+        print(f"job worker {self.worker_id} started: {self.concurrency}")
+
+    async def stop(self):
+        """停止领取新任务；执行中的任务被取消后，其租约过期即由其他worker接管"""
+        self._stopping.set()
+        for task in self._loops | self._running:
+            task.cancel()
+        await asyncio.gather(*self._loops, *self._running, return_exceptions=True)
+
+    async def _sleep(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _consume(self, job_type: JobType, limit: int):
+        semaphore = asyncio.Semaphore(limit)
+        while not self._stopping.is_set():
+            await semaphore.acquire()
+            try:
+                job = await asyncio.to_thread(self._lease, job_type)
+            except Exception:
+                traceback.print_exc()
+                job = None
+
+            if job is None:
+                semaphore.release()
+                await self._sleep(settings.JOB_POLL_INTERVAL)
+                continue
+
+            task = asyncio.create_task(self._run(job_type, job, semaphore))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    @staticmethod
+    async def _handle(job_type: JobType, payload: dict):
+        with llm_priority(JOB_PRIORITIES[job_type]):
+            await JOB_HANDLERS[job_type](**payload)
+
+    async def _run(self, job_type: JobType, job: dict, semaphore: asyncio.Semaphore):
+        handler = asyncio.create_task(self._handle(job_type, job["payload"]))
+        lease_lost = asyncio.Event()
+        heartbeat = asyncio.create_task(
+            self._heartbeat(job["id"], handler, lease_lost)
+        )
+        try:
+            await handler
+            await asyncio.to_thread(self._complete, job["id"])
+        except asyncio.CancelledError:
+            # 租约丢失时任务已由其他worker接管，不再更新任务状态
+            if not lease_lost.is_set():
+                raise
+            print(f"job {job['id']} 的租约已被其他worker接管，已停止执行")
+        except Exception as e:
+            traceback.print_exc()
+            await asyncio.to_thread(self._fail, job_type, job, str(e))
+        finally:
+            heartbeat.cancel()
+            handler.cancel()
+            semaphore.release()
+
+    async def _heartbeat(
+        self, job_id: str, handler: asyncio.Task, lease_lost: asyncio.Event
+    ):
+        """定期续租；租约被其他worker接管时取消本地执行，避免同一任务被执行两次"""
+        interval = max(settings.JOB_LEASE_SECONDS / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                extended = await asyncio.to_thread(self._extend_lease, job_id)
+            except Exception:
+                traceback.print_exc()
+                continue
+            if not extended:
+                lease_lost.set()
+                handler.cancel()
+                return
+
+    async def _sweep(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.to_thread(self._fail_exhausted)
+                await asyncio.to_thread(governor.cleanup)
+            except Exception:
+                traceback.print_exc()
+            await self._sleep(settings.JOB_LEASE_SECONDS)
+
+    def _lease(self, job_type: JobType) -> Optional[dict]:
+        db = next(get_db())
+        try:
+            job = JobDAO.lease_job(
+                db, job_type, self.worker_id, settings.JOB_LEASE_SECONDS
+            )
+            if job is None:
+                db.rollback()
+                return None
+            job_info = {"id": job.id, "payload": job.payload}
+            db.commit()
+            return job_info
+        finally:
+            db.close()
+
+    def _extend_lease(self, job_id: str) -> bool:
+        db = next(get_db())
+        try:
+            extended = JobDAO.extend_lease(
+                db, job_id, self.worker_id, settings.JOB_LEASE_SECONDS
+            )
+            db.commit()
+            return extended
+        finally:
+            db.close()
+
+    def _complete(self, job_id: str):
+        db = next(get_db())
+        try:
+            JobDAO.complete_job(db, job_id, self.worker_id)
+            db.commit()
+        finally:
+            db.close()
+
+    def _fail(self, job_type: JobType, job: dict, error_message: str):
+        db = next(get_db())
+        try:
+            failed_job = JobDAO.fail_job(
+                db,
+                job["id"],
+                self.worker_id,
+                error_message,
+                settings.JOB_RETRY_DELAY_SECONDS,
+            )
+            if failed_job and failed_job.status == JobStatus.FAILED.value:
+                _mark_job_target_failed(db, job_type, job["payload"])
+            db.commit()
+        finally:
+            db.close()
+
+    def _fail_exhausted(self):
+        db = next(get_db())
+        try:
+            for job_type in JobType:
+                for job in JobDAO.fail_exhausted_jobs(db, job_type):
+                    _mark_job_target_failed(db, job_type, job.payload)
+            db.commit()
+        finally:
+            db.close()
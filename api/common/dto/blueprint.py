@@ -31,6 +31,10 @@ class BlueprintResponse(BaseModel):
     mermaid_code: Optional[str] = None
     error: Optional[str] = None
     progress: str
+    version: int = 0
+    # 按历史阶段耗时估算的剩余秒数，以及建议的下一次轮询间隔
+    eta_seconds: Optional[float] = None
+    next_poll_after_ms: Optional[int] = None
 
 
 class DifyWorkflowResponse(BaseModel):
@@ -38,6 +42,11 @@ class DifyWorkflowResponse(BaseModel):
     status: TaskStatus
     nodes: Optional[List] = None
     edges: Optional[List] = None
+    progress: Optional[str] = None
+    version: int = 0
+    # 按历史阶段耗时估算的剩余秒数，以及建议的下一次轮询间隔
+    eta_seconds: Optional[float] = None
+    next_poll_after_ms: Optional[int] = None
 
 class PromptRequest(BaseModel):
     prompt: str
@@ -22,6 +22,10 @@ class RequirementTaskResponse(BaseModel):
     final_document: Optional[RequirementDefinition] = None
     error: Optional[str] = None
     progress: str
+    version: int = 0
+    # 按历史阶段耗时估算的剩余秒数，以及建议的下一次轮询间隔
+    eta_seconds: Optional[float] = None
+    next_poll_after_ms: Optional[int] = None
 
 
 class RequirementFields(BaseModel):
@@ -29,6 +29,9 @@ class ErrorCode(Enum):
     # 1404xxx - Resource Not Found
     NOT_FOUND = (1404001, "The requested resource does not exist")
 
+    # 1429xxx - Rate Limiting
+    TOO_MANY_REQUESTS = (1429001, "Too many requests, please retry later")
+
     # 1500xxx - Internal Server Errors
     INTERNAL_SERVER_ERROR = (1500001, "Internal server error")
     DATABASE_ERROR = (1500002, "Database operation error")
@@ -0,0 +1,15 @@
+from enum import Enum
+
+
+class JobType(str, Enum):
+    REQUIREMENT_CREATE = "requirement_create"
+    REQUIREMENT_CONTINUE = "requirement_continue"
+    BLUEPRINT_CREATE = "blueprint_create"
+    DIFY_NODE_CREATE = "dify_node_create"
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
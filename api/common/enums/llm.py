@@ -0,0 +1,9 @@
+from enum import IntEnum
+
+
+class LLMPriority(IntEnum):
+    """LLM调用的优先级，数值越小越优先"""
+
+    INTERACTIVE = 0  # 用户正在等待的对话
+    STANDARD = 1  # 需求澄清等交互式后台任务
+    BATCH = 2  # 蓝图、Dify节点生成等批量任务
@@ -7,3 +7,11 @@ class TaskStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     WAITING_FOR_ANSWERS = "waiting_for_answers"
+
+
+class TaskKind(str, Enum):
+    """推送任务变更事件的业务对象，与 /api/*/status 接口一一对应"""
+
+    REQUIREMENT = "requirement"
+    BLUEPRINT = "blueprint"
+    WORKFLOW = "workflow"
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, Optional
 
 from fastapi import HTTPException
 
@@ -10,17 +10,24 @@ class GeneralException(HTTPException):
     Exception for general.
     """
 
-    def __init__(self, error_code: ErrorCode, detail: Optional[str] = None):
+    def __init__(
+        self,
+        error_code: ErrorCode,
+        detail: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ):
         """
         Initialize the GeneralException.
 
         Args:
             error_code (ErrorCode): The error code.
             detail (str, optional): The detail of the error. Defaults to None.
+            headers (dict, optional): Extra response headers, e.g. Retry-After.
         """
         self.error_code: int = error_code.code
         self.detail: str = error_code.message + (f": {detail}" if detail else "")
         super().__init__(
             status_code=int(str(error_code.code)[1:4]),
             detail=self.detail,
+            headers=headers,
         )
@@ -0,0 +1,34 @@
+from typing import Dict, Optional
+
+
+def make_etag(*parts) -> str:
+    """由对象ID、版本号等拼成弱ETag"""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断请求头 If-None-Match 是否命中当前ETag，按弱比较处理"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == current for tag in if_none_match.split(",")
+    )
+
+
+def poll_headers(
+    eta_seconds: Optional[float], next_poll_after_ms: Optional[int]
+) -> Dict[str, str]:
+    """
+    剩余时间和轮询间隔的响应头
+
+    二者按请求时间计算，不计入ETag；304响应没有响应体，只能通过响应头告知客户端
+    """
+    headers = {}
+    if eta_seconds is not None:
+        headers["X-Eta-Seconds"] = str(eta_seconds)
+    if next_poll_after_ms is not None:
+        headers["X-Next-Poll-After-Ms"] = str(next_poll_after_ms)
+    return headers
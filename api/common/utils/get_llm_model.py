@@ -1,20 +1,441 @@
-from typing import Optional
+import asyncio
+import importlib.util
+import json
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
+import httpx
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import (
+    AIMessageChunk,
+    BaseMessage,
+    message_chunk_to_message,
+)
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_openai import ChatOpenAI
-from pydantic import SecretStr
+from pydantic import PrivateAttr, SecretStr
 
+from common.utils.llm_cache import get_llm_cache
+from common.utils.llm_cassette import (
+    cassette_key,
+    cassette_mode,
+    get_cassette_stats,
+    load_cassette,
+    replay_chunks,
+    replay_result,
+    save_chunks,
+    save_result,
+)
+from common.utils.llm_governor import estimate_tokens, governor
+from common.utils.llm_router import Endpoint, router, run_health_checks
 from settings import settings
 
+# 进程内共享的模型实例及HTTP连接池，避免每个模块各自建立连接、重复TLS握手
+_registry: Dict[Tuple, ChatOpenAI] = {}
+_registry_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_request_counts = {"sync": 0, "async": 0}
+# astream命中缓存时交给 _astream 输出的缓存结果
+_cached_generation: ContextVar[Optional[ChatGeneration]] = ContextVar(
+    "cached_generation", default=None
+)
+
+
+def _http2_available() -> bool:
+    return settings.LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _client_options() -> Dict[str, Any]:
+    return {
+        "http2": _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(
+            settings.LLM_HTTP_TIMEOUT, connect=settings.LLM_HTTP_CONNECT_TIMEOUT
+        ),
+    }
+
+
+def _count_sync_request(request: httpx.Request):
+    _request_counts["sync"] += 1
+
+
+async def _count_async_request(request: httpx.Request):
+    _request_counts["async"] += 1
+
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    global _http_client, _http_async_client
+    with _registry_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                event_hooks={"request": [_count_sync_request]}, **_client_options()
+            )
+        if _http_async_client is None:
+            _http_async_client = httpx.AsyncClient(
+                event_hooks={"request": [_count_async_request]}, **_client_options()
+            )
+    return _http_client, _http_async_client
+
+
+def _pool_connections(client: Optional[Any]) -> Dict[str, int]:
+    """读取httpx底层连接池的连接状态，httpx未公开该接口，取不到时返回空"""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return {}
+    return {
+        "connections": len(connections),
+        "idle": sum(1 for c in connections if c.is_idle()),
+        "http2": sum(1 for c in connections if "HTTP/2" in repr(c)),
+    }
+
+
+def get_llm_pool_stats() -> Dict[str, Any]:
+    with _registry_lock:
+        models = [
+            {"base_urls": list(key[0]), "model": key[1], "temperature": key[2]}
+            for key in _registry
+        ]
+    return {
+        "models": models,
+        "http2_enabled": _http2_available(),
+        "max_connections": settings.LLM_HTTP_MAX_CONNECTIONS,
+        "requests": dict(_request_counts),
+        "sync_pool": _pool_connections(_http_client),
+        "async_pool": _pool_connections(_http_async_client),
+        "endpoints": router.get_stats(),
+        "cassette": get_cassette_stats(),
+    }
+
+
+def start_llm_health_checks() -> Optional[asyncio.Task]:
+    """配置了多个端点时，后台定期探测熔断中的端点"""
+    if not router.multi:
+        return None
+    _, http_async_client = get_http_clients()
+    return asyncio.create_task(run_health_checks(http_async_client))
+
+
+async def close_llm_clients():
+    """关闭共享连接池；已创建的模型实例在下次请求时绑定新建的连接池"""
+    global _http_client, _http_async_client
+    if _http_async_client is not None:
+        await _http_async_client.aclose()
+    if _http_client is not None:
+        _http_client.close()
+    _http_client, _http_async_client = None, None
+
+
+def _prompt_tokens(messages: List[BaseMessage]) -> int:
+    return estimate_tokens("".join(str(message.content) for message in messages))
+
+
+def _usage_tokens(message: Any) -> int:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+class GovernedChatOpenAI(ChatOpenAI):
+    """
+    每次实际请求模型前都经过全局并发与速率控制，缓存命中不占用额度
+
+    配置了多个端点时，异步调用由路由选择端点并在失败时切换；hedge为True时对冲慢请求。
+    同步调用只使用第一个端点。
+
+    LLM_CASSETTE_MODE为record时把每次请求的结果（含工具调用和流式分片）录制到文件，
+    为replay时不访问网络、不经过速率控制，按录制结果和设定的延迟回放。
+    """
+
+    hedge: bool = False
+    _delegates: Dict[str, ChatOpenAI] = PrivateAttr(default_factory=dict)
+
+    def _bind_http_clients(self):
+        """
+        close_llm_clients 关闭连接池后（生命周期重启、worker重新初始化），
+        模块级的模型实例仍引用已关闭的连接池；请求前发现连接池已更换时重新绑定，
+        重建SDK客户端和各端点实例
+        """
+        http_client, http_async_client = get_http_clients()
+        if (
+            self.http_client is http_client
+            and self.http_async_client is http_async_client
+        ):
+            return
+        self.http_client, self.http_async_client = http_client, http_async_client
+        self.client = self.async_client = None
+        self.validate_environment()
+        self._delegates.clear()
+
+    def _delegate(self, endpoint: Endpoint) -> ChatOpenAI:
+        """指向某个端点的同参数模型实例，失败重试交给路由切换端点"""
+        if endpoint.name not in self._delegates:
+            http_client, http_async_client = get_http_clients()
+            self._delegates[endpoint.name] = ChatOpenAI(
+                base_url=endpoint.base_url,
+                api_key=SecretStr(endpoint.api_key),
+                model=self.model_name,
+                temperature=self.temperature,
+                model_kwargs=self.model_kwargs,
+                max_retries=0,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+        return self._delegates[endpoint.name]
+
+    async def _open_stream(
+        self, endpoint: Endpoint, messages, stop, run_manager, **kwargs
+    ):
+        """在端点上开始流式请求并等到第一个分片，首个分片之前的失败可以切换端点"""
+        delegate = self._delegate(endpoint)
+        stream = delegate._astream(messages, stop, run_manager, **kwargs)
+        try:
+            first_chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            first_chunk = None
+        return first_chunk, stream
+
+    async def astream(self, input, config=None, *, stop=None, **kwargs):
+        """
+        BaseChatModel.astream 不读写缓存，开启缓存的模型在这里按与ainvoke相同的键处理：
+        命中时把缓存的回复作为一个分片输出，未命中时流式输出，结束后写入缓存
+        （经cache_validator过滤）。
+
+        命中时同样经过父类的流式路径，回调（阶段统计、LangGraph的messages模式）
+        收到的事件和分片类型与实时调用一致。禁用流式输出时父类改走ainvoke，由其读写缓存。
+        """
+        if not isinstance(self.cache, BaseCache) or self.disable_streaming:
+            async for chunk in super().astream(input, config, stop=stop, **kwargs):
+                yield chunk
+            return
+
+        messages = self._convert_input(input).to_messages()
+        prompt = dumps(messages)
+        llm_string = self._get_llm_string(stop=stop, **kwargs)
+        cached = await self.cache.alookup(prompt, llm_string)
+        if isinstance(cached, list) and cached:
+            _cached_generation.set(self._convert_cached_generations(cached)[0])
+            try:
+                async for chunk in super().astream(input, config, stop=stop, **kwargs):
+                    yield chunk
+            finally:
+                _cached_generation.set(None)
+            return
+
+        merged = None
+        async for chunk in super().astream(input, config, stop=stop, **kwargs):
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+        if merged is not None:
+            generation = ChatGeneration(message=message_chunk_to_message(merged))
+            await self.cache.aupdate(prompt, llm_string, [generation])
+
+    @staticmethod
+    def _cached_chunk(generation: ChatGeneration) -> ChatGenerationChunk:
+        """把缓存的完整回复转为一个流式分片；缓存命中不消耗token，不带用量信息"""
+        message = generation.message
+        tool_calls = getattr(message, "tool_calls", None) or []
+        return ChatGenerationChunk(
+            message=AIMessageChunk(
+                content=message.content,
+                additional_kwargs=message.additional_kwargs,
+                response_metadata=message.response_metadata,
+                tool_call_chunks=[
+                    tool_call_chunk(
+                        name=call["name"],
+                        args=json.dumps(call["args"], ensure_ascii=False),
+                        id=call["id"],
+                        index=index,
+                    )
+                    for index, call in enumerate(tool_calls)
+                ],
+                id=message.id,
+            ),
+            generation_info=generation.generation_info,
+        )
+
+    def _cassette_key(self, messages, stop, kwargs) -> str:
+        return cassette_key(self.model_name, self.temperature, messages, stop, kwargs)
+
+    def _generate(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        self._bind_http_clients()
+        if self.streaming:
+            return super()._generate(messages, stop, run_manager, **kwargs)
+        mode = cassette_mode()
+        if mode == "replay":
+            time.sleep(settings.LLM_CASSETTE_LATENCY)
+            return replay_result(
+                load_cassette(self._cassette_key(messages, stop, kwargs))
+            )
+        permit = governor.acquire_sync(self.model_name, _prompt_tokens(messages))
+        actual_tokens = 0
+        try:
+            result = super()._generate(messages, stop, run_manager, **kwargs)
+            actual_tokens = sum(_usage_tokens(g.message) for g in result.generations)
+            if mode == "record":
+                key = self._cassette_key(messages, stop, kwargs)
+                save_result(key, self.model_name, messages, result)
+            return result
+        finally:
+            governor.release_sync(permit, actual_tokens)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._bind_http_clients()
+        yield from super()._stream(messages, stop, run_manager, **kwargs)
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        self._bind_http_clients()
+        # streaming模式下父类会转而调用_astream，由_astream负责申请额度
+        if self.streaming:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        mode = cassette_mode()
+        if mode == "replay":
+            await asyncio.sleep(settings.LLM_CASSETTE_LATENCY)
+            return replay_result(
+                load_cassette(self._cassette_key(messages, stop, kwargs))
+            )
+        permit = await governor.acquire(self.model_name, _prompt_tokens(messages))
+        actual_tokens = 0
+        try:
+            if router.multi:
+                result = await router.call(
+                    lambda endpoint: self._delegate(endpoint)._agenerate(
+                        messages, stop, run_manager, **kwargs
+                    ),
+                    hedge=self.hedge,
+                )
+            else:
+                result = await super()._agenerate(
+                    messages, stop, run_manager, **kwargs
+                )
+            actual_tokens = sum(_usage_tokens(g.message) for g in result.generations)
+            if mode == "record":
+                key = self._cassette_key(messages, stop, kwargs)
+                save_result(key, self.model_name, messages, result)
+            return result
+        finally:
+            await governor.release(permit, actual_tokens)
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self._bind_http_clients()
+        cached = _cached_generation.get()
+        if cached is not None:
+            _cached_generation.set(None)
+            chunk = self._cached_chunk(cached)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            return
+
+        mode = cassette_mode()
+        if mode == "replay":
+            record = load_cassette(self._cassette_key(messages, stop, kwargs))
+            await asyncio.sleep(settings.LLM_CASSETTE_LATENCY)
+            for chunk in replay_chunks(record):
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                await asyncio.sleep(settings.LLM_CASSETTE_CHUNK_DELAY)
+            return
+
+        chunks: List[ChatGenerationChunk] = []
+        async for chunk in self._governed_astream(
+            messages, stop, run_manager, **kwargs
+        ):
+            if mode == "record":
+                chunks.append(chunk)
+            yield chunk
+        if mode == "record" and chunks:
+            key = self._cassette_key(messages, stop, kwargs)
+            save_chunks(key, self.model_name, messages, chunks)
+
+    async def _governed_astream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        permit = await governor.acquire(self.model_name, _prompt_tokens(messages))
+        actual_tokens = 0
+        try:
+            if not router.multi:
+                async for chunk in super()._astream(
+                    messages, stop, run_manager, **kwargs
+                ):
+                    actual_tokens += _usage_tokens(chunk.message)
+                    yield chunk
+                return
+
+            first_chunk, stream = await router.call(
+                lambda endpoint: self._open_stream(
+                    endpoint, messages, stop, run_manager, **kwargs
+                )
+            )
+            if first_chunk is not None:
+                actual_tokens += _usage_tokens(first_chunk.message)
+                yield first_chunk
+            async for chunk in stream:
+                actual_tokens += _usage_tokens(chunk.message)
+                yield chunk
+        finally:
+            await governor.release(permit, actual_tokens)
+
 
 def get_llm_model(
     temperature: float = 0.5,
     model_name: Optional[str] = None,
     model_kwargs: Optional[dict] = None,
+    cache: bool = False,
+    cache_validator: Optional[Callable] = None,
+    hedge: bool = False,
 ) -> ChatOpenAI:
-    return ChatOpenAI(
-        base_url=settings.OPENAI_API_BASE,
-        api_key=SecretStr(settings.OPENAI_API_KEY),
-        model=model_name if model_name else settings.DEFAULT_MODEL,
+    """
+    按 (base_url, 模型, 温度, 参数) 返回进程内共享的模型实例，所有实例共用同一组
+    HTTP连接池，且每次请求都经过全局并发与速率控制。
+    cache为True时启用两级响应缓存，相同模型参数和提示词直接返回缓存结果；
+    cache_validator用于过滤不应缓存的回复（如无法解析的JSON）；
+    hedge为True时对冲慢请求，仅适合决策这类短调用，且以非流式方式调用。
+    录制或回放模式下不使用缓存，否则命中缓存的调用不会进入录音
+    """
+    model = model_name if model_name else settings.DEFAULT_MODEL
+    cache = cache and cassette_mode() not in ("record", "replay")
+    key = (
+        tuple(endpoint.base_url for endpoint in router.endpoints),
+        model,
+        temperature,
+        json.dumps(model_kwargs or {}, sort_keys=True, default=str),
+        cache,
+        cache_validator,
+        hedge,
+    )
+    with _registry_lock:
+        if key in _registry:
+            return _registry[key]
+
+    http_client, http_async_client = get_http_clients()
+    llm = GovernedChatOpenAI(
+        cache=get_llm_cache(cache_validator) if cache else None,
+        base_url=router.endpoints[0].base_url,
+        api_key=SecretStr(router.endpoints[0].api_key),
+        model=model,
         temperature=temperature,
         model_kwargs=model_kwargs or {},
+        http_client=http_client,
+        http_async_client=http_async_client,
+        hedge=hedge,
+        # 对冲需要完整的响应才能比较先后，禁用流式输出
+        disable_streaming=hedge,
     )
+    with _registry_lock:
+        return _registry.setdefault(key, llm)
@@ -0,0 +1,110 @@
+import json
+import re
+from typing import Any, Callable, List, Tuple
+
+_FENCE_PATTERN = re.compile(r"```(?:json)?", re.IGNORECASE)
+_TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'"})
+
+
+class TruncatedJSONError(json.JSONDecodeError):
+    """输出在JSON结束前被截断，不能修复，只能重新生成"""
+
+
+def strip_fences(text: str) -> str:
+    """去掉代码块标记及JSON前后的说明文字"""
+    text = _FENCE_PATTERN.sub("", text).strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text
+    text = text[min(starts) :]
+    ends = max(text.rfind("}"), text.rfind("]"))
+    # 被截断时没有匹配的结尾，保留全部内容，由 is_truncated 判断
+    return text[: ends + 1] if ends != -1 and _is_balanced(text[: ends + 1]) else text
+
+
+def _scan(text: str) -> Tuple[List[str], bool]:
+    """返回未闭合的括号栈，以及结尾是否停在字符串中"""
+    stack: List[str] = []
+    in_string = escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack and stack[-1] == char:
+            stack.pop()
+    return stack, in_string
+
+
+def _is_balanced(text: str) -> bool:
+    stack, in_string = _scan(text)
+    return not stack and not in_string
+
+
+def remove_trailing_commas(text: str) -> str:
+    return _TRAILING_COMMA_PATTERN.sub(r"\1", text)
+
+
+def is_truncated(text: str) -> bool:
+    """
+    输出是否在JSON结束前被截断（括号或字符串未闭合）
+
+    截断的输出不做补全：补齐括号后得到的是一个更短但合法的列表或对象，
+    会被当作完整结果，后面的节点或待办项就此丢失。
+    """
+    stack, in_string = _scan(strip_fences(text))
+    return bool(stack) or in_string
+
+
+def replace_smart_quotes(text: str) -> str:
+    return text.translate(_SMART_QUOTES)
+
+
+# 依次叠加的本地修复，前面的修复成功后不再尝试后面的
+REPAIRS: List[Tuple[str, Callable[[str], str]]] = [
+    ("fences", strip_fences),
+    ("trailing_commas", remove_trailing_commas),
+    # 中文内容里本身就有弯引号，只在其余修复都无效时才替换
+    ("smart_quotes", replace_smart_quotes),
+]
+
+
+def loads_with_repair(text: str) -> Tuple[Any, List[str]]:
+    """
+    解析模型输出的JSON，失败时依次尝试本地修复
+
+    Returns:
+        解析结果，以及实际用到的修复步骤（直接解析成功时为空）
+
+    Raises:
+        TruncatedJSONError: 输出被截断
+        json.JSONDecodeError: 所有本地修复都无效
+    """
+    try:
+        return json.loads(text), []
+    except json.JSONDecodeError as e:
+        error = e
+
+    if is_truncated(text):
+        raise TruncatedJSONError("输出被截断，JSON不完整", text, len(text))
+
+    applied: List[str] = []
+    for name, repair in REPAIRS:
+        repaired = repair(text)
+        if repaired == text:
+            continue
+        text = repaired
+        applied.append(name)
+        try:
+            return json.loads(text), applied
+        except json.JSONDecodeError as e:
+            error = e
+    raise error
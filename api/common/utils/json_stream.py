@@ -0,0 +1,131 @@
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+PathItem = Union[str, int]
+Path = Tuple[PathItem, ...]
+
+
+class IncrementalJSONParser:
+    """
+    增量解析流式输出的JSON，某个位置上的值一闭合就立即返回
+
+    模型输出前后的 ```json 代码块标记和说明文字会被跳过。路径中的 "*" 匹配任意键或下标，
+    例如 ("nodes", "*") 匹配 nodes 对象下的每个节点，("*",) 匹配根对象的每个字段；
+    只有对象、数组和字符串会被单独返回。
+    """
+
+    def __init__(self, paths: Sequence[Path]):
+        self.paths = [tuple(path) for path in paths]
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._stack: List[Dict[str, Any]] = []
+        self._string_start: Optional[int] = None
+        self._escape = False
+
+    def _matches(self, path: Path) -> bool:
+        return any(
+            len(pattern) == len(path)
+            and all(p == "*" or p == k for p, k in zip(pattern, path))
+            for pattern in self.paths
+        )
+
+    def _child_path(self) -> Path:
+        if not self._stack:
+            return ()
+        frame = self._stack[-1]
+        if frame["kind"] == "{":
+            return frame["path"] + (frame["key"],)
+        return frame["path"] + (frame["index"],)
+
+    def _emit(self, path: Path, start: int, end: int, items: List[Tuple[Path, Any]]):
+        if not self._matches(path):
+            return
+        try:
+            items.append((path, json.loads(self.buffer[start:end])))
+        except ValueError:
+            # 值本身不合法时不返回，由完整输出的解析兜底
+            pass
+
+    def feed(self, text: str) -> List[Tuple[Path, Any]]:
+        """追加一段输出，返回其中新闭合的 (路径, 值)"""
+        self.buffer += text
+        items: List[Tuple[Path, Any]] = []
+        while self._pos < len(self.buffer) and not self.done:
+            i, char = self._pos, self.buffer[self._pos]
+            self._pos += 1
+
+            if self._string_start is not None:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    start, self._string_start = self._string_start, None
+                    frame = self._stack[-1]
+                    if frame["kind"] == "{" and frame["expect_key"]:
+                        try:
+                            frame["key"] = json.loads(self.buffer[start : i + 1])
+                        except ValueError:
+                            frame["key"] = self.buffer[start + 1 : i]
+                    else:
+                        self._emit(self._child_path(), start, i + 1, items)
+                continue
+
+            if not self._stack:
+                # 根值之前的代码块标记和说明文字
+                if char in "{[":
+                    self._stack.append(self._frame(char, i, ()))
+                continue
+
+            frame = self._stack[-1]
+            if char == '"':
+                self._string_start = i
+            elif char in "{[":
+                self._stack.append(self._frame(char, i, self._child_path()))
+            elif char in "}]":
+                self._stack.pop()
+                self._emit(frame["path"], frame["start"], i + 1, items)
+                if not self._stack:
+                    self.done = True
+            elif char == ":":
+                frame["expect_key"] = False
+            elif char == ",":
+                if frame["kind"] == "{":
+                    frame["expect_key"] = True
+                    frame["key"] = None
+                else:
+                    frame["index"] += 1
+        return items
+
+    @staticmethod
+    def _frame(kind: str, start: int, path: Path) -> Dict[str, Any]:
+        return {
+            "kind": kind,
+            "start": start,
+            "path": path,
+            "key": None,
+            "index": 0,
+            "expect_key": kind == "{",
+        }
+
+
+async def astream_json(
+    runnable,
+    inputs: Any,
+    paths: Sequence[Path],
+    on_item: Callable[[Path, Any], None],
+) -> str:
+    """
+    流式调用模型，输出中匹配 paths 的值一闭合就交给 on_item，返回完整的输出文本
+
+    完整文本仍按原来的方式解析，增量结果只用于提前展示进度。
+    """
+    parser = IncrementalJSONParser(paths)
+    content = ""
+    async for chunk in runnable.astream(inputs):
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        content += text
+        for path, value in parser.feed(text):
+            on_item(path, value)
+    return content
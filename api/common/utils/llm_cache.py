@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import threading
+import traceback
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from common.utils.json_repair import loads_with_repair
+from dal.dao.llm_cache import LLMCacheDAO
+from dal.database import get_db
+from settings import settings
+
+# 两级缓存共享的进程内LRU及命中统计，所有开启缓存的模型实例共用
+_memory: "OrderedDict[str, RETURN_VAL_TYPE]" = OrderedDict()
+_lock = threading.Lock()
+_stats: Dict[str, int] = {
+    "memory_hits": 0,
+    "db_hits": 0,
+    "misses": 0,
+    "writes": 0,
+    "rejected": 0,
+    "rejected_hits": 0,
+    "evicted": 0,
+}
+
+
+def _incr(name: str, value: int = 1):
+    with _lock:
+        _stats[name] += value
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+        stats["memory_size"] = len(_memory)
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    stats["hit_rate"] = (
+        round((stats["memory_hits"] + stats["db_hits"]) / lookups, 4) if lookups else 0
+    )
+    return stats
+
+
+def is_json_response(generations: RETURN_VAL_TYPE) -> bool:
+    """
+    仅缓存可以解析为JSON的回复（允许经本地修复），避免解析失败后重试时
+    再次命中同一个错误结果
+    """
+    try:
+        loads_with_repair(generations[0].text)
+        return True
+    except Exception:
+        return False
+
+
+class LLMCache(BaseCache):
+    """
+    按内容寻址的两级LLM响应缓存
+
+    键为模型参数（模型名称、温度等）与提示词消息序列化结果的sha256。先查进程内LRU，
+    未命中再查Postgres；Postgres中的缓存带有TTL，并按总大小淘汰最久未使用的条目。
+    缓存读写失败只记录日志，不影响LLM调用。
+
+    缓存由所有模型实例共用，其他实例写入的、或校验规则变更前写入的结果不一定满足
+    本实例的validator，因此读取时同样校验，不通过按未命中处理。
+    """
+
+    def __init__(
+        self, validator: Optional[Callable[[RETURN_VAL_TYPE], bool]] = None
+    ):
+        self.validator = validator
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _remember(key: str, value: RETURN_VAL_TYPE):
+        with _lock:
+            _memory[key] = value
+            _memory.move_to_end(key)
+            while len(_memory) > settings.LLM_CACHE_MEMORY_SIZE:
+                _memory.popitem(last=False)
+
+    def _lookup_memory(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        with _lock:
+            value = _memory.get(key)
+            if value is None:
+                return None
+            _memory.move_to_end(key)
+        if not self._accept_hit(value):
+            return None
+        _incr("memory_hits")
+        return value
+
+    def _lookup_db(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        db = next(get_db())
+        try:
+            value = LLMCacheDAO.get_value(db, key)
+            db.commit()
+        except Exception:
+            traceback.print_exc()
+            return None
+        finally:
+            db.close()
+
+        if value is None:
+            return None
+        generations = loads(value)
+        if not self._accept_hit(generations):
+            return None
+        self._remember(key, generations)
+        _incr("db_hits")
+        return generations
+
+    def _update_db(self, key: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        db = next(get_db())
+        try:
+            LLMCacheDAO.upsert(
+                db,
+                key,
+                llm_string,
+                dumps(list(return_val)),
+                settings.LLM_CACHE_TTL_SECONDS,
+            )
+            db.commit()
+
+            with _lock:
+                _stats["writes"] += 1
+                should_evict = _stats["writes"] % settings.LLM_CACHE_EVICT_EVERY == 0
+            if should_evict:
+                _incr("evicted", LLMCacheDAO.evict(db, settings.LLM_CACHE_MAX_BYTES))
+                db.commit()
+        except Exception:
+            traceback.print_exc()
+            db.rollback()
+        finally:
+            db.close()
+
+    def _accept(self, return_val: RETURN_VAL_TYPE) -> bool:
+        if self.validator is None or self.validator(return_val):
+            return True
+        _incr("rejected")
+        return False
+
+    def _accept_hit(self, value: RETURN_VAL_TYPE) -> bool:
+        if self.validator is None or self.validator(value):
+            return True
+        _incr("rejected_hits")
+        return False
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        value = self._lookup_memory(key) or self._lookup_db(key)
+        if value is None:
+            _incr("misses")
+        return value
+
+    async def alookup(
+        self, prompt: str, llm_string: str
+    ) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        value = self._lookup_memory(key) or await asyncio.to_thread(
+            self._lookup_db, key
+        )
+        if value is None:
+            _incr("misses")
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        if not self._accept(return_val):
+            return
+        key = self._key(prompt, llm_string)
+        self._remember(key, return_val)
+        self._update_db(key, llm_string, return_val)
+
+    async def aupdate(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE
+    ):
+        if not self._accept(return_val):
+            return
+        key = self._key(prompt, llm_string)
+        self._remember(key, return_val)
+        await asyncio.to_thread(self._update_db, key, llm_string, return_val)
+
+    def clear(self, **kwargs: Any):
+        with _lock:
+            _memory.clear()
+        db = next(get_db())
+        try:
+            LLMCacheDAO.clear(db)
+            db.commit()
+        finally:
+            db.close()
+
+
+def get_llm_cache(
+    validator: Optional[Callable[[RETURN_VAL_TYPE], bool]] = None,
+) -> Optional[LLMCache]:
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return LLMCache(validator=validator)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_core.load import dumpd, dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from settings import settings
+
+_lock = threading.Lock()
+_stats: Dict[str, int] = {"recorded": 0, "replayed": 0, "missing": 0}
+
+
+class CassetteMissingError(LookupError):
+    """回放模式下找不到对应的录制结果"""
+
+
+def cassette_mode() -> str:
+    """record: 调用模型并录制；replay: 只回放录制结果，不访问网络；其他值不启用"""
+    return settings.LLM_CASSETTE_MODE
+
+
+def _incr(name: str):
+    with _lock:
+        _stats[name] += 1
+
+
+def get_cassette_stats() -> Dict[str, Any]:
+    with _lock:
+        return {"mode": cassette_mode() or None, **_stats}
+
+
+def cassette_key(
+    model: str,
+    temperature: Optional[float],
+    messages: List[BaseMessage],
+    stop: Optional[List[str]],
+    kwargs: Dict[str, Any],
+) -> str:
+    """
+    录制结果的键：模型、温度、提示词消息及绑定的工具等参数的sha256
+
+    消息ID、运行ID等每次不同的字段不参与计算，保证同样的提示词总能命中同一条录制结果。
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "temperature": temperature,
+            "messages": [
+                {"type": m.type, "content": m.content, "tool_calls": _tool_calls(m)}
+                for m in messages
+            ],
+            "stop": stop,
+            "kwargs": kwargs,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _tool_calls(message: BaseMessage) -> list:
+    return [
+        {"name": call["name"], "args": call["args"]}
+        for call in getattr(message, "tool_calls", None) or []
+    ]
+
+
+def _path(key: str) -> str:
+    return os.path.join(settings.LLM_CASSETTE_DIR, f"{key}.json")
+
+
+def load_cassette(key: str) -> Dict[str, Any]:
+    """
+    Raises:
+        CassetteMissingError: 没有录制过该请求
+    """
+    try:
+        with open(_path(key), encoding="utf-8") as f:
+            record = json.load(f)
+    except FileNotFoundError:
+        _incr("missing")
+        raise CassetteMissingError(f"没有找到LLM录制结果 {key}，请先以record模式运行")
+    _incr("replayed")
+    return record
+
+
+def _save(key: str, model: str, messages: List[BaseMessage], record: Dict[str, Any]):
+    os.makedirs(settings.LLM_CASSETTE_DIR, exist_ok=True)
+    record = {
+        "key": key,
+        "model": model,
+        # 只用于查看，回放时不读取
+        "messages": [dumpd(m) for m in messages],
+        **record,
+    }
+    tmp_path = f"{_path(key)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, _path(key))
+    _incr("recorded")
+
+
+def save_result(key: str, model: str, messages: List[BaseMessage], result: ChatResult):
+    _save(
+        key,
+        model,
+        messages,
+        {
+            "generations": dumps(result.generations),
+            "llm_output": result.llm_output,
+        },
+    )
+
+
+def save_chunks(
+    key: str,
+    model: str,
+    messages: List[BaseMessage],
+    chunks: List[ChatGenerationChunk],
+):
+    _save(key, model, messages, {"chunks": dumps(chunks)})
+
+
+def replay_result(record: Dict[str, Any]) -> ChatResult:
+    if "generations" in record:
+        return ChatResult(
+            generations=loads(record["generations"]),
+            llm_output=record.get("llm_output"),
+        )
+    # 录制时是流式调用，合并分片得到完整结果
+    chunks: List[ChatGenerationChunk] = loads(record["chunks"])
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged += chunk
+    message = merged.message
+    return ChatResult(
+        generations=[
+            ChatGeneration(
+                message=AIMessage(
+                    content=message.content,
+                    additional_kwargs=message.additional_kwargs,
+                    response_metadata=message.response_metadata,
+                    tool_calls=getattr(message, "tool_calls", []),
+                    usage_metadata=message.usage_metadata,
+                ),
+                generation_info=merged.generation_info,
+            )
+        ]
+    )
+
+
+def replay_chunks(record: Dict[str, Any]) -> List[ChatGenerationChunk]:
+    if "chunks" in record:
+        return loads(record["chunks"])
+    # 录制时是非流式调用，整条回复作为一个分片回放
+    chunks = []
+    for generation in loads(record["generations"]):
+        message = generation.message
+        chunks.append(
+            ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=message.content,
+                    additional_kwargs=message.additional_kwargs,
+                    response_metadata=message.response_metadata,
+                    usage_metadata=message.usage_metadata,
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"], ensure_ascii=False),
+                            "id": call.get("id"),
+                            "index": index,
+                        }
+                        for index, call in enumerate(message.tool_calls)
+                    ],
+                ),
+                generation_info=generation.generation_info,
+            )
+        )
+    return chunks
@@ -0,0 +1,248 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from common.enums.error_code import ErrorCode
+from common.enums.job import JobType
+from common.enums.llm import LLMPriority
+from common.exceptions.general_exception import GeneralException
+from dal.dao.job import JobDAO
+from dal.dao.llm_rate import LLMRateDAO
+from dal.database import get_db
+from settings import settings
+
+# 当前调用链的优先级，由任务处理和对话接口在入口处设置
+_current_priority: ContextVar[LLMPriority] = ContextVar(
+    "llm_priority", default=LLMPriority.STANDARD
+)
+
+_stats: Dict[str, int] = {"acquired": 0, "throttled": 0, "rejected": 0}
+
+
+@contextmanager
+def llm_priority(priority: LLMPriority):
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数，中文约1字1token，英文约4字符1token"""
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return (len(text) - ascii_chars) + ascii_chars // 4 + 1
+
+
+def _limits(model: str) -> Tuple[int, int]:
+    limits = settings.LLM_RATE_LIMITS.get(model, settings.LLM_RATE_LIMITS["default"])
+    return limits["rpm"], limits["tpm"]
+
+
+class _PrioritySemaphore:
+    """按优先级唤醒等待者的信号量，同优先级先到先得"""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: LLMPriority):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已经被唤醒但随即取消时，把名额交给下一个等待者
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+
+@dataclass
+class LLMPermit:
+    model: str
+    estimated_tokens: int
+    priority: LLMPriority
+
+
+class LLMGovernor:
+    """
+    全局LLM并发与速率控制
+
+    进程内按模型限制同时进行的调用数，等待者按优先级（对话 > 需求澄清 > 批量生成）
+    依次放行；跨进程的每分钟请求数和token数通过Postgres中按分钟聚合的计数行控制，
+    低优先级的调用只能使用额度的一部分，为对话预留余量。
+    """
+
+    def __init__(self):
+        self._semaphores: Dict[str, _PrioritySemaphore] = {}
+
+    def _semaphore(self, model: str) -> _PrioritySemaphore:
+        if model not in self._semaphores:
+            concurrency = settings.LLM_MAX_CONCURRENCY.get(
+                model, settings.LLM_MAX_CONCURRENCY["default"]
+            )
+            self._semaphores[model] = _PrioritySemaphore(concurrency)
+        return self._semaphores[model]
+
+    @staticmethod
+    def _try_acquire_window(model: str, tokens: int, priority: LLMPriority) -> bool:
+        rpm, tpm = _limits(model)
+        share = settings.LLM_PRIORITY_SHARE[priority.name.lower()]
+        db = next(get_db())
+        try:
+            acquired = LLMRateDAO.try_acquire(
+                db,
+                model,
+                tokens,
+                max(int(rpm * share), 1),
+                max(int(tpm * share), tokens),
+            )
+            db.commit()
+            return acquired
+        except Exception:
+            # 计数表不可用时不阻塞调用，由进程内并发限制兜底
+            traceback.print_exc()
+            db.rollback()
+            return True
+        finally:
+            db.close()
+
+    @staticmethod
+    def _seconds_to_next_window() -> float:
+        return 60 - time.time() % 60 + 0.05
+
+    async def acquire(self, model: str, estimated_tokens: int) -> LLMPermit:
+        if not settings.LLM_GOVERNOR_ENABLED:
+            return LLMPermit(model, estimated_tokens, _current_priority.get())
+
+        priority = _current_priority.get()
+        semaphore = self._semaphore(model)
+        while True:
+            await semaphore.acquire(priority)
+            try:
+                acquired = await asyncio.to_thread(
+                    self._try_acquire_window, model, estimated_tokens, priority
+                )
+            except BaseException:
+                semaphore.release()
+                raise
+            if acquired:
+                break
+            # 本分钟额度已用完，让出并发名额，等下一个窗口再按优先级排队
+            semaphore.release()
+            _stats["throttled"] += 1
+            await asyncio.sleep(self._seconds_to_next_window())
+        _stats["acquired"] += 1
+        return LLMPermit(model, estimated_tokens, priority)
+
+    async def release(self, permit: LLMPermit, actual_tokens: int = 0):
+        if not settings.LLM_GOVERNOR_ENABLED:
+            return
+        self._semaphore(permit.model).release()
+        if actual_tokens and actual_tokens != permit.estimated_tokens:
+            await asyncio.to_thread(
+                self._add_tokens, permit.model, actual_tokens - permit.estimated_tokens
+            )
+
+    @staticmethod
+    def _add_tokens(model: str, tokens: int):
+        """按实际用量修正预估的token数"""
+        db = next(get_db())
+        try:
+            LLMRateDAO.add_tokens(db, model, tokens)
+            db.commit()
+        except Exception:
+            traceback.print_exc()
+            db.rollback()
+        finally:
+            db.close()
+
+    def acquire_sync(self, model: str, estimated_tokens: int) -> LLMPermit:
+        """同步调用只受跨进程速率限制"""
+        priority = _current_priority.get()
+        while settings.LLM_GOVERNOR_ENABLED and not self._try_acquire_window(
+            model, estimated_tokens, priority
+        ):
+            _stats["throttled"] += 1
+            time.sleep(self._seconds_to_next_window())
+        return LLMPermit(model, estimated_tokens, priority)
+
+    def release_sync(self, permit: LLMPermit, actual_tokens: int = 0):
+        if not settings.LLM_GOVERNOR_ENABLED:
+            return
+        if actual_tokens and actual_tokens != permit.estimated_tokens:
+            self._add_tokens(permit.model, actual_tokens - permit.estimated_tokens)
+
+    @staticmethod
+    def cleanup():
+        """删除已过去的计数窗口"""
+        db = next(get_db())
+        try:
+            LLMRateDAO.delete_old_windows(db)
+            db.commit()
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict:
+        return {
+            **_stats,
+            "waiting": {
+                model: semaphore.waiting
+                for model, semaphore in self._semaphores.items()
+            },
+        }
+
+
+governor = LLMGovernor()
+
+
+def check_admission(db: Session, job_type: JobType):
+    """
+    任务入队前的准入控制：排队任务过多时直接返回429，而不是接收注定超时失败的任务
+
+    Raises:
+        GeneralException: 积压超过上限时抛出，附带Retry-After
+    """
+    max_backlog = settings.LLM_ADMISSION_MAX_BACKLOG.get(job_type.value)
+    if not max_backlog:
+        return
+    backlog = JobDAO.count_active_jobs(db, job_type)
+    if backlog < max_backlog:
+        return
+
+    _stats["rejected"] += 1
+    concurrency = max(settings.JOB_CONCURRENCY.get(job_type.value, 1), 1)
+    retry_after = math.ceil(
+        (backlog - max_backlog + 1) / concurrency * settings.LLM_ADMISSION_JOB_SECONDS
+    )
+    raise GeneralException(
+        ErrorCode.TOO_MANY_REQUESTS,
+        detail="当前排队任务过多，请稍后重试",
+        headers={"Retry-After": str(max(retry_after, 1))},
+    )
@@ -0,0 +1,240 @@
+import asyncio
+import math
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+import openai
+
+from settings import settings
+
+# 可以换一个端点重试的错误：5xx、限流、超时和连接失败
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and status_code >= 500
+
+
+@dataclass
+class Endpoint:
+    name: str
+    base_url: str
+    api_key: str
+    ewma_latency: Optional[float] = None
+    ewma_error: float = 0.0
+    in_flight: int = 0
+    consecutive_failures: int = 0
+    down_until: float = 0.0
+    latencies: Deque[float] = field(
+        default_factory=lambda: deque(maxlen=settings.LLM_LATENCY_WINDOW)
+    )
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(math.ceil(len(ordered) * 0.95) - 1, len(ordered) - 1)]
+
+    def score(self) -> float:
+        """
+        预期耗时：延迟EWMA按排队数和错误率放大，每次失败约浪费一个默认对冲延迟；
+        没有成功样本且没有失败的端点得分为0，会被优先探测
+        """
+        latency = self.ewma_latency if self.ewma_latency is not None else 0.0
+        return (
+            latency * (1 + self.in_flight) / max(1 - self.ewma_error, 0.05)
+            + self.ewma_error * settings.LLM_HEDGE_DEFAULT_DELAY
+        )
+
+
+class LLMRouter:
+    """
+    OpenAI兼容端点池的路由
+
+    按延迟与错误率的EWMA选择预期最快的端点；连续失败的端点熔断一段时间，
+    由后台健康检查或熔断到期后的下一次请求恢复。
+    """
+
+    def __init__(self, endpoints: List[Endpoint]):
+        self.endpoints = endpoints
+
+    @property
+    def multi(self) -> bool:
+        return len(self.endpoints) > 1
+
+    def choose(self, exclude: Optional[List[str]] = None) -> Optional[Endpoint]:
+        exclude = exclude or []
+        candidates = [e for e in self.endpoints if e.name not in exclude]
+        if not candidates:
+            return None
+        available = [e for e in candidates if e.available]
+        # 全部熔断时仍选择最早恢复的端点，而不是直接失败
+        if not available:
+            return min(candidates, key=lambda e: e.down_until)
+        return min(available, key=lambda e: e.score())
+
+    def record(self, endpoint: Endpoint, latency: float, ok: bool):
+        alpha = settings.LLM_EWMA_ALPHA
+        endpoint.ewma_error = (
+            alpha * (0 if ok else 1) + (1 - alpha) * endpoint.ewma_error
+        )
+        if ok:
+            endpoint.latencies.append(latency)
+            endpoint.ewma_latency = (
+                latency
+                if endpoint.ewma_latency is None
+                else alpha * latency + (1 - alpha) * endpoint.ewma_latency
+            )
+            endpoint.consecutive_failures = 0
+            endpoint.down_until = 0.0
+            return
+
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= settings.LLM_ENDPOINT_FAILURE_THRESHOLD:
+            endpoint.down_until = time.monotonic() + settings.LLM_ENDPOINT_COOLDOWN
+            print(f"LLM端点 {endpoint.name} 连续失败，暂停使用")
+
+    async def call(
+        self,
+        func: Callable[[Endpoint], Awaitable[Any]],
+        hedge: bool = False,
+    ) -> Any:
+        """
+        在端点池上执行一次调用，5xx、超时等错误时自动切换到下一个端点
+
+        Args:
+            func: 接收端点并发起请求的协程函数
+            hedge: 是否对冲请求：主请求超过该端点p95延迟仍未返回时，
+                向另一个端点发出第二个请求，取先成功的结果
+        """
+        tried: List[str] = []
+        last_error: Optional[BaseException] = None
+        while True:
+            endpoint = self.choose(exclude=tried)
+            if endpoint is None:
+                raise last_error or RuntimeError("没有可用的LLM端点")
+            tried.append(endpoint.name)
+            try:
+                if hedge and self.multi:
+                    return await self._hedged(func, endpoint, tried)
+                return await self._timed(func, endpoint)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                last_error = e
+                print(f"LLM端点 {endpoint.name} 调用失败，尝试切换: {e}")
+
+    async def _timed(self, func, endpoint: Endpoint) -> Any:
+        start = time.monotonic()
+        endpoint.in_flight += 1
+        try:
+            result = await func(endpoint)
+        except Exception as e:
+            self.record(endpoint, time.monotonic() - start, ok=not is_retryable(e))
+            raise
+        finally:
+            endpoint.in_flight -= 1
+        self.record(endpoint, time.monotonic() - start, ok=True)
+        return result
+
+    async def _hedged(self, func, primary: Endpoint, tried: List[str]) -> Any:
+        delay = primary.p95() or settings.LLM_HEDGE_DEFAULT_DELAY
+        tasks = {asyncio.create_task(self._timed(func, primary))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                secondary = self.choose(exclude=tried)
+                if secondary is not None:
+                    tried.append(secondary.name)
+                    print(f"LLM请求超过 {delay:.1f}s 未返回，对冲到 {secondary.name}")
+                    tasks.add(asyncio.create_task(self._timed(func, secondary)))
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error  # type: ignore[misc]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def health_check(self, http_client: httpx.AsyncClient):
+        """探测熔断中的端点，恢复后重新参与路由"""
+        for endpoint in self.endpoints:
+            if endpoint.available:
+                continue
+            try:
+                response = await http_client.get(
+                    f"{endpoint.base_url.rstrip('/')}/models",
+                    headers={"Authorization": f"Bearer {endpoint.api_key}"},
+                    timeout=10,
+                )
+                if response.status_code < 500:
+                    endpoint.consecutive_failures = 0
+                    endpoint.down_until = 0.0
+                    print(f"LLM端点 {endpoint.name} 已恢复")
+            except Exception:
+                traceback.print_exc()
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": e.name,
+                "base_url": e.base_url,
+                "available": e.available,
+                "ewma_latency": e.ewma_latency,
+                "ewma_error": round(e.ewma_error, 4),
+                "p95": e.p95(),
+                "in_flight": e.in_flight,
+            }
+            for e in self.endpoints
+        ]
+
+
+def _load_endpoints() -> List[Endpoint]:
+    if settings.OPENAI_ENDPOINTS:
+        return [
+            Endpoint(
+                name=config.get("name") or config["base_url"],
+                base_url=config["base_url"],
+                api_key=config.get("api_key") or settings.OPENAI_API_KEY,
+            )
+            for config in settings.OPENAI_ENDPOINTS
+        ]
+    return [
+        Endpoint(
+            name="default",
+            base_url=settings.OPENAI_API_BASE,
+            api_key=settings.OPENAI_API_KEY,
+        )
+    ]
+
+
+router = LLMRouter(_load_endpoints())
+
+
+async def run_health_checks(http_client: httpx.AsyncClient):
+    while True:
+        await asyncio.sleep(settings.LLM_ENDPOINT_HEALTH_INTERVAL)
+        await router.health_check(http_client)
@@ -0,0 +1,261 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from common.utils.get_llm_model import get_llm_model
+from common.utils.llm_governor import estimate_tokens
+from settings import settings
+
+_stats_lock = threading.Lock()
+
+
+class _StageMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        # 命中模型服务端前缀缓存的输入token数
+        self.cached_tokens = 0
+        self.over_budget = 0
+        # 提示词开头一段的哈希，同一环节出现多个值说明前缀不稳定，无法命中缓存
+        self.prefixes: Set[str] = set()
+        self.cost = 0.0
+        self.latencies: Deque[float] = deque(maxlen=settings.LLM_LATENCY_WINDOW)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return round(ordered[max(math.ceil(len(ordered) * q) - 1, 0)], 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        succeeded = self.calls - self.errors
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_hit_ratio": (
+                round(self.cached_tokens / self.input_tokens, 4)
+                if self.input_tokens
+                else 0.0
+            ),
+            "prefix_variants": len(self.prefixes),
+            "over_budget": self.over_budget,
+            "cost_usd": round(self.cost, 6),
+            "cost_per_call_usd": round(self.cost / succeeded, 6) if succeeded else None,
+        }
+
+
+# (环节, 实验分组, 模型) -> 指标
+_metrics: Dict[Tuple[str, str, str], _StageMetrics] = {}
+
+
+def _price(
+    model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0
+) -> float:
+    price = settings.LLM_MODEL_PRICES.get(model)
+    if not price:
+        return 0.0
+    input_price = price.get("input", 0.0)
+    cached_price = price.get("cached_input", input_price)
+    return (
+        (input_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + output_tokens * price.get("output", 0.0)
+    ) / 1_000_000
+
+
+@dataclass
+class _Usage:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    prefix: Optional[str] = None
+
+
+def _record(key: Tuple[str, str, str], latency: float, ok: bool, usage: _Usage):
+    with _stats_lock:
+        metrics = _metrics.setdefault(key, _StageMetrics())
+        metrics.calls += 1
+        if usage.prefix and len(metrics.prefixes) < 32:
+            metrics.prefixes.add(usage.prefix)
+        if not ok:
+            metrics.errors += 1
+            return
+        metrics.latencies.append(latency)
+        metrics.input_tokens += usage.input_tokens
+        metrics.output_tokens += usage.output_tokens
+        metrics.cached_tokens += usage.cached_tokens
+        metrics.cost += _price(
+            key[2], usage.input_tokens, usage.output_tokens, usage.cached_tokens
+        )
+        budget = settings.LLM_STAGE_PROMPT_BUDGETS.get(key[0])
+        if budget and usage.input_tokens > budget:
+            metrics.over_budget += 1
+            print(
+                f"LLM环节 {key[0]} 的提示词 {usage.input_tokens} tokens "
+                f"超出预算 {budget}"
+            )
+
+
+class StageMetricsHandler(BaseCallbackHandler):
+    """
+    按环节记录每次模型调用的延迟、token用量、前缀缓存命中和成本，
+    降级链中的每次尝试分别记录
+    """
+
+    run_inline = True
+
+    def __init__(self, stage: str, variant: str):
+        self.stage = stage
+        self.variant = variant
+        self._runs: Dict[UUID, Tuple[str, float, _Usage]] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or "unknown"
+        prompt = "".join(str(m.content) for batch in messages for m in batch)
+        prefix = prompt[: settings.LLM_PROMPT_PREFIX_CHARS].encode()
+        usage = _Usage(
+            input_tokens=estimate_tokens(prompt),
+            prefix=hashlib.sha1(prefix).hexdigest()[:12],
+        )
+        self._runs[run_id] = (model, time.monotonic(), usage)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        model, start, usage = run
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                metadata = getattr(message, "usage_metadata", None)
+                if metadata:
+                    # 有实际用量时以实际用量为准，流式响应通常没有用量，只能估算
+                    usage.input_tokens = metadata.get(
+                        "input_tokens", usage.input_tokens
+                    )
+                    usage.output_tokens += metadata.get("output_tokens", 0)
+                    details = metadata.get("input_token_details") or {}
+                    usage.cached_tokens += details.get("cache_read") or 0
+                else:
+                    usage.output_tokens += estimate_tokens(generation.text)
+        key = (self.stage, self.variant, model)
+        _record(key, time.monotonic() - start, True, usage)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        model, start, usage = run
+        key = (self.stage, self.variant, model)
+        _record(key, time.monotonic() - start, False, usage)
+
+
+def _route(stage: str) -> Dict[str, Any]:
+    route = settings.LLM_STAGE_ROUTES.get(stage)
+    if route is None:
+        print(f"LLM环节 {stage} 未配置路由，使用默认档位 {settings.LLM_DEFAULT_TIER}")
+        return {"tier": settings.LLM_DEFAULT_TIER}
+    return route
+
+
+def _tier_runnable(
+    tier: str,
+    temperature: float,
+    tools: Optional[Sequence[Any]],
+    tool_choice: Optional[str],
+    **model_options: Any,
+) -> Runnable:
+    """档位内的主模型加降级链，主模型调用失败时依次尝试后面的模型"""
+    runnables: List[Runnable] = []
+    for model_name in settings.LLM_MODEL_TIERS[tier]:
+        model = get_llm_model(
+            model_name=model_name, temperature=temperature, **model_options
+        )
+        if tools is not None:
+            runnables.append(model.bind_tools(tools, tool_choice=tool_choice))
+        else:
+            runnables.append(model)
+    primary, fallbacks = runnables[0], runnables[1:]
+    return primary.with_fallbacks(fallbacks) if fallbacks else primary
+
+
+def get_stage_llm(
+    stage: str,
+    temperature: float = 0.5,
+    tools: Optional[Sequence[Any]] = None,
+    tool_choice: Optional[str] = None,
+    **model_options: Any,
+) -> Runnable:
+    """
+    按 LLM_STAGE_ROUTES 返回某个图节点使用的模型
+
+    Args:
+        stage: 环节名，如 blueprint.mermaid、chat.decision、workflow.planner
+        temperature: 默认温度，路由中配置了temperature时以路由为准
+        tools: 需要绑定的工具，降级链中的每个模型都会绑定
+        tool_choice: 工具选择方式，同 bind_tools
+        model_options: 透传给 get_llm_model 的参数（cache、cache_validator、hedge）
+    """
+    route = _route(stage)
+    temperature = route.get("temperature", temperature)
+
+    def variant(name: str, tier: str) -> Runnable:
+        return _tier_runnable(
+            tier, temperature, tools, tool_choice, **model_options
+        ).with_config(
+            run_name=stage,
+            tags=[f"llm_stage:{stage}", f"llm_variant:{name}"],
+            callbacks=[StageMetricsHandler(stage, name)],
+        )
+
+    control = variant("control", route["tier"])
+    experiment = route.get("experiment") or {}
+    ratio = experiment.get("ratio", 0.0)
+    if not experiment.get("tier") or ratio <= 0:
+        return control
+
+    treatment = variant("experiment", experiment["tier"])
+    # 每次调用独立抽样，返回的Runnable会以同样的输入和配置继续执行
+    return RunnableLambda(
+        lambda _: treatment if random.random() < ratio else control,
+        name=f"{stage}.ab",
+    )
+
+
+def get_llm_stage_stats() -> Dict[str, Any]:
+    stages: Dict[str, Dict[str, Any]] = {}
+    with _stats_lock:
+        for (stage, variant, model), metrics in sorted(_metrics.items()):
+            entry = stages.setdefault(
+                stage, {"route": settings.LLM_STAGE_ROUTES.get(stage), "models": []}
+            )
+            entry["models"].append(
+                {"variant": variant, "model": model, **metrics.to_dict()}
+            )
+    return stages
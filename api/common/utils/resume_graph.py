@@ -0,0 +1,53 @@
+import inspect
+from typing import Any, Callable, Optional
+
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.types import Command
+
+
+async def ainvoke_with_resume(
+    app,
+    graph_input,
+    config: RunnableConfig,
+    on_progress: Optional[Callable[[dict], Any]] = None,
+):
+    """
+    执行带检查点的图；若该thread已有未完成的检查点，则从检查点继续执行
+
+    任务因进程重启等原因被重新领取时，已完成的节点不会重复调用LLM。
+
+    Args:
+        app: 已编译且带有checkpointer的图
+        graph_input: 首次执行时的输入，或恢复中断时的Command
+        config: 包含thread_id的运行配置
+        on_progress: 接收节点流式生成过程中推送的部分结果，可以是协程函数，
+            返回的协程执行完毕后才继续读取下一个事件
+
+    Returns:
+        图执行结束后的状态
+    """
+    snapshot = await app.aget_state(config)
+
+    # 图已执行完毕，直接返回最终状态
+    if snapshot.values and not snapshot.next:
+        return snapshot.values
+
+    if snapshot.next:
+        pending_interrupt = any(task.interrupts for task in snapshot.tasks)
+        if not (pending_interrupt and isinstance(graph_input, Command)):
+            graph_input = None
+
+    if on_progress is None:
+        return await app.ainvoke(graph_input, config=config)
+
+    values = None
+    async for mode, payload in app.astream(
+        graph_input, config=config, stream_mode=["custom", "values"]
+    ):
+        if mode == "custom":
+            result = on_progress(payload)
+            if inspect.isawaitable(result):
+                await result
+        else:
+            values = payload
+    return values
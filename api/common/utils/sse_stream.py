@@ -0,0 +1,85 @@
+import asyncio
+import json
+from contextlib import suppress
+from typing import AsyncIterator, Dict
+
+_DONE = object()
+
+
+async def coalesce_events(
+    events: AsyncIterator[Dict],
+    max_chars: int,
+    max_delay: float,
+    queue_size: int,
+) -> AsyncIterator[Dict]:
+    """
+    把逐token的 {"chunk": ...} 事件合并成帧，其他事件原样立即发送
+
+    图在后台任务中运行，事件先进入有界队列：客户端读得慢时队列写满，图的执行随之暂停；
+    客户端断开时本生成器被关闭，后台任务随即取消，不再继续调用模型。
+
+    Args:
+        events: 事件来源
+        max_chars: 一帧累计到多少字符立即发送
+        max_delay: 一帧中第一个token最多等待多久（秒）就发送
+        queue_size: 队列长度，决定客户端跟不上时最多缓冲多少个事件
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    loop = asyncio.get_running_loop()
+
+    async def produce():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(e)
+            return
+        finally:
+            # 在put处被取消时，事件来源停在yield上，需要显式关闭才会取消图的执行
+            aclose = getattr(events, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    buffer = ""
+    deadline = 0.0
+    try:
+        while True:
+            timeout = max(deadline - loop.time(), 0) if buffer else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield {"chunk": buffer}
+                buffer = ""
+                continue
+
+            if item is _DONE or isinstance(item, Exception):
+                if buffer:
+                    yield {"chunk": buffer}
+                    buffer = ""
+                if item is _DONE:
+                    return
+                raise item
+
+            if item.keys() == {"chunk"}:
+                if not buffer:
+                    deadline = loop.time() + max_delay
+                buffer += item["chunk"]
+                if len(buffer) >= max_chars:
+                    yield {"chunk": buffer}
+                    buffer = ""
+                continue
+
+            if buffer:
+                yield {"chunk": buffer}
+                buffer = ""
+            yield item
+    finally:
+        producer.cancel()
+        with suppress(asyncio.CancelledError):
+            await producer
+
+
+def to_sse_data(event: Dict) -> str:
+    return f"data: {json.dumps(event, ensure_ascii=False)}"
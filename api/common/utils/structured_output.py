@@ -0,0 +1,146 @@
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import TypeAdapter, ValidationError
+
+from common.utils.json_repair import TruncatedJSONError, loads_with_repair
+from common.utils.llm_governor import estimate_tokens
+from common.utils.llm_stage import get_stage_llm
+from settings import settings
+
+REPAIR_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """你是一个JSON修复工具。下面的JSON无法解析或不符合给定的JSON Schema。
+请根据错误信息修正它，尽量保留原有内容，只输出修正后的JSON，不要输出任何解释。
+
+# JSON Schema
+{schema}""",
+        ),
+        ("user", "# 错误信息\n{error}\n\n# 需要修正的JSON\n{text}"),
+    ]
+)
+
+_repair_llm = get_stage_llm("structured.repair", temperature=0)
+_repair_chain = REPAIR_PROMPT | _repair_llm
+
+_lock = threading.Lock()
+# 环节 -> 解析结果计数
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _incr(stage: str, name: str, value: int = 1):
+    with _lock:
+        stats = _stats.setdefault(
+            stage,
+            {
+                "calls": 0,
+                "parsed": 0,
+                "repaired": 0,
+                "reasked": 0,
+                "reask_succeeded": 0,
+                "truncated": 0,
+                "failed": 0,
+                "reask_tokens": 0,
+            },
+        )
+        stats[name] += value
+
+
+def get_structured_output_stats() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        result = {stage: dict(stats) for stage, stats in _stats.items()}
+    for stats in result.values():
+        calls = stats["calls"] or 1
+        stats["repair_rate"] = round(stats["repaired"] / calls, 4)
+        stats["reask_rate"] = round(stats["reasked"] / calls, 4)
+        stats["failure_rate"] = round(stats["failed"] / calls, 4)
+    return result
+
+
+def parse_locally(text: str, schema: Any) -> Any:
+    """
+    本地解析并校验，不调用模型
+
+    Returns:
+        按schema校验后的数据（dict或list）
+
+    Raises:
+        ValueError: JSON无法修复，或不符合schema
+    """
+    data, _ = loads_with_repair(text)
+    adapter = TypeAdapter(schema)
+    return adapter.dump_python(adapter.validate_python(data), mode="json")
+
+
+def _truncated(stage: str, error: TruncatedJSONError) -> ValueError:
+    _incr(stage, "truncated")
+    _incr(stage, "failed")
+    return ValueError(f"{stage} 输出被截断，需要重新生成: {error}")
+
+
+async def parse_structured(
+    text: str, schema: Any, stage: str, max_reasks: Optional[int] = None
+) -> Any:
+    """
+    把模型输出解析为符合schema的数据
+
+    先直接解析，失败时做本地修复（代码块标记、多余逗号、弯引号）；
+    仍不符合schema时，把错误信息和原文交给快速模型修正，
+    只重新生成这一段JSON，而不是重跑整条链路。
+    输出被截断时不交给修正模型：它只会补齐括号，得到缺少后半部分的结果，
+    因此直接失败，由任务重试用原链路重新生成。
+
+    Args:
+        text: 模型输出
+        schema: pydantic模型或类型，如 Workflow、List[TodoItem]
+        stage: 环节名，用于统计修复和重问次数
+        max_reasks: 最多重问几次，默认为 STRUCTURED_OUTPUT_MAX_REASKS
+
+    Raises:
+        ValueError: 输出被截断，或重问后仍无法得到合法的结果
+    """
+    _incr(stage, "calls")
+    adapter = TypeAdapter(schema)
+    error: Exception
+    try:
+        data, repairs = loads_with_repair(text)
+        result = adapter.dump_python(adapter.validate_python(data), mode="json")
+        _incr(stage, "repaired" if repairs else "parsed")
+        if repairs:
+            print(f"{stage} 输出经本地修复后解析成功: {', '.join(repairs)}")
+        return result
+    except TruncatedJSONError as e:
+        raise _truncated(stage, e) from e
+    except (json.JSONDecodeError, ValidationError) as e:
+        error = e
+
+    if max_reasks is None:
+        max_reasks = settings.STRUCTURED_OUTPUT_MAX_REASKS
+    schema_json = json.dumps(adapter.json_schema(), ensure_ascii=False)
+    for attempt in range(max_reasks):
+        print(f"{stage} 输出解析失败，第 {attempt + 1} 次请求修正: {error}")
+        _incr(stage, "reasked")
+        inputs = {"schema": schema_json, "error": str(error)[:2000], "text": text}
+        response = await _repair_chain.ainvoke(inputs)
+        text = str(response.content)
+        _incr(
+            stage,
+            "reask_tokens",
+            estimate_tokens(schema_json + inputs["text"] + text),
+        )
+        try:
+            data, _ = loads_with_repair(text)
+            result = adapter.dump_python(adapter.validate_python(data), mode="json")
+            _incr(stage, "reask_succeeded")
+            return result
+        except TruncatedJSONError as e:
+            raise _truncated(stage, e) from e
+        except (json.JSONDecodeError, ValidationError) as e:
+            error = e
+
+    _incr(stage, "failed")
+    raise ValueError(f"{stage} 输出无法解析为合法的JSON: {error}")
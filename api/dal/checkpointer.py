@@ -1,34 +1,35 @@
 from typing import Optional
 
-from langgraph.checkpoint.postgres import PostgresSaver
-from psycopg import Connection
-from psycopg.rows import DictRow
-from psycopg_pool import ConnectionPool
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg import AsyncConnection
+from psycopg.rows import DictRow, dict_row
+from psycopg_pool import AsyncConnectionPool
 
 from settings import settings
 
-_checkpointer: Optional[PostgresSaver] = None
-_pool: Optional[ConnectionPool[Connection[DictRow]]] = None
+_checkpointer: Optional[AsyncPostgresSaver] = None
+_pool: Optional[AsyncConnectionPool[AsyncConnection[DictRow]]] = None
 
 
-def init_checkpointer():
+async def init_checkpointer():
     global _pool, _checkpointer
-    _pool = ConnectionPool(
+    _pool = AsyncConnectionPool(
         conninfo=settings.DATABASE_URL,
         max_size=20,
-        kwargs={"row_factory": DictRow, "autocommit": True},
-        open=True,
+        kwargs={"row_factory": dict_row, "autocommit": True, "prepare_threshold": 0},
+        open=False,
     )
-    _checkpointer = PostgresSaver(conn=_pool)
-    _checkpointer.setup()
+    await _pool.open()
+    _checkpointer = AsyncPostgresSaver(conn=_pool)
+    await _checkpointer.setup()
 
 
-def close_checkpointer():
+async def close_checkpointer():
     if _pool:
-        _pool.close()
+        await _pool.close()
 
 
-def get_checkpointer() -> PostgresSaver:
+def get_checkpointer() -> AsyncPostgresSaver:
     if _checkpointer is None:
         raise RuntimeError("checkpointer未初始化")
     return _checkpointer
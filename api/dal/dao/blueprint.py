@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 
 from common.dto.blueprint import TaskStatus
 from common.dto.user import UserInfo
+from common.enums.task import TaskKind
+from dal.dao.task_event import TaskEventDAO
 from dal.po.blueprint import Blueprint
 
 
@@ -34,19 +36,24 @@ class BlueprintDAO:
         mermaid_code: Optional[str] = None,
         error_message: Optional[str] = None,
     ):
-        blueprint = db.query(Blueprint).filter(Blueprint.id == blueprint_id).first()
-        if blueprint:
-            setattr(blueprint, "status", status.value)
-            if progress:
-                setattr(blueprint, "progress", progress)
-            if workflow:
-                setattr(blueprint, "workflow", workflow)
-            if mermaid_code:
-                setattr(blueprint, "mermaid_code", mermaid_code)
-            if error_message:
-                setattr(blueprint, "error_message", error_message)
-            return blueprint
-        return None
+        changes = {
+            "status": status.value,
+            "progress": progress,
+            "workflow": workflow,
+            "mermaid_code": mermaid_code,
+            "error_message": error_message,
+        }
+        changes = {field: value for field, value in changes.items() if value}
+        return TaskEventDAO.update_and_publish(
+            db,
+            Blueprint,
+            Blueprint.id,
+            blueprint_id,
+            changes,
+            TaskKind.BLUEPRINT,
+            status.value,
+            progress,
+        )
 
     @staticmethod
     def save_new_blueprint(
@@ -94,6 +101,32 @@ class BlueprintDAO:
         )
         return latest_blueprint
 
+    @staticmethod
+    def get_latest_blueprint_version(db: Session, thread_id: str):
+        """只查询最新蓝图的ID和版本号，不加载大字段"""
+        return (
+            db.query(Blueprint.id, Blueprint.version)
+            .filter(Blueprint.thread_id == thread_id)
+            .order_by(Blueprint.created_at.desc())
+            .first()
+        )
+
+    @staticmethod
+    def get_blueprint_version(db: Session, blueprint_id: str) -> Optional[int]:
+        return (
+            db.query(Blueprint.version).filter(Blueprint.id == blueprint_id).scalar()
+        )
+
+    @staticmethod
+    def get_blueprint_task_status(db: Session, blueprint_id: str) -> Optional[str]:
+        return db.query(Blueprint.status).filter(Blueprint.id == blueprint_id).scalar()
+
+    @staticmethod
+    def get_blueprint_user_id(db: Session, blueprint_id: str) -> Optional[str]:
+        return (
+            db.query(Blueprint.user_id).filter(Blueprint.id == blueprint_id).scalar()
+        )
+
     @staticmethod
     def get_blueprint_by_id(db: Session, blueprint_id: str) -> Optional[Blueprint]:
         return db.query(Blueprint).filter(Blueprint.id == blueprint_id).first()
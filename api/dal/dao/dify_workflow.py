@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 
 from common.dto.blueprint import TaskStatus
 from common.dto.user import UserInfo
+from common.enums.task import TaskKind
+from dal.dao.task_event import TaskEventDAO
 from dal.po.dify_workflow import DifyWorkflow
 
 
@@ -41,18 +43,50 @@ class DifyWorkflowDAO:
         app_description: str=None,
         status: TaskStatus=None,
         nodes: Dict=None,
-        edges: Dict=None
+        edges: Dict=None,
+        progress: str=None
     ):
-        dify_workflow = db.query(DifyWorkflow).filter(DifyWorkflow.app_id == app_id).first()
+        changes = {
+            "status": status.value,
+            "app_name": app_name,
+            "app_description": app_description,
+            "nodes": nodes,
+            "edges": edges,
+            "progress": progress,
+        }
+        changes = {field: value for field, value in changes.items() if value}
+        return TaskEventDAO.update_and_publish(
+            db,
+            DifyWorkflow,
+            DifyWorkflow.app_id,
+            app_id,
+            changes,
+            TaskKind.WORKFLOW,
+            status.value,
+            progress,
+        )
+
+    @staticmethod
+    def get_dify_workflow_version(db: Session, app_id: str) -> Optional[int]:
+        """只查询版本号，不加载节点和连线"""
+        return (
+            db.query(DifyWorkflow.version)
+            .filter(DifyWorkflow.app_id == app_id)
+            .scalar()
+        )
 
-        if dify_workflow:
-            setattr(dify_workflow, "status", status.value)
-            if app_name: 
-                setattr(dify_workflow, "app_name", app_name)
-            if app_description:
-                setattr(dify_workflow, "app_description", app_description)
-            if nodes:
-                setattr(dify_workflow, "nodes", nodes)
-            if edges:
-                setattr(dify_workflow, "edges", edges)
-        return None
+    @staticmethod
+    def get_dify_workflow_thread_id(db: Session, app_id: str) -> Optional[str]:
+        return (
+            db.query(DifyWorkflow.thread_id)
+            .filter(DifyWorkflow.app_id == app_id)
+            .scalar()
+        )
+
+    @staticmethod
+    def get_dify_workflow_task_status(db: Session, app_id: str) -> Optional[str]:
+        return (
+            db.query(DifyWorkflow.status)
+            .filter(DifyWorkflow.app_id == app_id)
+            .scalar()
+        )
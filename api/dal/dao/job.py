@@ -0,0 +1,154 @@
+from datetime import timedelta
+from typing import List, Optional
+from uuid import uuid4
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from common.enums.job import JobStatus, JobType
+from dal.po.job import Job
+
+
+class JobDAO:
+    @staticmethod
+    def create_job(
+        db: Session, job_type: JobType, payload: dict, max_attempts: int = 3
+    ) -> str:
+        job_id = str(uuid4())
+        new_job = Job(
+            id=job_id,
+            job_type=job_type.value,
+            payload=payload,
+            status=JobStatus.PENDING.value,
+            attempts=0,
+            max_attempts=max_attempts,
+        )
+        db.add(new_job)
+        return job_id
+
+    @staticmethod
+    def lease_job(
+        db: Session, job_type: JobType, worker_id: str, lease_seconds: int
+    ) -> Optional[Job]:
+        """领取一个待执行或租约已过期的任务，使用SKIP LOCKED避免多个worker争抢同一行"""
+        job = (
+            db.query(Job)
+            .filter(
+                Job.job_type == job_type.value,
+                Job.attempts < Job.max_attempts,
+                or_(
+                    and_(
+                        Job.status == JobStatus.PENDING.value,
+                        Job.run_after <= func.now(),
+                    ),
+                    and_(
+                        Job.status == JobStatus.RUNNING.value,
+                        Job.lease_expires_at < func.now(),
+                    ),
+                ),
+            )
+            .order_by(Job.created_at)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job:
+            setattr(job, "status", JobStatus.RUNNING.value)
+            setattr(job, "attempts", job.attempts + 1)
+            setattr(job, "locked_by", worker_id)
+            setattr(
+                job, "lease_expires_at", func.now() + timedelta(seconds=lease_seconds)
+            )
+            return job
+        return None
+
+    @staticmethod
+    def extend_lease(
+        db: Session, job_id: str, worker_id: str, lease_seconds: int
+    ) -> bool:
+        """续租，若租约已被其他worker接管则返回False"""
+        updated = (
+            db.query(Job)
+            .filter(
+                Job.id == job_id,
+                Job.locked_by == worker_id,
+                Job.status == JobStatus.RUNNING.value,
+            )
+            .update(
+                {Job.lease_expires_at: func.now() + timedelta(seconds=lease_seconds)},
+                synchronize_session=False,
+            )
+        )
+        return updated > 0
+
+    @staticmethod
+    def complete_job(db: Session, job_id: str, worker_id: str):
+        db.query(Job).filter(Job.id == job_id, Job.locked_by == worker_id).update(
+            {
+                Job.status: JobStatus.COMPLETED.value,
+                Job.lease_expires_at: None,
+            },
+            synchronize_session=False,
+        )
+
+    @staticmethod
+    def fail_job(
+        db: Session,
+        job_id: str,
+        worker_id: str,
+        error_message: str,
+        retry_delay_seconds: int,
+    ) -> Optional[Job]:
+        """任务失败：仍有重试次数时延迟重新入队，否则标记为失败"""
+        job = (
+            db.query(Job)
+            .filter(Job.id == job_id, Job.locked_by == worker_id)
+            .with_for_update()
+            .first()
+        )
+        if job:
+            setattr(job, "error_message", error_message)
+            setattr(job, "lease_expires_at", None)
+            if job.attempts < job.max_attempts:
+                setattr(job, "status", JobStatus.PENDING.value)
+                setattr(
+                    job,
+                    "run_after",
+                    func.now() + timedelta(seconds=retry_delay_seconds),
+                )
+            else:
+                setattr(job, "status", JobStatus.FAILED.value)
+            return job
+        return None
+
+    @staticmethod
+    def fail_exhausted_jobs(db: Session, job_type: JobType) -> List[Job]:
+        """将租约过期且重试次数耗尽的任务标记为失败，并返回这些任务"""
+        jobs = (
+            db.query(Job)
+            .filter(
+                Job.job_type == job_type.value,
+                Job.status == JobStatus.RUNNING.value,
+                Job.lease_expires_at < func.now(),
+                Job.attempts >= Job.max_attempts,
+            )
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for job in jobs:
+            setattr(job, "status", JobStatus.FAILED.value)
+            setattr(job, "error_message", "任务租约过期且重试次数已耗尽")
+            setattr(job, "lease_expires_at", None)
+        return jobs
+
+    @staticmethod
+    def count_active_jobs(db: Session, job_type: JobType) -> int:
+        """排队中和执行中的任务数"""
+        return (
+            db.query(func.count(Job.id))
+            .filter(
+                Job.job_type == job_type.value,
+                Job.status.in_([JobStatus.PENDING.value, JobStatus.RUNNING.value]),
+            )
+            .scalar()
+        )
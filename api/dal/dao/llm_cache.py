@@ -0,0 +1,83 @@
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from dal.po.llm_cache import LLMCacheEntry
+
+
+class LLMCacheDAO:
+    @staticmethod
+    def get_value(db: Session, key: str) -> Optional[str]:
+        """读取未过期的缓存，并更新命中次数和最近命中时间"""
+        value = (
+            db.query(LLMCacheEntry.value)
+            .filter(LLMCacheEntry.key == key, LLMCacheEntry.expires_at > func.now())
+            .scalar()
+        )
+        if value is not None:
+            db.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).update(
+                {
+                    LLMCacheEntry.hit_count: LLMCacheEntry.hit_count + 1,
+                    LLMCacheEntry.last_hit_at: func.now(),
+                },
+                synchronize_session=False,
+            )
+        return value
+
+    @staticmethod
+    def upsert(db: Session, key: str, llm_string: str, value: str, ttl_seconds: int):
+        expires_at = func.now() + timedelta(seconds=ttl_seconds)
+        size_bytes = len(value.encode("utf-8"))
+        statement = insert(LLMCacheEntry).values(
+            key=key,
+            llm_string=llm_string,
+            value=value,
+            size_bytes=size_bytes,
+            hit_count=0,
+            expires_at=expires_at,
+        )
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[LLMCacheEntry.key],
+                set_={
+                    "value": value,
+                    "size_bytes": size_bytes,
+                    "expires_at": expires_at,
+                    "last_hit_at": func.now(),
+                },
+            )
+        )
+
+    @staticmethod
+    def evict(db: Session, max_bytes: int) -> int:
+        """删除过期的缓存；总大小超过上限时，按最近命中时间淘汰最久未使用的缓存"""
+        deleted = (
+            db.query(LLMCacheEntry)
+            .filter(LLMCacheEntry.expires_at <= func.now())
+            .delete(synchronize_session=False)
+        )
+
+        running_total = (
+            func.sum(LLMCacheEntry.size_bytes)
+            .over(order_by=LLMCacheEntry.last_hit_at.desc())
+            .label("running_total")
+        )
+        ranked = db.query(LLMCacheEntry.key, running_total).subquery()
+        deleted += (
+            db.query(LLMCacheEntry)
+            .filter(
+                LLMCacheEntry.key.in_(
+                    select(ranked.c.key).where(ranked.c.running_total > max_bytes)
+                )
+            )
+            .delete(synchronize_session=False)
+        )
+        return deleted
+
+    @staticmethod
+    def clear(db: Session):
+        db.query(LLMCacheEntry).delete(synchronize_session=False)
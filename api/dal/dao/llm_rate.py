@@ -0,0 +1,71 @@
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from dal.po.llm_rate import LLMRateWindow
+
+
+def _current_window():
+    return func.date_trunc("minute", func.now())
+
+
+class LLMRateDAO:
+    @staticmethod
+    def try_acquire(
+        db: Session, model: str, tokens: int, max_requests: int, max_tokens: int
+    ) -> bool:
+        """
+        在当前分钟窗口内原子地占用一次请求和预估的token数
+
+        单条 INSERT ... ON CONFLICT DO UPDATE ... WHERE 语句，超过上限时不更新也不返回行，
+        多个进程并发调用时不会超发。
+        """
+        statement = insert(LLMRateWindow).values(
+            model=model, window_start=_current_window(), requests=1, tokens=tokens
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[LLMRateWindow.model, LLMRateWindow.window_start],
+            set_={
+                "requests": LLMRateWindow.requests + 1,
+                "tokens": LLMRateWindow.tokens + statement.excluded.tokens,
+            },
+            where=(LLMRateWindow.requests < max_requests)
+            & (LLMRateWindow.tokens + statement.excluded.tokens <= max_tokens),
+        ).returning(LLMRateWindow.requests)
+        return db.execute(statement).first() is not None
+
+    @staticmethod
+    def add_tokens(db: Session, model: str, tokens: int):
+        """调用结束后按实际用量修正当前窗口的token数"""
+        db.query(LLMRateWindow).filter(
+            LLMRateWindow.model == model,
+            LLMRateWindow.window_start == _current_window(),
+        ).update(
+            {LLMRateWindow.tokens: LLMRateWindow.tokens + tokens},
+            synchronize_session=False,
+        )
+
+    @staticmethod
+    def get_usage(db: Session, model: str) -> Optional[LLMRateWindow]:
+        return (
+            db.query(LLMRateWindow)
+            .filter(
+                LLMRateWindow.model == model,
+                LLMRateWindow.window_start == _current_window(),
+            )
+            .first()
+        )
+
+    @staticmethod
+    def delete_old_windows(db: Session, keep_minutes: int = 10) -> int:
+        return (
+            db.query(LLMRateWindow)
+            .filter(
+                LLMRateWindow.window_start
+                < func.now() - timedelta(minutes=keep_minutes)
+            )
+            .delete(synchronize_session=False)
+        )
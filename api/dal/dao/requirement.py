@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 
 from common.dto.requirement import RequirementCreate, TaskStatus
 from common.dto.user import UserInfo
+from common.enums.task import TaskKind
+from dal.dao.task_event import TaskEventDAO
 from dal.po.requirement import Requirement
 
 
@@ -40,23 +42,29 @@ class RequirementDAO:
         user_answers: Optional[list] = None,  # 改为list类型
         additional_requirements: Optional[str] = None,  # 新增参数
     ):
-        requirement = db.query(Requirement).filter(Requirement.id == thread_id).first()
-        if requirement:
-            setattr(requirement, "status", status.value)
-            if progress:
-                setattr(requirement, "progress", progress)
-            if questionnaire:
-                setattr(requirement, "questionnaire", questionnaire)
-            if final_document:
-                setattr(requirement, "final_document", final_document)
-            if error_message:
-                setattr(requirement, "error_message", error_message)
-            if user_answers:
-                setattr(requirement, "user_answers", user_answers)
-            if additional_requirements:
-                setattr(requirement, "additional_requirements", additional_requirements)
-            return requirement
-        return None
+        changes = {
+            "progress": progress,
+            "questionnaire": questionnaire,
+            "final_document": final_document,
+            "error_message": error_message,
+            "user_answers": user_answers,
+            "additional_requirements": additional_requirements,
+        }
+        # 只跳过未传入的字段，空列表、空字符串表示清空
+        changes = {
+            field: value for field, value in changes.items() if value is not None
+        }
+        changes["status"] = status.value
+        return TaskEventDAO.update_and_publish(
+            db,
+            Requirement,
+            Requirement.id,
+            thread_id,
+            changes,
+            TaskKind.REQUIREMENT,
+            status.value,
+            progress,
+        )
 
     @staticmethod
     def update_requirement_with_final_document(
@@ -72,47 +80,56 @@ class RequirementDAO:
         boundaries_and_limitations: Optional[str] = None,
     ):
         """更新需求完成状态并保存最终文档内容到对应数据库字段"""
-        requirement = db.query(Requirement).filter(Requirement.id == thread_id).first()
-        if requirement:
-            setattr(requirement, "status", TaskStatus.COMPLETED.value)
-            setattr(requirement, "progress", "最终需求文档已生成完成")
-            setattr(requirement, "final_document", final_document)
-
-            # 将文档内容保存到对应的数据库字段
-            if requirement_name:
-                setattr(requirement, "requirement_name", requirement_name)
-            if mission_statement:
-                setattr(requirement, "mission_statement", mission_statement)
-            if user_and_scenario:
-                setattr(requirement, "user_and_scenario", user_and_scenario)
-            if user_input:
-                setattr(requirement, "user_input", user_input)
-            if ai_output:
-                setattr(requirement, "ai_output", ai_output)
-            if success_criteria:
-                setattr(requirement, "success_criteria", success_criteria)
-            if boundaries_and_limitations:
-                setattr(
-                    requirement,
-                    "boundaries_and_limitations",
-                    boundaries_and_limitations,
-                )
+        progress = "最终需求文档已生成完成"
+        # 将文档内容保存到对应的数据库字段
+        changes = {
+            "requirement_name": requirement_name,
+            "mission_statement": mission_statement,
+            "user_and_scenario": user_and_scenario,
+            "user_input": user_input,
+            "ai_output": ai_output,
+            "success_criteria": success_criteria,
+            "boundaries_and_limitations": boundaries_and_limitations,
+        }
+        changes = {
+            field: value for field, value in changes.items() if value is not None
+        }
+        # 状态和最终文档总是写入，即使文档为空，也不能保留旧文档
+        changes.update(
+            status=TaskStatus.COMPLETED.value,
+            progress=progress,
+            final_document=final_document,
+        )
+        return TaskEventDAO.update_and_publish(
+            db,
+            Requirement,
+            Requirement.id,
+            thread_id,
+            changes,
+            TaskKind.REQUIREMENT,
+            TaskStatus.COMPLETED.value,
+            progress,
+        )
 
-            return requirement
-        return None
+    @staticmethod
+    def get_requirement_version(db: Session, thread_id: str):
+        """只查询版本号、所属用户和状态，不加载大字段"""
+        return (
+            db.query(Requirement.version, Requirement.user_id, Requirement.status)
+            .filter(Requirement.id == thread_id)
+            .first()
+        )
 
     @staticmethod
     def get_requirement_fields(db: Session, thread_id: str) -> Optional[Requirement]:
         return db.query(Requirement).filter(Requirement.id == thread_id).first()
 
     @staticmethod
-    def update_requirement_fields(
-        db: Session, thread_id: str, **fields
-    ) -> Optional[Requirement]:
-        requirement = db.query(Requirement).filter(Requirement.id == thread_id).first()
-        if not requirement:
-            return None
-
+    def update_requirement_fields(db: Session, thread_id: str, **fields):
+        """
+        Returns:
+            更新后的可编辑字段，需求不存在时为None
+        """
         allowed_fields = [
             "requirement_name",
             "mission_statement",
@@ -123,8 +140,17 @@ class RequirementDAO:
             "boundaries_and_limitations",
         ]
 
-        for field_name in allowed_fields:
-            if field_name in fields and fields[field_name] is not None:
-                setattr(requirement, field_name, fields[field_name])
-
-        return requirement
+        changes = {
+            field_name: fields[field_name]
+            for field_name in allowed_fields
+            if fields.get(field_name) is not None
+        }
+        return TaskEventDAO.update_and_publish(
+            db,
+            Requirement,
+            Requirement.id,
+            thread_id,
+            changes,
+            TaskKind.REQUIREMENT,
+            returning=[getattr(Requirement, name) for name in allowed_fields],
+        )
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import String, literal
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from common.enums.task import TaskKind
+from dal.po.stage_event import StageEvent
+
+
+class StageEventDAO:
+    @staticmethod
+    def start_stage(db: Session, kind: TaskKind, entity_id: str, stage: str) -> int:
+        event = StageEvent(kind=kind.value, entity_id=entity_id, stage=stage)
+        db.add(event)
+        db.flush()
+        return event.id
+
+    @staticmethod
+    def finish_stage(
+        db: Session,
+        event_id: int,
+        ok: bool,
+        duration_ms: int,
+        model: Optional[str] = None,
+    ):
+        db.query(StageEvent).filter(StageEvent.id == event_id).update(
+            {
+                StageEvent.ok: ok,
+                StageEvent.duration_ms: duration_ms,
+                StageEvent.model: model,
+                StageEvent.finished_at: func.now(),
+            },
+            synchronize_session=False,
+        )
+
+    @staticmethod
+    def get_recent_events(
+        db: Session, kind: TaskKind, entity_id: str, limit: int = 20
+    ) -> List[StageEvent]:
+        """按开始时间升序返回该对象最近的阶段记录"""
+        events = (
+            db.query(StageEvent)
+            .filter(StageEvent.kind == kind.value, StageEvent.entity_id == entity_id)
+            .order_by(StageEvent.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return list(reversed(events))
+
+    @staticmethod
+    def get_percentiles(db: Session, window: timedelta, by_model: bool):
+        """
+        最近一段时间内成功阶段的耗时分位数（毫秒）
+
+        Returns:
+            (stage, model, count, p50, p90, p95) 行；by_model为False时model为None
+        """
+        duration = StageEvent.duration_ms
+        if by_model:
+            group_by = [StageEvent.stage, StageEvent.model]
+            model = StageEvent.model
+        else:
+            group_by = [StageEvent.stage]
+            model = literal(None, String)
+        return (
+            db.query(
+                StageEvent.stage,
+                model,
+                func.count(),
+                func.percentile_cont(0.5).within_group(duration),
+                func.percentile_cont(0.9).within_group(duration),
+                func.percentile_cont(0.95).within_group(duration),
+            )
+            .filter(
+                StageEvent.ok.is_(True),
+                StageEvent.finished_at >= func.now() - window,
+            )
+            .group_by(*group_by)
+            .all()
+        )
@@ -0,0 +1,68 @@
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import Text, cast, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.sql import func
+
+from common.enums.task import TaskKind
+from dal.dao.version import version_values
+from settings import settings
+
+
+class TaskEventDAO:
+    @staticmethod
+    def update_and_publish(
+        db: Session,
+        model,
+        key_column,
+        key: str,
+        changes: Dict[str, Any],
+        kind: TaskKind,
+        status: Optional[str] = None,
+        progress: Optional[str] = None,
+        returning: Sequence = (),
+    ):
+        """
+        单条语句完成更新、版本号递增和NOTIFY：
+
+            WITH updated AS (UPDATE ... RETURNING ...) SELECT updated.*, pg_notify(...)
+
+        只写入changes中的列，不查询也不加载JSON大字段。NOTIFY在事务提交后才会送达，
+        回滚则不发送；只携带状态、进度和版本号，完整内容由客户端再查询状态接口获取。
+
+        Returns:
+            包含 version 及 returning 中各列的行，记录不存在时为None
+        """
+        table = model.__table__
+        values = {**changes, **version_values(table, changes)}
+        updated = (
+            update(table)
+            .where(key_column == key)
+            .values(values)
+            .returning(table.c.version, *returning)
+            .cte("updated")
+        )
+        payload = func.json_build_object(
+            cast("kind", Text),
+            cast(kind.value, Text),
+            cast("id", Text),
+            cast(key, Text),
+            cast("status", Text),
+            cast(status, Text),
+            cast("progress", Text),
+            cast(progress, Text),
+            cast("version", Text),
+            updated.c.version,
+        )
+        statement = select(
+            updated,
+            func.pg_notify(settings.TASK_EVENTS_CHANNEL, cast(payload, Text)),
+        )
+        row = db.execute(statement).first()
+
+        # 语句绕过了ORM，会话中已加载的同一对象需要过期，下次访问时重新读取
+        instance = db.identity_map.get(identity_key(model, key))
+        if instance is not None:
+            db.expire(instance)
+        return row
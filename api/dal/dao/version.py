@@ -0,0 +1,33 @@
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import JSON, Text, case, cast, func, literal_column
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+def version_values(table, fields: Iterable[str]) -> Dict[str, Any]:
+    """
+    UPDATE语句的SET子句：版本号加一，并记录本次修改的字段在哪个版本发生变化
+
+    在数据库中完成计算，不需要先查询出当前版本；状态接口据此支持
+    If-None-Match 和 ?since=<version> 增量返回。
+    """
+    next_version = table.c.version + 1
+    current = cast(table.c.field_versions, JSONB)
+    # 字段为空（SQL NULL或JSON null）时从空对象开始合并
+    current = case(
+        (func.jsonb_typeof(current) == "object", current),
+        else_=literal_column("'{}'::jsonb"),
+    )
+    changed = func.jsonb_build_object(
+        *[arg for field in fields for arg in (cast(field, Text), next_version)]
+    )
+    return {
+        "version": next_version,
+        "field_versions": cast(current.op("||")(changed), JSON),
+    }
+
+
+def changed_since(entity, since: int, fields: Iterable[str]) -> List[str]:
+    """返回 since 版本之后修改过的字段；没有记录的字段视为创建时（版本1）写入"""
+    field_versions = entity.field_versions or {}
+    return [field for field in fields if field_versions.get(field, 1) > since]
@@ -9,6 +9,10 @@ from sqlalchemy.orm import sessionmaker
 from dal.database import Base
 # from dal.po.requirement import Requirement  # noqa: F401
 from dal.po.dify_workflow import DifyWorkflow
+from dal.po.job import Job  # noqa: F401
+from dal.po.llm_cache import LLMCacheEntry  # noqa: F401
+from dal.po.llm_rate import LLMRateWindow  # noqa: F401
+from dal.po.stage_event import StageEvent  # noqa: F401
 from settings import settings
 
 engine = create_engine(settings.DATABASE_URL)
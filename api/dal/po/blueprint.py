@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import JSON, Column, DateTime, String, Text, Boolean
+from sqlalchemy import JSON, Boolean, Column, DateTime, Integer, String, Text
 from sqlalchemy.sql import func
 
 from dal.database import Base
@@ -25,6 +25,10 @@ class Blueprint(Base):
     error_message = Column(Text, nullable=True)
 
     user_id = Column(String(36), nullable=False)
+    # 每次更新加一，状态接口用作ETag；field_versions记录各字段最后一次修改时的版本
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    field_versions = Column(JSON, nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), onupdate=func.now(), server_default=func.now()
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import JSON, Column, DateTime, String, Text, Boolean
+from sqlalchemy import JSON, Boolean, Column, DateTime, Integer, String, Text
 from sqlalchemy.sql import func
 
 from dal.database import Base
@@ -19,10 +19,15 @@ class DifyWorkflow(Base):
     thread_id = Column(String(36), nullable=False)
     
     status = Column(String(50), nullable=False, default="pending")
+    progress = Column(String(255), nullable=True)
 
     nodes = Column(JSON, nullable=True)  # the workflow of this blueprint
     edges = Column(JSON, nullable=True)  # the workflow of this blueprint
 
+    # 每次更新加一，状态接口用作ETag；field_versions记录各字段最后一次修改时的版本
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    field_versions = Column(JSON, nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), onupdate=func.now(), server_default=func.now()
@@ -0,0 +1,31 @@
+import uuid
+
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.sql import func
+
+from dal.database import Base
+
+
+class Job(Base):
+    __tablename__ = "job"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_type = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)  # 任务处理函数的参数
+
+    status = Column(String(50), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+
+    run_after = Column(DateTime(timezone=True), server_default=func.now())
+    locked_by = Column(String(255), nullable=True)  # 持有租约的worker
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    error_message = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), onupdate=func.now(), server_default=func.now()
+    )
+
+    __table_args__ = (Index("ix_job_type_status", "job_type", "status"),)
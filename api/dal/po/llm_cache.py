@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.sql import func
+
+from dal.database import Base
+
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256(模型参数 + 提示词消息)
+    llm_string = Column(Text, nullable=False)  # 模型名称、温度等参数
+    value = Column(Text, nullable=False)  # 序列化后的生成结果
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, nullable=False, default=0)
+
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    last_hit_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_llm_cache_expires_at", "expires_at"),
+        Index("ix_llm_cache_last_hit_at", "last_hit_at"),
+    )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Integer, String
+
+from dal.database import Base
+
+
+class LLMRateWindow(Base):
+    """每个模型每分钟的请求数和token用量，多个worker进程共享"""
+
+    __tablename__ = "llm_rate_window"
+
+    model = Column(String(255), primary_key=True)
+    window_start = Column(DateTime(timezone=True), primary_key=True)
+    requests = Column(Integer, nullable=False, default=0)
+    tokens = Column(Integer, nullable=False, default=0)
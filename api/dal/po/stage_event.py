@@ -0,0 +1,25 @@
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String
+from sqlalchemy.sql import func
+
+from dal.database import Base
+
+
+class StageEvent(Base):
+    """任务每个阶段（图节点、Dify草稿保存）的开始和结束时间，用于统计耗时和估算剩余时间"""
+
+    __tablename__ = "stage_event"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(32), nullable=False)
+    entity_id = Column(String(36), nullable=False)
+    stage = Column(String(64), nullable=False)
+    model = Column(String(255), nullable=True)
+    ok = Column(Boolean, nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_stage_event_entity", "kind", "entity_id"),
+        Index("ix_stage_event_stage", "stage", "finished_at"),
+    )
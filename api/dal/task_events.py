@@ -0,0 +1,189 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from psycopg import AsyncConnection, sql
+from sqlalchemy.orm import Session
+
+from dal.database import get_db
+from settings import settings
+
+_RESYNC = {"kind": "resync"}
+
+
+class TaskEventHub:
+    """
+    每个进程一个LISTEN连接，把任务变更通知分发给订阅了对应对象的SSE连接
+
+    连接断开后自动重连，并向所有订阅者发送 {"kind": "resync"}，
+    提示客户端重新查询一次状态，补上断线期间错过的变更。
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[Tuple[str, str], Set[asyncio.Queue]] = defaultdict(
+            set
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        connected_once = False
+        while True:
+            try:
+                async with await AsyncConnection.connect(
+                    settings.DATABASE_URL, autocommit=True
+                ) as conn:
+                    await conn.execute(
+                        sql.SQL("LISTEN {}").format(
+                            sql.Identifier(settings.TASK_EVENTS_CHANNEL)
+                        )
+                    )
+                    if connected_once:
+                        self._broadcast(_RESYNC)
+                    connected_once = True
+                    async for notify in conn.notifies():
+                        self._dispatch(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"任务事件监听连接断开，稍后重连: {e}")
+                await asyncio.sleep(settings.TASK_EVENTS_RECONNECT_DELAY)
+
+    def _dispatch(self, payload: str):
+        try:
+            event = json.loads(payload)
+        except json.JSONDecodeError:
+            return
+        for queue in self._subscribers.get((event.get("kind"), event.get("id")), ()):
+            self._offer(queue, event)
+
+    def _broadcast(self, event: dict):
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._offer(queue, event)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        # 客户端跟不上时丢弃最旧的事件，状态以最新一条为准
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def subscribe(self, keys: Iterable[Tuple[str, str]]) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.TASK_EVENTS_QUEUE_SIZE)
+        for key in keys:
+            self._subscribers[key].add(queue)
+        return queue
+
+    def unsubscribe(self, keys: Iterable[Tuple[str, str]], queue: asyncio.Queue):
+        for key in keys:
+            queues = self._subscribers.get(key)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[key]
+
+    @property
+    def listening(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def wait_for_version(
+        self,
+        kind: str,
+        entity_id: str,
+        after_version: int,
+        timeout: float,
+        current_version: Callable[[], Awaitable[int]],
+    ) -> int:
+        """
+        长轮询：等待对象的版本号超过 after_version，或超时
+
+        先订阅再查询一次当前版本，避免查询和订阅之间的变更被错过；之后只等待通知，
+        不再查询数据库。未在监听时（如单独的worker进程）直接返回当前版本。
+
+        Returns:
+            已知的最新版本号
+        """
+        key = (kind, entity_id)
+        queue = self.subscribe([key])
+        try:
+            version = await current_version()
+            if version > after_version or not self.listening:
+                return version
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return version
+                try:
+                    event = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    return version
+                if event is _RESYNC:
+                    version = await current_version()
+                else:
+                    version = max(version, event.get("version") or 0)
+                if version > after_version:
+                    return version
+        finally:
+            self.unsubscribe([key], queue)
+
+    def get_stats(self) -> dict:
+        return {
+            "listening": self.listening,
+            "subscriptions": len(self._subscribers),
+            "subscribers": len(
+                {id(q) for queues in self._subscribers.values() for q in queues}
+            ),
+        }
+
+
+task_event_hub = TaskEventHub()
+
+
+async def long_poll(
+    kind: str,
+    entity_id: str,
+    after_version: Optional[int],
+    wait: float,
+    current_version: Callable[[Session], int],
+):
+    """
+    状态接口的 ?wait=&after_version= 参数，未指定时不等待
+
+    current_version 在线程中使用单独的短会话查询，查完立即归还连接；不能使用请求的会话，
+    否则等待期间连接一直处于 idle in transaction，长轮询一多就会耗尽连接池
+    """
+    if not wait or after_version is None:
+        return
+
+    def read_version() -> int:
+        db = next(get_db())
+        try:
+            return current_version(db)
+        finally:
+            db.close()
+
+    timeout = min(wait, settings.STATUS_LONG_POLL_MAX_WAIT)
+    await task_event_hub.wait_for_version(
+        kind,
+        entity_id,
+        after_version,
+        timeout,
+        lambda: asyncio.to_thread(read_version),
+    )
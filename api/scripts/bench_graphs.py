@@ -0,0 +1,190 @@
+"""
+四个代理图的离线基准
+
+依次执行需求澄清、蓝图生成、Dify节点生成和蓝图对话四个图，统计每个图的耗时、
+LLM调用数和检查点写入次数。先以record模式连接真实模型录制一次，
+之后以replay模式在无网络的机器上反复回放，只测量图本身、检查点和数据库的开销。
+
+需要可用的Postgres（检查点与业务表）。录制和回放模式下响应缓存自动关闭。
+
+用法（在 api 目录下）:
+    LLM_CASSETTE_MODE=record python -m scripts.bench_graphs "每天汇总行业新闻并生成简报"
+    LLM_CASSETTE_MODE=replay LLM_CASSETTE_LATENCY=0.5 \\
+        python -m scripts.bench_graphs "每天汇总行业新闻并生成简报" --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import defaultdict
+from uuid import uuid4
+
+from langgraph.types import Command
+
+from biz.agent.blueprint.chat_graph import get_chat_workflow
+from biz.agent.blueprint.graph import get_blueprint_workflow
+from biz.agent.requirement.graph import get_requirement_workflow
+from biz.agent.requirement.state import UserAnswer
+from biz.agent.workflow.graph import get_workflow_agent
+from common.utils.get_llm_model import close_llm_clients
+from common.utils.llm_cassette import get_cassette_stats
+from dal.checkpointer import close_checkpointer, get_checkpointer, init_checkpointer
+from settings import settings
+
+CHAT_PROMPT = "请把第一个节点的标题改得更具体一些"
+
+_counters = defaultdict(int)
+
+
+def _instrument_checkpointer():
+    """统计检查点写入次数"""
+    checkpointer = get_checkpointer()
+    for name in ("aput", "aput_writes"):
+        original = getattr(checkpointer, name)
+
+        async def counted(*args, _original=original, _name=name, **kwargs):
+            _counters[_name] += 1
+            return await _original(*args, **kwargs)
+
+        setattr(checkpointer, name, counted)
+
+
+def _config() -> dict:
+    return {"configurable": {"thread_id": str(uuid4())}}
+
+
+async def run_requirement(user_request: str) -> dict:
+    app = get_requirement_workflow()
+    config = _config()
+    state = await app.ainvoke(
+        {
+            "user_request": user_request,
+            "product_draft": None,
+            "questionnaire": None,
+            "user_answers": None,
+            "additional_requirements": None,
+            "final_document": None,
+            "error": None,
+        },
+        config=config,
+    )
+    # 每个问题选第一个选项，保证录制和回放时的提示词一致
+    answers = [
+        UserAnswer(question_id=q["id"], selected_option=q["options"][0]["value"])
+        for q in state["questionnaire"]["questions"]
+    ]
+    state = await app.ainvoke(
+        Command(resume={"user_answers": answers}), config=config
+    )
+    return state["final_document"]
+
+
+async def run_blueprint(final_document: dict) -> dict:
+    state = await get_blueprint_workflow().ainvoke(
+        {
+            "final_document": json.dumps(final_document),
+            "workflow": None,
+            "mermaid_code": None,
+            "error": None,
+        },
+        config=_config(),
+    )
+    return state["workflow"]
+
+
+async def run_workflow_agent(final_document: dict, workflow: dict) -> list:
+    state = await get_workflow_agent().ainvoke(
+        {
+            "requirement_doc": final_document,
+            "sop": workflow,
+            "nodes_created": [],
+            "available_variables": [],
+            "messages": [],
+            "token_usage": [],
+            "todo_status": {},
+            "generated_nodes": [],
+        },
+        config=_config(),
+    )
+    return state["nodes_created"]
+
+
+async def run_chat(workflow: dict):
+    async for _ in get_chat_workflow().astream(
+        {
+            "initial_messages": CHAT_PROMPT,
+            "workflow": workflow,
+            "refined_workflow": None,
+            "decision": None,
+            "mermaid_code": None,
+        },
+        config=_config(),
+        stream_mode="messages",
+    ):
+        pass
+
+
+async def _measure(results: dict, name: str, coro):
+    before = dict(_counters)
+    llm_before = get_cassette_stats()
+    start = time.perf_counter()
+    value = await coro
+    elapsed = time.perf_counter() - start
+    llm_after = get_cassette_stats()
+    llm_calls = (llm_after["replayed"] + llm_after["recorded"]) - (
+        llm_before["replayed"] + llm_before["recorded"]
+    )
+    results[name]["seconds"].append(elapsed)
+    results[name]["llm_calls"].append(llm_calls)
+    for counter in ("aput", "aput_writes"):
+        results[name][counter].append(_counters[counter] - before.get(counter, 0))
+    return value
+
+
+async def main(user_request: str, repeat: int):
+    await init_checkpointer()
+    _instrument_checkpointer()
+    results = defaultdict(lambda: defaultdict(list))
+    try:
+        for _ in range(repeat):
+            final_document = await _measure(
+                results, "requirement", run_requirement(user_request)
+            )
+            workflow = await _measure(
+                results, "blueprint", run_blueprint(final_document)
+            )
+            await _measure(
+                results, "workflow_agent", run_workflow_agent(final_document, workflow)
+            )
+            await _measure(results, "chat", run_chat(workflow))
+    finally:
+        await close_checkpointer()
+        await close_llm_clients()
+
+    latency = settings.LLM_CASSETTE_LATENCY
+    print(f"mode={settings.LLM_CASSETTE_MODE or 'live'} synthetic_latency={latency}s")
+    print(
+        f"{'graph':<16} {'mean(s)':>8} {'min(s)':>8} {'overhead(s)':>12} "
+        f"{'llm':>5} {'ckpt':>6} {'writes':>7}"
+    )
+    for name, metrics in results.items():
+        mean = statistics.mean(metrics["seconds"])
+        llm_calls = statistics.mean(metrics["llm_calls"])
+        # 扣除回放的合成延迟，并发调用时为低估
+        overhead = mean - llm_calls * latency
+        print(
+            f"{name:<16} {mean:>8.3f} {min(metrics['seconds']):>8.3f} "
+            f"{overhead:>12.3f} {llm_calls:>5.0f} "
+            f"{statistics.mean(metrics['aput']):>6.0f} "
+            f"{statistics.mean(metrics['aput_writes']):>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("user_request", help="一句话需求")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.user_request, args.repeat))
@@ -0,0 +1,145 @@
+"""
+状态更新写入路径的基准
+
+对比两种进度写入方式：原先的先查询整行、逐个setattr再在提交时flush，
+与现在的单条 UPDATE ... RETURNING（同时完成版本号递增和NOTIFY）。
+统计每次更新（含提交）的耗时、SQL语句数，以及从数据库读回的行数据字节数（近似）。
+
+测试数据为一条带有较大问卷和最终文档的需求记录，结束后删除。
+
+用法（在 api 目录下）:
+    python -m scripts.bench_status_updates --updates 200 --document-kb 64
+"""
+
+import argparse
+import json
+import statistics
+import time
+from collections import defaultdict
+from uuid import uuid4
+
+from sqlalchemy import event, select
+from sqlalchemy.sql import func
+
+from common.dto.user import UserInfo
+from common.dto.requirement import RequirementCreate
+from common.enums.task import TaskStatus
+from dal.dao.requirement import RequirementDAO
+from dal.database import SessionLocal, engine
+from dal.po.requirement import Requirement
+from settings import settings
+
+_counters = defaultdict(int)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_statement(*args):
+    _counters["sql"] += 1
+
+
+def _row_bytes(values) -> int:
+    return sum(
+        len(json.dumps(value, ensure_ascii=False, default=str).encode())
+        for value in values
+    )
+
+
+def legacy_update(db, thread_id: str, progress: str) -> int:
+    """原先的写入方式：加载整行（包括JSON大字段）后修改，提交时flush"""
+    requirement = db.query(Requirement).filter(Requirement.id == thread_id).first()
+    loaded = _row_bytes(
+        getattr(requirement, column.key) for column in Requirement.__table__.columns
+    )
+    requirement.status = TaskStatus.PROCESSING.value
+    requirement.progress = progress
+    requirement.version = (requirement.version or 0) + 1
+    field_versions = dict(requirement.field_versions or {})
+    field_versions.update(status=requirement.version, progress=requirement.version)
+    requirement.field_versions = field_versions
+    payload = json.dumps(
+        {"kind": "requirement", "id": thread_id, "progress": progress}
+    )
+    db.execute(select(func.pg_notify(settings.TASK_EVENTS_CHANNEL, payload)))
+    return loaded
+
+
+def returning_update(db, thread_id: str, progress: str) -> int:
+    row = RequirementDAO.update_requirement_status(
+        db, thread_id, TaskStatus.PROCESSING, progress
+    )
+    return _row_bytes(row)
+
+
+def run(name: str, update, thread_id: str, updates: int) -> dict:
+    latencies = []
+    loaded = 0
+    before = _counters["sql"]
+    db = SessionLocal()
+    try:
+        for i in range(updates):
+            start = time.perf_counter()
+            loaded += update(db, thread_id, f"{name} 进度 {i}")
+            db.commit()
+            latencies.append(time.perf_counter() - start)
+    finally:
+        db.close()
+    latencies.sort()
+    return {
+        "name": name,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "sql_per_update": (_counters["sql"] - before) / updates,
+        "bytes_per_update": loaded / updates,
+    }
+
+
+def main(updates: int, document_kb: int):
+    text = "需" * (document_kb * 1024 // 3)
+    user = UserInfo(id=str(uuid4()), name="bench", permissions=[])
+    db = SessionLocal()
+    thread_id = RequirementDAO.create_requirement(
+        db, RequirementCreate(initial_requirement="基准测试"), user
+    )
+    db.commit()
+    RequirementDAO.update_requirement_status(
+        db,
+        thread_id,
+        TaskStatus.PROCESSING,
+        "准备数据",
+        questionnaire={"questions": [{"id": "q", "text": text}]},
+        final_document={"mission_statement": text},
+    )
+    db.commit()
+    db.close()
+
+    try:
+        results = [
+            run("select+setattr", legacy_update, thread_id, updates),
+            run("update returning", returning_update, thread_id, updates),
+        ]
+    finally:
+        db = SessionLocal()
+        db.query(Requirement).filter(Requirement.id == thread_id).delete()
+        db.commit()
+        db.close()
+
+    print(f"updates={updates} document≈{document_kb}KB x2")
+    print(
+        f"{'path':<18} {'mean(ms)':>9} {'p50(ms)':>8} {'p95(ms)':>8} "
+        f"{'sql':>5} {'bytes':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['name']:<18} {r['mean_ms']:>9.2f} {r['p50_ms']:>8.2f} "
+            f"{r['p95_ms']:>8.2f} {r['sql_per_update']:>5.1f} "
+            f"{r['bytes_per_update']:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--document-kb", type=int, default=64)
+    args = parser.parse_args()
+    main(args.updates, args.document_kb)
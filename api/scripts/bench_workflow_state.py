@@ -0,0 +1,105 @@
+"""
+工作流代理状态更新的微基准
+
+对比两种单步状态更新方式在不同已创建节点数下的耗时：
+- copy: 旧实现，每步复制完整的节点列表、变量列表和待办列表，并按标题线性查找待办项
+- delta: 节点只返回本步增量，由AgentState的reducer追加，待办项按nodeId索引
+
+delta+reduce 再按AgentState的reducer（operator.add）合并增量。delta 的耗时与已创建
+节点数无关；合并仍会复制一次列表引用，随节点数线性增长，但不再复制节点内容，
+也不再线性查找待办项。检查点的序列化开销不在此基准内。
+
+用法（在 api 目录下）: python -m scripts.bench_workflow_state
+"""
+
+import operator
+import timeit
+
+from biz.agent.workflow.state import mark_nodes_completed, merge_todo_status
+
+SIZES = (50, 100, 200, 400, 800)
+REPEAT = 2000
+
+
+def _make_node(i: int) -> dict:
+    return {
+        "id": f"node-{i:04d}",
+        "type": "custom",
+        "data": {
+            "title": f"节点{i}",
+            "type": "llm",
+            "prompt_template": [{"role": "user", "text": "{{#sys.query#}}" * 20}],
+        },
+        "position": {"x": 0, "y": 0},
+    }
+
+
+def _make_state(size: int) -> dict:
+    """已完成 size 个节点、还剩一个待办项的状态"""
+    todo_list = [
+        {"nodeId": f"node-{i:04d}", "nodeTitle": f"节点{i}", "status": "completed"}
+        for i in range(size)
+    ]
+    todo_list.append(
+        {"nodeId": f"node-{size:04d}", "nodeTitle": f"节点{size}", "status": "pending"}
+    )
+    return {
+        "todo_list": todo_list,
+        "todo_status": {task["nodeId"]: task["status"] for task in todo_list},
+        "nodes_created": [_make_node(i) for i in range(size)],
+        "available_variables": [f"{{{{#node-{i:04d}.text#}}}}" for i in range(size)],
+    }
+
+
+def copy_step(state: dict, node: dict, output: list) -> dict:
+    updated_todo_list = [dict(task) for task in state["todo_list"]]
+    for task in updated_todo_list:
+        if task["nodeTitle"] == node["data"]["title"] and task["status"] == "pending":
+            task["status"] = "completed"
+            break
+    return {
+        "nodes_created": state["nodes_created"] + [node],
+        "available_variables": state["available_variables"] + output,
+        "todo_list": updated_todo_list,
+    }
+
+
+def delta_step(state: dict, node: dict, output: list) -> dict:
+    return {
+        "nodes_created": [node],
+        "available_variables": output,
+        "todo_status": mark_nodes_completed(state, [node]),
+    }
+
+
+def apply_reducers(state: dict, update: dict) -> dict:
+    """模拟LangGraph通道对增量的合并"""
+    return {
+        "nodes_created": operator.add(state["nodes_created"], update["nodes_created"]),
+        "available_variables": operator.add(
+            state["available_variables"], update["available_variables"]
+        ),
+        "todo_status": merge_todo_status(state["todo_status"], update["todo_status"]),
+    }
+
+
+def main():
+    print(f"{'nodes':>6} {'copy(us)':>10} {'delta(us)':>10} {'delta+reduce(us)':>17}")
+    for size in SIZES:
+        state = _make_state(size)
+        node = _make_node(size)
+        output = [f"{{{{#{node['id']}.text#}}}}"]
+
+        def timed(func):
+            return timeit.timeit(func, number=REPEAT) / REPEAT * 1e6
+
+        copy_cost = timed(lambda: copy_step(state, node, output))
+        delta_cost = timed(lambda: delta_step(state, node, output))
+        reduce_cost = timed(
+            lambda: apply_reducers(state, delta_step(state, node, output))
+        )
+        print(f"{size:>6} {copy_cost:>10.2f} {delta_cost:>10.2f} {reduce_cost:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
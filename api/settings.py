@@ -1,3 +1,5 @@
+from typing import Any, Dict, List
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -21,6 +23,158 @@ class Settings(BaseSettings):
     DEFAULT_MODEL: str = ""
     OPENAI_API_BASE: str = ""
     OPENAI_API_KEY: str = ""
+    # 多个OpenAI兼容端点，格式: [{"name": "...", "base_url": "...", "api_key": "..."}]
+    # 为空时只使用 OPENAI_API_BASE
+    OPENAI_ENDPOINTS: List[Dict[str, str]] = []
+    # 端点路由：延迟/错误率EWMA的平滑系数，连续失败多少次后熔断及熔断时长（秒）
+    LLM_EWMA_ALPHA: float = 0.2
+    LLM_ENDPOINT_FAILURE_THRESHOLD: int = 3
+    LLM_ENDPOINT_COOLDOWN: float = 30.0
+    LLM_ENDPOINT_HEALTH_INTERVAL: float = 15.0
+    # 对冲请求：按最近多少次延迟计算p95，样本不足时使用默认对冲延迟（秒）
+    LLM_LATENCY_WINDOW: int = 200
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_DEFAULT_DELAY: float = 5.0
+
+    # LLM录制回放：record时把真实请求与结果录制到目录中，replay时只从录制结果回放，
+    # 不访问网络；回放时首个分片前的延迟和分片间隔（秒）
+    LLM_CASSETTE_MODE: str = ""
+    LLM_CASSETTE_DIR: str = "cassettes"
+    LLM_CASSETTE_LATENCY: float = 0.0
+    LLM_CASSETTE_CHUNK_DELAY: float = 0.0
+
+    # 模型档位：第一个为主模型，其余为主模型调用失败时依次降级的模型
+    LLM_MODEL_TIERS: Dict[str, List[str]] = {
+        "pro": ["gemini-2.5-pro", "gemini-2.5-flash"],
+        "flash": ["gemini-2.5-flash", "gemini-2.5-pro"],
+        "chat": ["Qwen/Qwen3-30B-A3B-Instruct-2507", "gemini-2.5-flash"],
+    }
+    # 各图节点使用的档位，可覆盖temperature；experiment按ratio把部分调用分到另一档位，
+    # 格式: {"tier": "pro", "experiment": {"tier": "flash", "ratio": 0.1}}
+    LLM_STAGE_ROUTES: Dict[str, Dict[str, Any]] = {
+        "requirement.draft": {"tier": "pro"},
+        "requirement.questionnaire": {"tier": "pro"},
+        "requirement.finalizer": {"tier": "pro"},
+        "blueprint.workflow": {"tier": "pro"},
+        "blueprint.mermaid": {"tier": "pro"},
+        "chat.reply": {"tier": "chat"},
+        "chat.decision": {"tier": "pro"},
+        "chat.refine": {"tier": "pro"},
+        "chat.mermaid": {"tier": "pro"},
+        "workflow.planner": {"tier": "pro"},
+        "workflow.agent": {"tier": "pro"},
+        "workflow.node_generator": {"tier": "pro"},
+        "llm.stream": {"tier": "flash"},
+        "structured.repair": {"tier": "flash"},
+    }
+    # 未配置路由的环节使用的档位
+    LLM_DEFAULT_TIER: str = "pro"
+    # 每百万token的价格（美元），用于统计各环节成本；cached_input为命中前缀缓存的价格
+    LLM_MODEL_PRICES: Dict[str, Dict[str, float]] = {
+        "gemini-2.5-pro": {"input": 1.25, "cached_input": 0.31, "output": 10.0},
+        "gemini-2.5-flash": {"input": 0.3, "cached_input": 0.075, "output": 2.5},
+        "Qwen/Qwen3-30B-A3B-Instruct-2507": {"input": 0.1, "output": 0.4},
+    }
+    # 各环节单次调用的提示词token预算，超出时记录并告警
+    LLM_STAGE_PROMPT_BUDGETS: Dict[str, int] = {
+        "workflow.agent": 8000,
+        "workflow.node_generator": 4000,
+        "chat.decision": 4000,
+    }
+    # 按提示词开头多少个字符判断前缀是否稳定
+    LLM_PROMPT_PREFIX_CHARS: int = 2048
+
+    # 模型输出的JSON经本地修复仍不合法时，最多请求快速模型修正几次
+    STRUCTURED_OUTPUT_MAX_REASKS: int = 1
+
+    # 蓝图对话的SSE：逐token合并成帧，累计到多少字符或首个token等待多久（秒）发送一帧；
+    # 客户端读得慢时最多缓冲多少个事件，超出后暂停图的执行
+    CHAT_STREAM_FRAME_CHARS: int = 48
+    CHAT_STREAM_FRAME_INTERVAL: float = 0.05
+    CHAT_STREAM_QUEUE_SIZE: int = 32
+
+    # 任务状态变更通过Postgres NOTIFY推送：频道名、每个SSE连接缓冲的事件数、断线重连间隔（秒）
+    TASK_EVENTS_CHANNEL: str = "task_events"
+    TASK_EVENTS_QUEUE_SIZE: int = 16
+    TASK_EVENTS_RECONNECT_DELAY: float = 3.0
+    # 状态接口长轮询 ?wait= 的最长等待时间（秒），应小于负载均衡的空闲超时
+    STATUS_LONG_POLL_MAX_WAIT: float = 30.0
+
+    # 阶段耗时统计：按最近多少小时的记录计算分位数，分位数在进程内缓存多少秒
+    STAGE_STATS_WINDOW_HOURS: int = 7 * 24
+    STAGE_STATS_CACHE_SECONDS: float = 60.0
+    # 状态接口返回的建议轮询间隔（毫秒）：无法估算时的默认值及上下限
+    STATUS_POLL_DEFAULT_MS: int = 2000
+    STATUS_POLL_MIN_MS: int = 500
+    STATUS_POLL_MAX_MS: int = 10000
+
+    # 是否调用LLM美化Mermaid流程图，默认直接由工作流JSON编译生成
+    MERMAID_PRETTIFY: bool = False
+
+    # 工作流代理每轮是否允许批量并发调用多个节点工具
+    WORKFLOW_AGENT_BATCH_TOOL_CALLS: bool = True
+    # 工作流代理每轮只发送压缩后的上下文，而不是完整的消息历史
+    WORKFLOW_AGENT_COMPACT_HISTORY: bool = True
+    # 开始、回复等结构性节点由规则直接从SOP编译，不经过LLM
+    WORKFLOW_STRUCTURAL_COMPILER: bool = True
+    # 规划完成后按待办项扇出，每个节点一次独立的LLM调用并发生成
+    WORKFLOW_AGENT_FAN_OUT: bool = False
+    # 扇出生成时同时进行的LLM调用数上限
+    WORKFLOW_AGENT_FAN_OUT_CONCURRENCY: int = 8
+
+    # LLM请求共享的HTTP连接池，安装了h2时启用HTTP/2
+    LLM_HTTP2: bool = True
+    LLM_HTTP_MAX_CONNECTIONS: int = 64
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 32
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 120.0
+    LLM_HTTP_TIMEOUT: float = 300.0
+    LLM_HTTP_CONNECT_TIMEOUT: float = 10.0
+
+    # LLM调用的全局并发与速率控制
+    LLM_GOVERNOR_ENABLED: bool = True
+    # 每个模型每分钟的请求数和token数上限，多个进程共享
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {
+        "default": {"rpm": 60, "tpm": 1_000_000},
+        "gemini-2.5-pro": {"rpm": 30, "tpm": 1_000_000},
+    }
+    # 单个进程内每个模型同时进行的调用数
+    LLM_MAX_CONCURRENCY: Dict[str, int] = {"default": 8, "gemini-2.5-pro": 6}
+    # 各优先级可使用的额度比例，为对话预留余量
+    LLM_PRIORITY_SHARE: Dict[str, float] = {
+        "interactive": 1.0,
+        "standard": 0.85,
+        "batch": 0.6,
+    }
+    # 准入控制：排队和执行中的任务数达到上限时，创建接口直接返回429
+    LLM_ADMISSION_MAX_BACKLOG: Dict[str, int] = {
+        "requirement_create": 50,
+        "blueprint_create": 30,
+        "dify_node_create": 20,
+    }
+    # 估算Retry-After时单个任务的平均耗时（秒）
+    LLM_ADMISSION_JOB_SECONDS: int = 60
+
+    # LLM响应缓存：进程内LRU条目数，Postgres缓存的有效期和总大小上限
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MEMORY_SIZE: int = 256
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    LLM_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    # 每写入多少条缓存执行一次过期和超量淘汰
+    LLM_CACHE_EVICT_EVERY: int = 100
+
+    # 任务队列：API进程内是否同时运行worker，生产环境可关闭并单独运行 worker.py
+    JOB_WORKER_EMBEDDED: bool = True
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_LEASE_SECONDS: int = 60
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY_SECONDS: int = 10
+    # 每种任务类型在单个worker进程内的最大并发数
+    JOB_CONCURRENCY: Dict[str, int] = {
+        "requirement_create": 4,
+        "requirement_continue": 4,
+        "blueprint_create": 4,
+        "dify_node_create": 2,
+    }
 
     @property
     def DATABASE_URL(self) -> str:
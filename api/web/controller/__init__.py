@@ -1,9 +1,19 @@
 from fastapi import Depends, FastAPI
+from sqlalchemy.orm import Session
 
+from biz.service.stage_event import StageEventBIZ
 from common.utils.dify_client import DifyClient, get_dify_client
+from common.utils.get_llm_model import get_llm_pool_stats
+from common.utils.llm_cache import get_llm_cache_stats
+from common.utils.llm_governor import governor
+from common.utils.llm_stage import get_llm_stage_stats
+from common.utils.structured_output import get_structured_output_stats
+from dal.database import get_db
+from dal.task_events import task_event_hub
 from web.controller.requirement import router as requirement_router
 from web.controller.blueprint import router as blueprint_router
 from web.controller.workflow import router as workflow_router
+from web.controller.events import router as events_router
 from web.vo import Result
 
 
@@ -23,6 +33,38 @@ def register_controllers(app: FastAPI):
         client.check_connection()
         return Result.success(data={"dify_status": "ok"})
 
+    @app.get("/api/llm-cache/stats", description="LLM response cache statistics")
+    async def llm_cache_stats():
+        return Result.success(data=get_llm_cache_stats())
+
+    @app.get("/api/llm-pool/stats", description="LLM HTTP connection pool statistics")
+    async def llm_pool_stats():
+        return Result.success(data=get_llm_pool_stats())
+
+    @app.get("/api/llm-governor/stats", description="LLM concurrency governor stats")
+    async def llm_governor_stats():
+        return Result.success(data=governor.get_stats())
+
+    @app.get("/api/llm-stage/stats", description="Per-stage LLM latency and cost")
+    async def llm_stage_stats():
+        return Result.success(data=get_llm_stage_stats())
+
+    @app.get(
+        "/api/structured-output/stats",
+        description="JSON repair and re-ask rates per stage",
+    )
+    async def structured_output_stats():
+        return Result.success(data=get_structured_output_stats())
+
+    @app.get("/api/events/stats", description="Task event LISTEN/SSE subscribers")
+    async def task_events_stats():
+        return Result.success(data=task_event_hub.get_stats())
+
+    @app.get("/api/stage-events/stats", description="Task stage duration percentiles")
+    def stage_events_stats(db: Session = Depends(get_db)):
+        return Result.success(data=StageEventBIZ.get_stage_stats(db))
+
     app.include_router(requirement_router)
     app.include_router(blueprint_router)
     app.include_router(workflow_router)
+    app.include_router(events_router)
@@ -1,16 +1,24 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+import asyncio
+import traceback
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
 from sse_starlette.sse import EventSourceResponse
 from sqlalchemy.orm import Session
-import json
 
 from biz.service.blueprint import BlueprintBIZ
 from common.dto.user import UserInfo
+from common.enums.llm import LLMPriority
+from common.enums.task import TaskKind
+from common.utils.etag import etag_matches, make_etag, poll_headers
 from common.utils.get_user import get_user_info
+from common.utils.llm_governor import llm_priority
+from common.utils.sse_stream import coalesce_events, to_sse_data
 from dal.database import get_db
+from dal.task_events import long_poll
+from settings import settings
 from web.vo.result import Result
 
-from biz.agent.blueprint.chat_graph import get_chat_workflow
-from langchain_core.runnables.config import RunnableConfig
 from common.dto.blueprint import PromptRequest
 
 router = APIRouter(prefix="/api/blueprint")
@@ -19,13 +27,10 @@ router = APIRouter(prefix="/api/blueprint")
 @router.post("/create/{thread_id}")
 def create_blueprint(
     thread_id: str,
-    background_tasks: BackgroundTasks,
     user_info: UserInfo = Depends(get_user_info),
     db: Session = Depends(get_db),
 ):
-    blueprint_id = BlueprintBIZ.create_blueprint(
-        db, thread_id, user_info, background_tasks
-    )
+    blueprint_id = BlueprintBIZ.create_blueprint(db, thread_id, user_info)
     return Result.success(data={"blueprint_id": blueprint_id})
 
 
@@ -42,21 +47,64 @@ def get_blueprint_list(
 @router.get("/latest/{thread_id}")
 def get_latest_blueprint(
     thread_id: str,
+    if_none_match: Optional[str] = Header(default=None),
     user_info: UserInfo = Depends(get_user_info),
     db: Session = Depends(get_db),
 ):
+    if if_none_match:
+        blueprint_id, version = BlueprintBIZ.get_latest_blueprint_etag_parts(
+            db, thread_id
+        )
+        etag = make_etag(blueprint_id, version)
+        if etag_matches(if_none_match, etag):
+            hints = BlueprintBIZ.get_blueprint_poll_hints(db, blueprint_id)
+            return Result.not_modified(etag, poll_headers(*hints))
     result = BlueprintBIZ.get_latest_blueprint(db, thread_id)
-    return Result.success(data=result)
+    return Result.success(
+        data=result,
+        headers={
+            "ETag": make_etag(result.blueprint_id, result.version),
+            **poll_headers(result.eta_seconds, result.next_poll_after_ms),
+        },
+    )
 
 
 @router.get("/status/{blueprintId}")
-def get_blueprint_status(
+async def get_blueprint_status(
     blueprintId: str,
+    since: Optional[int] = None,
+    wait: float = 0,
+    after_version: Optional[int] = None,
+    if_none_match: Optional[str] = Header(default=None),
     user_info: UserInfo = Depends(get_user_info),
     db: Session = Depends(get_db),
 ):
-    result = BlueprintBIZ.get_blueprint_status(db, blueprintId, user_info)
-    return Result.success(data=result)
+    await long_poll(
+        TaskKind.BLUEPRINT.value,
+        blueprintId,
+        after_version,
+        wait,
+        lambda session: BlueprintBIZ.get_blueprint_version(session, blueprintId),
+    )
+    return await asyncio.to_thread(
+        _blueprint_status, db, blueprintId, user_info, since, if_none_match
+    )
+
+
+def _blueprint_status(db, blueprintId, user_info, since, if_none_match):
+    if if_none_match:
+        etag = make_etag(BlueprintBIZ.get_blueprint_version(db, blueprintId))
+        if etag_matches(if_none_match, etag):
+            hints = BlueprintBIZ.get_blueprint_poll_hints(db, blueprintId)
+            return Result.not_modified(etag, poll_headers(*hints))
+    result = BlueprintBIZ.get_blueprint_status(db, blueprintId, user_info, since)
+    return Result.success(
+        data=result.model_dump(exclude_unset=since is not None),
+        headers={
+            "ETag": make_etag(result.version),
+            **poll_headers(result.eta_seconds, result.next_poll_after_ms),
+        },
+    )
 
 
 @router.post("/chat/completions/{thread_id}")
@@ -66,76 +114,30 @@ async def stream_chat(
     db: Session = Depends(get_db),
 ):
     print("received the request")
-    latest_blueprint = BlueprintBIZ.get_latest_blueprint(db, thread_id)
+    latest_blueprint = await asyncio.to_thread(
+        BlueprintBIZ.get_latest_blueprint, db, thread_id
+    )
     workflow = getattr(latest_blueprint, "workflow")
-
-    def event_generator():
-        try:
-            # 转换消息为LangChain的Message对象
-            # messages = [HumanMessage(content=request_body.prompt)]
-            # 初始化状态
-            initial_state = {
-                "initial_messages": request_body.prompt,
-                "workflow": workflow,
-                "refined_workflow": None,
-                "decision": None,
-                "mermaid_code": None,
-            }
-            # 获取工作流应用
-            chat_workflow = get_chat_workflow()
-            config = RunnableConfig(configurable={"thread_id": thread_id})
-            decision = None
-            # 运行工作流并生成事件流
-            for output in chat_workflow.stream(
-                initial_state, config=config, stream_mode="messages"
-            ):
-                if output[0] and output[0].content:
-                    # 构建SSE格式数据
-                    if output[0].content in ["update", "end"]:
-                        decision = output[0].content
-
-                    if decision is None:
-                        sse_data = f"data: {json.dumps({'chunk': output[0].content}, ensure_ascii=False)}"
-                        yield sse_data
-
-            from dal.checkpointer import get_checkpointer
-
-            checkpointer = get_checkpointer()
-            checkpoint = checkpointer.get({"configurable": {"thread_id": thread_id}})
-
-            if checkpoint:
-                if decision == "end":
-                    sse_data = f"data: {json.dumps({'chunk': '目前无需更新工作流。'}, ensure_ascii=False)}"
-                    yield sse_data
-                else:
-                    print("开始更新")
-                    final_workflow = checkpoint["channel_values"].get(
-                        "refined_workflow"
-                    )
-                    final_mermaid = checkpoint["channel_values"].get("mermaid_code")
-
-                    print("checkpoint", checkpoint["channel_values"])
-
-                    if final_workflow and final_mermaid:
-                        BlueprintBIZ.update_blueprint_by_thread(
-                            thread_id, final_workflow, final_mermaid
-                        )
-                        print("已经更新")
-                        sse_data = f"data: {json.dumps({'chunk': '工作流和流程图已更新完毕！'}, ensure_ascii=False)}"
-                        yield sse_data
-
-        except Exception as e:
-            import traceback
-
-            traceback.print_exc()
-            # 错误处理
-            error_data = json.dumps(
-                {
-                    "error": str(e),
-                    "chunk": "",
-                },
-                ensure_ascii=False,
+    # 对话可能持续较长时间，先归还数据库连接，不在流式输出期间占用
+    db.close()
+
+    async def event_generator():
+        # 对话有用户实时等待，优先于后台批量任务获得LLM额度
+        with llm_priority(LLMPriority.INTERACTIVE):
+            events = coalesce_events(
+                BlueprintBIZ.stream_chat(thread_id, request_body.prompt, workflow),
+                max_chars=settings.CHAT_STREAM_FRAME_CHARS,
+                max_delay=settings.CHAT_STREAM_FRAME_INTERVAL,
+                queue_size=settings.CHAT_STREAM_QUEUE_SIZE,
             )
-            yield f"data: {error_data}"
+            try:
+                async for event in events:
+                    yield to_sse_data(event)
+            except Exception as e:
+                traceback.print_exc()
+                yield to_sse_data({"error": str(e), "chunk": ""})
+            finally:
+                # 客户端断开时在这里关闭，取消仍在运行的对话图
+                await events.aclose()
 
     return EventSourceResponse(event_generator())
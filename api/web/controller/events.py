@@ -0,0 +1,66 @@
+import asyncio
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sse_starlette.sse import EventSourceResponse
+
+from biz.service.blueprint import BlueprintBIZ
+from biz.service.requirement import RequirementBIZ
+from common.dto.user import UserInfo
+from common.enums.task import TaskKind
+from common.utils.get_user import get_user_info
+from common.utils.sse_stream import to_sse_data
+from dal.database import get_db
+from dal.task_events import task_event_hub
+
+router = APIRouter(prefix="/api/events")
+
+
+def _check_owner(
+    requirement: List[str],
+    blueprint: List[str],
+    workflow: List[str],
+    user_info: UserInfo,
+):
+    """订阅前逐个校验归属，不存在或不属于当前用户时抛出404/403"""
+    db = next(get_db())
+    try:
+        for thread_id in requirement:
+            RequirementBIZ.get_requirement_version(db, thread_id, user_info)
+        for blueprint_id in blueprint:
+            BlueprintBIZ.check_blueprint_owner(db, blueprint_id, user_info)
+        for app_id in workflow:
+            BlueprintBIZ.check_dify_workflow_owner(db, app_id, user_info)
+    finally:
+        db.close()
+
+
+@router.get("/stream")
+async def stream_task_events(
+    requirement: List[str] = Query(default=[]),
+    blueprint: List[str] = Query(default=[]),
+    workflow: List[str] = Query(default=[]),
+    user_info: UserInfo = Depends(get_user_info),
+):
+    """
+    订阅需求、蓝图和Dify工作流的状态变更，代替定时轮询 /api/*/status
+
+    每次变更推送 {"kind", "id", "status", "progress"}，客户端收到后再查询一次状态接口；
+    收到 {"kind": "resync"} 时应重新查询所有订阅的对象。
+    """
+    await asyncio.to_thread(_check_owner, requirement, blueprint, workflow, user_info)
+    keys = (
+        [(TaskKind.REQUIREMENT.value, i) for i in requirement]
+        + [(TaskKind.BLUEPRINT.value, i) for i in blueprint]
+        + [(TaskKind.WORKFLOW.value, i) for i in workflow]
+    )
+    queue = task_event_hub.subscribe(keys)
+
+    async def event_generator():
+        try:
+            while True:
+                yield to_sse_data(await queue.get())
+        finally:
+            task_event_hub.unsubscribe(keys, queue)
+
+    return EventSourceResponse(event_generator())
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
 from sqlalchemy.orm import Session
 
 from biz.service.requirement import RequirementBIZ
 from common.dto.requirement import RequirementCreate, RequirementFields, UserAnswers
 from common.dto.user import UserInfo
+from common.enums.task import TaskKind
+from common.utils.etag import etag_matches, make_etag, poll_headers
 from common.utils.get_user import get_user_info
 from dal.database import get_db
+from dal.task_events import long_poll
 from web.vo.result import Result
 
 router = APIRouter(prefix="/api/requirement")
@@ -14,37 +20,67 @@ router = APIRouter(prefix="/api/requirement")
 @router.post("/create")
 def create_requirement(
     initial_requirement: RequirementCreate,
-    background_tasks: BackgroundTasks,
     user_info: UserInfo = Depends(get_user_info),
     db: Session = Depends(get_db),
 ):
-    thread_id = RequirementBIZ.create_requirement(
-        db, initial_requirement, user_info, background_tasks
-    )
+    thread_id = RequirementBIZ.create_requirement(db, initial_requirement, user_info)
     return Result.success(data={"thread_id": thread_id})
 
 
 @router.get("/status/{thread_id}")
-def get_requirement_status(
+async def get_requirement_status(
     thread_id: str,
+    since: Optional[int] = None,
+    wait: float = 0,
+    after_version: Optional[int] = None,
+    if_none_match: Optional[str] = Header(default=None),
     user_info: UserInfo = Depends(get_user_info),
     db: Session = Depends(get_db),
 ):
-    result = RequirementBIZ.get_requirement_status(db, thread_id, user_info)
-    return Result.success(data=result.model_dump())
+    """
+    Args:
+        since: 只返回该版本之后修改过的字段
+        wait: 长轮询等待的秒数，与 after_version 一起使用
+        after_version: 版本号超过它或等待超时后才返回
+    """
+    await long_poll(
+        TaskKind.REQUIREMENT.value,
+        thread_id,
+        after_version,
+        wait,
+        lambda session: RequirementBIZ.get_requirement_version(
+            session, thread_id, user_info
+        ),
+    )
+    return await asyncio.to_thread(
+        _requirement_status, db, thread_id, user_info, since, if_none_match
+    )
+
+
+def _requirement_status(db, thread_id, user_info, since, if_none_match):
+    if if_none_match:
+        version = RequirementBIZ.get_requirement_version(db, thread_id, user_info)
+        if etag_matches(if_none_match, make_etag(version)):
+            hints = RequirementBIZ.get_requirement_poll_hints(db, thread_id)
+            return Result.not_modified(make_etag(version), poll_headers(*hints))
+    result = RequirementBIZ.get_requirement_status(db, thread_id, user_info, since)
+    return Result.success(
+        data=result.model_dump(exclude_unset=since is not None),
+        headers={
+            "ETag": make_etag(result.version),
+            **poll_headers(result.eta_seconds, result.next_poll_after_ms),
+        },
+    )
 
 
 @router.post("/submit-answers/{thread_id}")
 def submit_answers(
     thread_id: str,
     user_answers: UserAnswers,
-    background_tasks: BackgroundTasks,
     user_info: UserInfo = Depends(get_user_info),
     db: Session = Depends(get_db),
 ):
-    result = RequirementBIZ.submit_answers(
-        db, thread_id, user_answers, user_info, background_tasks
-    )
+    result = RequirementBIZ.submit_answers(db, thread_id, user_answers, user_info)
     return Result.success(data=result)
 
 
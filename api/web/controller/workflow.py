@@ -1,12 +1,20 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
 from sqlalchemy.orm import Session
 
 from biz.service.requirement import RequirementBIZ
 from biz.service.blueprint import BlueprintBIZ
 from common.dto.requirement import RequirementCreate, RequirementFields
 from common.dto.user import UserInfo
+from common.enums.job import JobType
+from common.enums.task import TaskKind
+from common.utils.etag import etag_matches, make_etag, poll_headers
 from common.utils.get_user import get_user_info
+from common.utils.llm_governor import check_admission
 from dal.database import get_db
+from dal.task_events import long_poll
 from web.vo.result import Result
 from common.utils.dify_client import DifyClient
 
@@ -16,10 +24,11 @@ router = APIRouter(prefix="/api/workflow")
 @router.get("/appid/{thread_id}")
 def get_appid_by_thread(
     thread_id: str,
-    background_tasks: BackgroundTasks,
     user_info: UserInfo = Depends(get_user_info),
     db: Session = Depends(get_db),
 ):
+    # 在创建Dify应用之前做准入检查，避免排队过多时留下空应用
+    check_admission(db, JobType.DIFY_NODE_CREATE)
     client = DifyClient()
 
     app_type = "advanced-chat"
@@ -29,14 +38,51 @@ def get_appid_by_thread(
     response = client.create_app(app_type, app_name, app_description)
     app_id = response['id']
     BlueprintBIZ.create_node(db, app_id, app_type, app_name, app_description, 
-                             background_tasks, user_info, thread_id)
+                             user_info, thread_id)
     return Result.success(data={"app_id": app_id})
 
 @router.get("/status/{app_id}")
-def get_dify_workflow_status(
+async def get_dify_workflow_status(
+    app_id: str,
+    since: Optional[int] = None,
+    wait: float = 0,
+    after_version: Optional[int] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    user_info: UserInfo = Depends(get_user_info),
+    db: Session = Depends(get_db),
+):
+    await long_poll(
+        TaskKind.WORKFLOW.value,
+        app_id,
+        after_version,
+        wait,
+        lambda session: BlueprintBIZ.get_dify_workflow_version(session, app_id),
+    )
+    return await asyncio.to_thread(
+        _dify_workflow_status, db, app_id, user_info, since, if_none_match
+    )
+
+
+def _dify_workflow_status(db, app_id, user_info, since, if_none_match):
+    if if_none_match:
+        etag = make_etag(BlueprintBIZ.get_dify_workflow_version(db, app_id))
+        if etag_matches(if_none_match, etag):
+            hints = BlueprintBIZ.get_dify_workflow_poll_hints(db, app_id)
+            return Result.not_modified(etag, poll_headers(*hints))
+    result = BlueprintBIZ.get_dify_workflow_status(db, app_id, user_info, since)
+    return Result.success(
+        data=result.model_dump(exclude_unset=since is not None),
+        headers={
+            "ETag": make_etag(result.version),
+            **poll_headers(result.eta_seconds, result.next_poll_after_ms),
+        },
+    )
+
+@router.post("/resume/{app_id}")
+def resume_dify_workflow(
     app_id: str,
     user_info: UserInfo = Depends(get_user_info),
     db: Session = Depends(get_db),
 ):
-    result = BlueprintBIZ.get_dify_workflow_status(db, app_id, user_info)
+    result = BlueprintBIZ.resume_node(db, app_id, user_info)
     return Result.success(data=result)
@@ -18,6 +18,7 @@ def register_exception_handlers(app: FastAPI):
             status_code=exc.status_code,
             error_code=ErrorCode.UNKNOWN_ERROR.code,
             detail=exc.detail,
+            headers=getattr(exc, "headers", None),
         )
 
     @app.exception_handler(Exception)
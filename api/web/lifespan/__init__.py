@@ -2,14 +2,30 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from biz.worker.job_worker import JobWorker
+from common.utils.get_llm_model import close_llm_clients, start_llm_health_checks
 from dal.checkpointer import close_checkpointer, init_checkpointer
+from dal.task_events import task_event_hub
+from settings import settings
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_checkpointer()
+    await init_checkpointer()
+    worker = None
+    if settings.JOB_WORKER_EMBEDDED:
+        worker = JobWorker()
+        await worker.start()
+    health_checks = start_llm_health_checks()
+    task_event_hub.start()
     yield
-    close_checkpointer()
+    await task_event_hub.stop()
+    if health_checks:
+        health_checks.cancel()
+    if worker:
+        await worker.stop()
+    await close_checkpointer()
+    await close_llm_clients()
 
 
 def register_lifespan(app: FastAPI):
@@ -14,4 +14,5 @@ def register_middlewares(app: FastAPI):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "X-Eta-Seconds", "X-Next-Poll-After-Ms"],
     )
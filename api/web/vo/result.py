@@ -1,6 +1,6 @@
-from typing import Any, ClassVar, Optional
+from typing import Any, ClassVar, Dict, Optional
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 
 
@@ -13,20 +13,36 @@ class Result(BaseModel):
     SUCCESS_MESSAGE: ClassVar[str] = "success"
 
     @classmethod
-    def success(cls, data: Optional[Any] = None) -> JSONResponse:
+    def success(
+        cls, data: Optional[Any] = None, headers: Optional[Dict[str, str]] = None
+    ) -> JSONResponse:
         if data and hasattr(data, "model_dump"):
             data = data.model_dump()
         return JSONResponse(
             status_code=200,
+            headers=headers,
             content=Result(
                 code=Result.SUCCESS_CODE, message=Result.SUCCESS_MESSAGE, data=data
             ).model_dump(mode="json"),
         )
 
     @classmethod
-    def error(cls, status_code: int, error_code: int, detail: str) -> JSONResponse:
+    def not_modified(
+        cls, etag: str, headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
+
+    @classmethod
+    def error(
+        cls,
+        status_code: int,
+        error_code: int,
+        detail: str,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> JSONResponse:
         return JSONResponse(
             status_code=status_code,
+            headers=headers,
             content={
                 "code": error_code,
                 "message": detail,
@@ -0,0 +1,31 @@
+import asyncio
+import signal
+
+from biz.worker.job_worker import JobWorker
+from common.utils.get_llm_model import close_llm_clients, start_llm_health_checks
+from dal.checkpointer import close_checkpointer, init_checkpointer
+
+
+async def run_worker():
+    await init_checkpointer()
+    worker = JobWorker()
+    await worker.start()
+    health_checks = start_llm_health_checks()
+
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        await stop_event.wait()
+    finally:
+        if health_checks:
+            health_checks.cancel()
+        await worker.stop()
+        await close_checkpointer()
+        await close_llm_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())